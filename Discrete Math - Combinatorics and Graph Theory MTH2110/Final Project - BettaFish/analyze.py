@@ -0,0 +1,258 @@
+"""
+Analyzes every position in an EPD or PGN file offline, searching them in a
+pool of worker processes and writing one JSON line per position, in the
+order of the input. An interrupted run picks up where it stopped.
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import chess
+import chess.pgn
+import minimax
+import stats
+from transposition import TranspositionTable
+
+# Each worker process keeps one table, made by init_worker()
+worker_table = None
+
+# Without a movetime, positions are searched to this depth; with one, the
+# depth only stops a search that finishes early, such as on a mate
+DEFAULT_DEPTH = 6
+TIMED_DEPTH = 64
+
+# Jobs waiting in the pool per worker, so a large file isn't read in at once
+JOBS_PER_WORKER = 8
+
+
+def epd_positions(path):
+    """
+    Read the positions of an EPD file one at a time.
+
+    Returns:
+        A generator of dicts with each position's "id" (its "id" operation,
+        or its line number) and "fen".
+    """
+    with open(path, encoding="utf-8") as epd:
+        for line_number, line in enumerate(epd, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            board, operations = chess.Board.from_epd(line)
+            yield {"id": operations.get("id", str(line_number)), "fen": board.fen()}
+
+
+def pgn_positions(path):
+    """
+    Read every position of every game in a PGN file, one at a time: the
+    starting position and the position after each move.
+
+    Returns:
+        A generator of dicts with each position's "id", "game:ply" counting
+        games from 1, and "fen".
+    """
+    with open(path, encoding="utf-8") as pgn:
+        for game_number in itertools.count(1):
+            game = chess.pgn.read_game(pgn)
+            if game is None:
+                return
+            board = game.board()
+            yield {"id": f"{game_number}:0", "fen": board.fen()}
+            for ply, move in enumerate(game.mainline_moves(), 1):
+                board.push(move)
+                yield {"id": f"{game_number}:{ply}", "fen": board.fen()}
+
+
+def read_positions(path):
+    """
+    Returns:
+        A generator of the positions in a file, read as PGN if its name ends
+        in .pgn and as EPD otherwise.
+    """
+    if path.lower().endswith(".pgn"):
+        return pgn_positions(path)
+    return epd_positions(path)
+
+
+def init_worker(table_mb):
+    """
+    Make the transposition table of a worker process.
+    """
+    global worker_table
+    worker_table = TranspositionTable(table_mb)
+
+
+def analyze_position(job):
+    """
+    Search one position in a worker process. The table is cleared first,
+    so the result doesn't depend on which worker got the position.
+
+    Args:
+        job: a dict with the position's "id" and "fen", and the "depth" and
+            "movetime" limits of the search.
+    Returns:
+        A dict with the "id" and "fen", the best "move" and "pv" as UCI, the
+        "score" in centipawns for the side to move, and the "depth", "nodes",
+        and "time" of the search.
+    """
+    worker_table.clear()
+    board = chess.Board(job["fen"])
+    searcher = minimax.Minimax(board, worker_table)
+    start = time.perf_counter()
+    score, move = searcher.search(max_depth=job["depth"], movetime=job["movetime"])
+    elapsed = time.perf_counter() - start
+    return {
+        "id": job["id"],
+        "fen": job["fen"],
+        "move": move.uci() if move else None,
+        "score": score,
+        "pv": [pv_move.uci() for pv_move in searcher.pv],
+        "depth": searcher.stats.as_dict()["depth"],
+        "nodes": searcher.nodes,
+        "time": elapsed,
+    }
+
+
+def finished_ids(out_path):
+    """
+    Read the results an earlier run already wrote. A last line cut off by
+    the interruption is removed from the file.
+
+    Returns:
+        A list of the ids of the finished positions, in order.
+    """
+    if not os.path.exists(out_path):
+        return []
+    ids = []
+    complete_bytes = 0
+    with open(out_path, "rb") as out_file:
+        for line in out_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            ids.append(record["id"])
+            complete_bytes += len(line)
+    if complete_bytes < os.path.getsize(out_path):
+        with open(out_path, "r+b") as out_file:
+            out_file.truncate(complete_bytes)
+    return ids
+
+
+def ordered_results(pool, jobs, window):
+    """
+    Run jobs in a pool with at most window of them submitted at once, unlike
+    pool.imap(), which reads every job in up front.
+
+    Args:
+        pool: a multiprocessing.Pool whose workers run analyze_position().
+        jobs: an iterable of jobs, read only as the window has room.
+        window: an int representing the most jobs submitted at once.
+    Yields:
+        Each job's result, in the order of the jobs.
+    """
+    pending = collections.deque()
+    for job in jobs:
+        pending.append(pool.apply_async(analyze_position, (job,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def analyze(
+    in_path,
+    out_path,
+    depth=None,
+    movetime=None,
+    workers=None,
+    table_mb=16,
+    progress=None,
+):
+    """
+    Analyze every position in a file, appending the results to a JSONL file
+    in the order of the input. Positions the file already has results for
+    are skipped, so a run can be restarted with the same arguments.
+
+    Args:
+        in_path: an EPD or PGN file.
+        out_path: the JSONL file to write.
+        depth: an int representing the depth to search each position to;
+            defaults to DEFAULT_DEPTH, or TIMED_DEPTH with a movetime.
+        movetime: an optional number of seconds to search each position for.
+        workers: an int representing the processes to search in at once.
+        table_mb: the size of each worker's transposition table.
+        progress: an optional function called with each result.
+    Returns:
+        An int representing the positions analyzed in this run.
+    """
+    if depth is None:
+        depth = TIMED_DEPTH if movetime is not None else DEFAULT_DEPTH
+    done = finished_ids(out_path)
+    positions = read_positions(in_path)
+    for index, position in enumerate(itertools.islice(positions, len(done))):
+        if position["id"] != done[index]:
+            raise ValueError(f"{out_path} holds results for a different input")
+    jobs = (dict(position, depth=depth, movetime=movetime) for position in positions)
+
+    count = 0
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers, init_worker, (table_mb,))
+    try:
+        for result in ordered_results(pool, jobs, workers * JOBS_PER_WORKER):
+            stats.write_jsonl(out_path, result)
+            count += 1
+            if progress is not None:
+                progress(result)
+    finally:
+        pool.terminate()
+        pool.join()
+    return count
+
+
+def main():
+    """
+    Analyze a file from the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("positions", help="an EPD or PGN file")
+    parser.add_argument("--out", default=None, help="defaults to <positions>.jsonl")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--movetime", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--hash", type=int, default=16, help="MB per worker")
+    options = parser.parse_args()
+
+    out_path = options.out or os.path.splitext(options.positions)[0] + ".jsonl"
+    start = time.perf_counter()
+
+    def report(result):
+        print(
+            f"{result['id']}: {result['move']} ({result['score']}) "
+            f"depth {result['depth']}, {result['nodes']} nodes, "
+            f"{result['time']:.2f}s"
+        )
+
+    count = analyze(
+        options.positions,
+        out_path,
+        options.depth,
+        options.movetime,
+        options.workers,
+        options.hash,
+        report,
+    )
+    print(
+        f"analyzed {count} positions in {time.perf_counter() - start:.1f}s, "
+        f"results in {out_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
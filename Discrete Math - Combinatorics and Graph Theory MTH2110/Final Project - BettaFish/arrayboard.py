@@ -0,0 +1,760 @@
+"""
+A compact 0x88 array board for the search, with moves as ints and make and
+unmake that update the position in place instead of copying python-chess
+board state. Positions are converted from and to chess.Board only at the
+root of a search.
+"""
+
+import chess
+import chess.polyglot
+from eval import piece_type_vals, flat_pst
+
+# Piece codes: the python-chess piece type, plus BLACK_PIECE for black
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(1, 7)
+BLACK_PIECE = 8
+
+# Castling rights bits
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+# Deepest line that make() can keep undo information for
+MAX_PLY = 1024
+
+# Squares of the 0x88 board (rank * 16 + file) and their 0-63 numbers
+SQUARES_88 = [square + (square & ~7) for square in range(64)]
+SQUARES_64 = [0] * 128
+for _square in range(64):
+    SQUARES_64[SQUARES_88[_square]] = _square
+
+KNIGHT_OFFSETS = (-33, -31, -18, -14, 14, 18, 31, 33)
+KING_OFFSETS = (-17, -16, -15, -1, 1, 15, 16, 17)
+DIAGONALS = (-17, -15, 15, 17)
+ORTHOGONALS = (-16, -1, 1, 16)
+
+
+def on_board_targets(offsets):
+    """
+    Returns:
+        A list from every 0x88 square to the on-board squares at offsets
+        from it.
+    """
+    targets = [[] for _ in range(128)]
+    for square in SQUARES_88:
+        for offset in offsets:
+            if not (square + offset) & 0x88:
+                targets[square].append(square + offset)
+    return targets
+
+
+KNIGHT_TARGETS = on_board_targets(KNIGHT_OFFSETS)
+KING_TARGETS = on_board_targets(KING_OFFSETS)
+
+# Rights that survive a move from or to each square
+CASTLING_MASKS = [15] * 128
+CASTLING_MASKS[0x00] = 15 & ~WHITE_QUEENSIDE
+CASTLING_MASKS[0x04] = 15 & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASKS[0x07] = 15 & ~WHITE_KINGSIDE
+CASTLING_MASKS[0x70] = 15 & ~BLACK_QUEENSIDE
+CASTLING_MASKS[0x74] = 15 & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASKS[0x77] = 15 & ~BLACK_KINGSIDE
+
+# Polyglot Zobrist keys, so hashes match transposition.position_key()
+RANDOM = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+PIECE_KEYS = [[0] * 128 for _ in range(16)]
+for _piece_type in range(1, 7):
+    for _square in range(64):
+        # Polyglot numbers black pieces 0, 2, ... and white ones 1, 3, ...
+        PIECE_KEYS[_piece_type][SQUARES_88[_square]] = RANDOM[
+            64 * ((_piece_type - 1) * 2 + 1) + _square
+        ]
+        PIECE_KEYS[_piece_type | BLACK_PIECE][SQUARES_88[_square]] = RANDOM[
+            64 * ((_piece_type - 1) * 2) + _square
+        ]
+CASTLING_KEYS = [0] * 16
+for _rights in range(16):
+    for _bit in range(4):
+        if _rights & (1 << _bit):
+            CASTLING_KEYS[_rights] ^= RANDOM[768 + _bit]
+EP_KEYS = [RANDOM[772 + file] for file in range(8)]
+TURN_KEY = RANDOM[780]
+
+
+def piece_values():
+    """
+    Returns:
+        A list from every piece code to a list over the 0x88 squares of the
+        piece's material plus PST value there, positive for white and
+        negative for black, from eval.py's current tables.
+    """
+    values = [[0] * 128 for _ in range(16)]
+    for piece_type in range(1, 7):
+        for square in range(64):
+            square_88 = SQUARES_88[square]
+            index = piece_type * 64 + square
+            values[piece_type][square_88] = (
+                piece_type_vals[piece_type] + flat_pst[chess.WHITE][index]
+            )
+            values[piece_type | BLACK_PIECE][square_88] = -(
+                piece_type_vals[piece_type] + flat_pst[chess.BLACK][index]
+            )
+    return values
+
+
+def encode(from_square, to_square, promotion=0):
+    """
+    Returns:
+        The int for a move between 0-63 squares, packed the same way as
+        transposition.encode_move(), which converts chess.Move objects.
+    """
+    return from_square | to_square << 6 | promotion << 12
+
+
+class ArrayBoard:
+    """
+    A chess position on a 0x88 board: a list of 128 squares, only half of
+    which are on the board, so a step off the edge is caught by & 0x88.
+
+    make() saves what unmake() needs in lists that are allocated once, and
+    keeps the Zobrist key and the evaluation up to date as it goes.
+    """
+
+    __slots__ = (
+        "squares",
+        "turn",
+        "castling",
+        "ep_square",
+        "ep_key",
+        "halfmove_clock",
+        "fullmove_number",
+        "kings",
+        "key",
+        "score",
+        "values",
+        "ply",
+        "moves",
+        "captured",
+        "old_castling",
+        "old_ep_square",
+        "old_ep_key",
+        "old_halfmove_clock",
+        "old_key",
+        "old_score",
+    )
+
+    def __init__(self):
+        self.squares = [EMPTY] * 128
+        self.turn = chess.WHITE
+        self.castling = 0
+        self.ep_square = -1
+        self.ep_key = 0
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        # King squares, black first like chess.COLORS
+        self.kings = [-1, -1]
+        self.key = 0
+        # Material plus PST, positive if white is better
+        self.score = 0
+        self.values = piece_values()
+        self.ply = 0
+        self.moves = [0] * MAX_PLY
+        self.captured = [EMPTY] * MAX_PLY
+        self.old_castling = [0] * MAX_PLY
+        self.old_ep_square = [-1] * MAX_PLY
+        self.old_ep_key = [0] * MAX_PLY
+        self.old_halfmove_clock = [0] * MAX_PLY
+        self.old_key = [0] * MAX_PLY
+        self.old_score = [0] * MAX_PLY
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        Args:
+            board: a standard (not Chess960) chess.Board().
+        Returns:
+            An ArrayBoard of the same position. Its move history starts here.
+        """
+        if board.chess960:
+            raise ValueError("Chess960 positions aren't supported")
+        array_board = cls()
+        for square, piece in board.piece_map().items():
+            code = piece.piece_type | (EMPTY if piece.color else BLACK_PIECE)
+            array_board.squares[SQUARES_88[square]] = code
+            if piece.piece_type == KING:
+                array_board.kings[piece.color] = SQUARES_88[square]
+        array_board.turn = board.turn
+        for bit, square in enumerate((chess.H1, chess.A1, chess.H8, chess.A8)):
+            if board.castling_rights & chess.BB_SQUARES[square]:
+                array_board.castling |= 1 << bit
+        if board.ep_square is not None:
+            array_board.ep_square = SQUARES_88[board.ep_square]
+        array_board.halfmove_clock = board.halfmove_clock
+        array_board.fullmove_number = board.fullmove_number
+        array_board.refresh()
+        return array_board
+
+    def refresh(self):
+        """
+        Work out the Zobrist key and the score from scratch.
+        """
+        key = CASTLING_KEYS[self.castling]
+        score = 0
+        for square in SQUARES_88:
+            piece = self.squares[square]
+            if piece:
+                key ^= PIECE_KEYS[piece][square]
+                score += self.values[piece][square]
+        self.ep_key = self.en_passant_key(self.ep_square, self.turn)
+        key ^= self.ep_key
+        if self.turn:
+            key ^= TURN_KEY
+        self.key = key
+        self.score = score
+
+    def en_passant_key(self, ep_square, turn):
+        """
+        Returns:
+            The Zobrist key of an en passant square, or 0 if no pawn of the
+            side to move stands next to the pawn that can be captured, which
+            is when polyglot hashes it.
+        """
+        if ep_square < 0:
+            return 0
+        pawn_square = ep_square - 16 if turn else ep_square + 16
+        our_pawn = PAWN if turn else PAWN | BLACK_PIECE
+        for side in (pawn_square - 1, pawn_square + 1):
+            if not side & 0x88 and self.squares[side] == our_pawn:
+                return EP_KEYS[ep_square & 7]
+        return 0
+
+    def fen(self):
+        """
+        Returns:
+            The FEN of the position.
+        """
+        rows = []
+        for rank in range(7, -1, -1):
+            row = ""
+            empty = 0
+            for file in range(8):
+                piece = self.squares[rank * 16 + file]
+                if not piece:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                symbol = chess.piece_symbol(piece & 7)
+                row += symbol.upper() if piece < BLACK_PIECE else symbol
+            rows.append(row + (str(empty) if empty else ""))
+        castling = "".join(
+            symbol for bit, symbol in enumerate("KQkq") if self.castling & (1 << bit)
+        )
+        # Like the key, only an en passant square a pawn could take on counts
+        ep = "-"
+        if self.ep_key:
+            ep = chess.square_name(SQUARES_64[self.ep_square])
+        return (
+            f"{'/'.join(rows)} {'w' if self.turn else 'b'} {castling or '-'} "
+            f"{ep} {self.halfmove_clock} {self.fullmove_number}"
+        )
+
+    def to_board(self):
+        """
+        Returns:
+            A chess.Board() of the position.
+        """
+        return chess.Board(self.fen())
+
+    def relative_score(self):
+        """
+        Returns:
+            The material plus PST score for the side to move, the same as
+            eval.Evaluator.relative_score().
+        """
+        return self.score if self.turn else -self.score
+
+    def is_attacked(self, square, by_white):
+        """
+        Returns:
+            True if a piece of the given color attacks a 0x88 square.
+        """
+        squares = self.squares
+        color = EMPTY if by_white else BLACK_PIECE
+        pawn = PAWN | color
+        if by_white:
+            pawn_squares = (square - 15, square - 17)
+        else:
+            pawn_squares = (square + 15, square + 17)
+        for origin in pawn_squares:
+            if not origin & 0x88 and squares[origin] == pawn:
+                return True
+        knight = KNIGHT | color
+        for origin in KNIGHT_TARGETS[square]:
+            if squares[origin] == knight:
+                return True
+        king = KING | color
+        for origin in KING_TARGETS[square]:
+            if squares[origin] == king:
+                return True
+        bishop, rook, queen = BISHOP | color, ROOK | color, QUEEN | color
+        for offset in DIAGONALS:
+            origin = square + offset
+            while not origin & 0x88:
+                piece = squares[origin]
+                if piece:
+                    if piece == bishop or piece == queen:
+                        return True
+                    break
+                origin += offset
+        for offset in ORTHOGONALS:
+            origin = square + offset
+            while not origin & 0x88:
+                piece = squares[origin]
+                if piece:
+                    if piece == rook or piece == queen:
+                        return True
+                    break
+                origin += offset
+        return False
+
+    def is_check(self):
+        """
+        Returns:
+            True if the side to move is in check.
+        """
+        return self.is_attacked(self.kings[self.turn], not self.turn)
+
+    def was_legal(self):
+        """
+        Returns:
+            True if the move just made didn't leave its own king in check.
+        """
+        return not self.is_attacked(self.kings[not self.turn], self.turn)
+
+    def piece_count(self):
+        """
+        Returns:
+            The number of pieces on the board, kings and pawns included.
+        """
+        return len(self.squares) - self.squares.count(EMPTY)
+
+    def has_pieces(self):
+        """
+        Returns:
+            True if the side to move has a piece other than pawns and its
+            king.
+        """
+        low = KNIGHT if self.turn else KNIGHT | BLACK_PIECE
+        high = low + QUEEN - KNIGHT
+        squares = self.squares
+        for square in SQUARES_88:
+            if low <= squares[square] <= high:
+                return True
+        return False
+
+    def generate_moves(self, captures_only=False):
+        """
+        Generate pseudo-legal moves: legal except that they may leave the
+        king in check, which make() and was_legal() find out. Castling
+        through or out of check is left out here.
+
+        Args:
+            captures_only: a bool; if True, only captures (including en
+                passant and capturing promotions) are generated.
+        Returns:
+            A list of move ints.
+        """
+        squares = self.squares
+        white = self.turn
+        color = EMPTY if white else BLACK_PIECE
+        enemy = BLACK_PIECE if white else EMPTY
+        forward = 16 if white else -16
+        start_rank = 1 if white else 6
+        last_rank = 7 if white else 0
+        ep_square = self.ep_square
+        moves = []
+        for square in SQUARES_88:
+            piece = squares[square]
+            if not piece or piece & BLACK_PIECE != color:
+                continue
+            piece_type = piece & 7
+            origin = SQUARES_64[square]
+            if piece_type == PAWN:
+                for target in (square + forward - 1, square + forward + 1):
+                    if target & 0x88:
+                        continue
+                    victim = squares[target]
+                    if (
+                        victim and victim & BLACK_PIECE == enemy
+                    ) or target == ep_square:
+                        if target >> 4 == last_rank:
+                            for promotion in (QUEEN, KNIGHT, ROOK, BISHOP):
+                                moves.append(
+                                    origin | SQUARES_64[target] << 6 | promotion << 12
+                                )
+                        else:
+                            moves.append(origin | SQUARES_64[target] << 6)
+                if captures_only:
+                    continue
+                target = square + forward
+                if not squares[target]:
+                    if target >> 4 == last_rank:
+                        for promotion in (QUEEN, KNIGHT, ROOK, BISHOP):
+                            moves.append(
+                                origin | SQUARES_64[target] << 6 | promotion << 12
+                            )
+                    else:
+                        moves.append(origin | SQUARES_64[target] << 6)
+                        if square >> 4 == start_rank and not squares[target + forward]:
+                            moves.append(origin | SQUARES_64[target + forward] << 6)
+            elif piece_type == KNIGHT or piece_type == KING:
+                targets = KNIGHT_TARGETS if piece_type == KNIGHT else KING_TARGETS
+                for target in targets[square]:
+                    victim = squares[target]
+                    if victim:
+                        if victim & BLACK_PIECE == enemy:
+                            moves.append(origin | SQUARES_64[target] << 6)
+                    elif not captures_only:
+                        moves.append(origin | SQUARES_64[target] << 6)
+            else:
+                if piece_type == BISHOP:
+                    offsets = DIAGONALS
+                elif piece_type == ROOK:
+                    offsets = ORTHOGONALS
+                else:
+                    offsets = KING_OFFSETS
+                for offset in offsets:
+                    target = square + offset
+                    while not target & 0x88:
+                        victim = squares[target]
+                        if victim:
+                            if victim & BLACK_PIECE == enemy:
+                                moves.append(origin | SQUARES_64[target] << 6)
+                            break
+                        if not captures_only:
+                            moves.append(origin | SQUARES_64[target] << 6)
+                        target += offset
+        if not captures_only and self.castling:
+            self.generate_castling(moves)
+        return moves
+
+    def generate_castling(self, moves):
+        """
+        Add the legal castling moves of the side to move to a list.
+        """
+        squares = self.squares
+        if self.turn:
+            rights, king, rank = self.castling & 3, KING, 0x00
+            kingside, queenside = WHITE_KINGSIDE, WHITE_QUEENSIDE
+        else:
+            rights, king, rank = self.castling & 12, KING | BLACK_PIECE, 0x70
+            kingside, queenside = BLACK_KINGSIDE, BLACK_QUEENSIDE
+        if not rights or squares[rank + 4] != king:
+            return
+        enemy = not self.turn
+        if (
+            rights & kingside
+            and not squares[rank + 5]
+            and not squares[rank + 6]
+            and not self.is_attacked(rank + 4, enemy)
+            and not self.is_attacked(rank + 5, enemy)
+            and not self.is_attacked(rank + 6, enemy)
+        ):
+            moves.append(encode(SQUARES_64[rank + 4], SQUARES_64[rank + 6]))
+        if (
+            rights & queenside
+            and not squares[rank + 3]
+            and not squares[rank + 2]
+            and not squares[rank + 1]
+            and not self.is_attacked(rank + 4, enemy)
+            and not self.is_attacked(rank + 3, enemy)
+            and not self.is_attacked(rank + 2, enemy)
+        ):
+            moves.append(encode(SQUARES_64[rank + 4], SQUARES_64[rank + 2]))
+
+    def legal_moves(self):
+        """
+        Returns:
+            A list of the legal move ints.
+        """
+        legal = []
+        for move in self.generate_moves():
+            self.make(move)
+            if self.was_legal():
+                legal.append(move)
+            self.unmake()
+        return legal
+
+    def is_capture(self, move):
+        """
+        Returns:
+            True if a move captures, including en passant.
+        """
+        target = SQUARES_88[move >> 6 & 63]
+        if self.squares[target]:
+            return True
+        return (
+            target == self.ep_square and self.squares[SQUARES_88[move & 63]] & 7 == PAWN
+        )
+
+    def victim(self, move):
+        """
+        Returns:
+            The piece type a move captures, PAWN for en passant, or 0.
+        """
+        target = SQUARES_88[move >> 6 & 63]
+        victim = self.squares[target] & 7
+        if not victim and target == self.ep_square:
+            if self.squares[SQUARES_88[move & 63]] & 7 == PAWN:
+                return PAWN
+        return victim
+
+    def make(self, move):
+        """
+        Make a pseudo-legal move, saving what unmake() needs.
+        """
+        squares = self.squares
+        values = self.values
+        ply = self.ply
+        self.moves[ply] = move
+        self.old_castling[ply] = self.castling
+        self.old_ep_square[ply] = self.ep_square
+        self.old_ep_key[ply] = self.ep_key
+        self.old_halfmove_clock[ply] = self.halfmove_clock
+        self.old_key[ply] = self.key
+        self.old_score[ply] = self.score
+        self.ply = ply + 1
+
+        origin = SQUARES_88[move & 63]
+        target = SQUARES_88[move >> 6 & 63]
+        promotion = move >> 12
+        piece = squares[origin]
+        captured = squares[target]
+        self.captured[ply] = captured
+        key = self.key ^ TURN_KEY ^ self.ep_key ^ CASTLING_KEYS[self.castling]
+        score = self.score
+
+        squares[origin] = EMPTY
+        key ^= PIECE_KEYS[piece][origin]
+        score -= values[piece][origin]
+        if captured:
+            key ^= PIECE_KEYS[captured][target]
+            score -= values[captured][target]
+        placed = piece
+        piece_type = piece & 7
+        new_ep_square = -1
+        if piece_type == PAWN:
+            self.halfmove_clock = 0
+            if target == self.ep_square:
+                # En passant: the captured pawn is beside the moving one
+                taken = target - 16 if self.turn else target + 16
+                key ^= PIECE_KEYS[squares[taken]][taken]
+                score -= values[squares[taken]][taken]
+                squares[taken] = EMPTY
+            elif target - origin in (32, -32):
+                new_ep_square = (origin + target) >> 1
+            if promotion:
+                placed = promotion | (piece & BLACK_PIECE)
+        elif captured:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        squares[target] = placed
+        key ^= PIECE_KEYS[placed][target]
+        score += values[placed][target]
+
+        if piece_type == KING:
+            self.kings[self.turn] = target
+            if target - origin == 2 or target - origin == -2:
+                # Castling also moves the rook next to the king
+                if target > origin:
+                    rook_from, rook_to = origin + 3, origin + 1
+                else:
+                    rook_from, rook_to = origin - 4, origin - 1
+                rook = squares[rook_from]
+                squares[rook_from] = EMPTY
+                squares[rook_to] = rook
+                key ^= PIECE_KEYS[rook][rook_from] ^ PIECE_KEYS[rook][rook_to]
+                score += values[rook][rook_to] - values[rook][rook_from]
+
+        self.castling &= CASTLING_MASKS[origin] & CASTLING_MASKS[target]
+        if not self.turn:
+            self.fullmove_number += 1
+        self.turn = not self.turn
+        self.ep_square = new_ep_square
+        self.ep_key = self.en_passant_key(new_ep_square, self.turn)
+        self.key = key ^ CASTLING_KEYS[self.castling] ^ self.ep_key
+        self.score = score
+
+    def unmake(self):
+        """
+        Unmake the last move made with make() or make_null().
+        """
+        ply = self.ply - 1
+        self.ply = ply
+        move = self.moves[ply]
+        self.turn = not self.turn
+        if not self.turn:
+            self.fullmove_number -= 1
+        self.castling = self.old_castling[ply]
+        self.ep_square = self.old_ep_square[ply]
+        self.ep_key = self.old_ep_key[ply]
+        self.halfmove_clock = self.old_halfmove_clock[ply]
+        self.key = self.old_key[ply]
+        self.score = self.old_score[ply]
+        if not move:
+            return
+
+        squares = self.squares
+        origin = SQUARES_88[move & 63]
+        target = SQUARES_88[move >> 6 & 63]
+        piece = squares[target]
+        if move >> 12:
+            piece = PAWN | (piece & BLACK_PIECE)
+        squares[origin] = piece
+        squares[target] = self.captured[ply]
+        piece_type = piece & 7
+        if piece_type == PAWN and target == self.ep_square:
+            taken = target - 16 if self.turn else target + 16
+            squares[taken] = PAWN | (BLACK_PIECE if self.turn else EMPTY)
+        elif piece_type == KING:
+            self.kings[self.turn] = origin
+            if target - origin == 2 or target - origin == -2:
+                if target > origin:
+                    rook_from, rook_to = origin + 3, origin + 1
+                else:
+                    rook_from, rook_to = origin - 4, origin - 1
+                squares[rook_from] = squares[rook_to]
+                squares[rook_to] = EMPTY
+
+    def make_null(self):
+        """
+        Pass the turn, for null move pruning. Undone by unmake().
+        """
+        ply = self.ply
+        self.moves[ply] = 0
+        self.old_castling[ply] = self.castling
+        self.old_ep_square[ply] = self.ep_square
+        self.old_ep_key[ply] = self.ep_key
+        self.old_halfmove_clock[ply] = self.halfmove_clock
+        self.old_key[ply] = self.key
+        self.old_score[ply] = self.score
+        self.ply = ply + 1
+        self.key ^= TURN_KEY ^ self.ep_key
+        self.ep_square = -1
+        self.ep_key = 0
+        self.halfmove_clock += 1
+        if not self.turn:
+            self.fullmove_number += 1
+        self.turn = not self.turn
+
+    def least_attacker(self, square, white):
+        """
+        Returns:
+            A (square, piece_type) tuple of a color's least valuable piece
+            attacking a 0x88 square, or (-1, 0) if there isn't one.
+        """
+        squares = self.squares
+        color = EMPTY if white else BLACK_PIECE
+        pawn = PAWN | color
+        for origin in (
+            (square - 15, square - 17) if white else (square + 15, square + 17)
+        ):
+            if not origin & 0x88 and squares[origin] == pawn:
+                return (origin, PAWN)
+        knight = KNIGHT | color
+        for origin in KNIGHT_TARGETS[square]:
+            if squares[origin] == knight:
+                return (origin, KNIGHT)
+        # Bishops are tried before rooks, and both before a queen on either
+        queen = -1
+        for offsets, slider in ((DIAGONALS, BISHOP), (ORTHOGONALS, ROOK)):
+            for offset in offsets:
+                origin = square + offset
+                while not origin & 0x88:
+                    piece = squares[origin]
+                    if piece:
+                        if piece == slider | color:
+                            return (origin, slider)
+                        if piece == QUEEN | color:
+                            queen = origin
+                        break
+                    origin += offset
+        if queen >= 0:
+            return (queen, QUEEN)
+        king = KING | color
+        for origin in KING_TARGETS[square]:
+            if squares[origin] == king:
+                return (origin, KING)
+        return (-1, 0)
+
+    def static_exchange(self, move):
+        """
+        Static exchange evaluation of a capture on the array board, like
+        ordering.static_exchange(): captures on the target square are played
+        out cheapest attacker first, and either side may stop.
+
+        Returns:
+            An int representing the material the side to move wins or loses.
+        """
+        squares = self.squares
+        origin = SQUARES_88[move & 63]
+        target = SQUARES_88[move >> 6 & 63]
+        promotion = move >> 12
+        victim = self.victim(move)
+        gain = [piece_type_vals[victim]]
+        attacker_value = piece_type_vals[squares[origin] & 7]
+        if promotion:
+            gain[0] += piece_type_vals[promotion] - piece_type_vals[PAWN]
+            attacker_value = piece_type_vals[promotion]
+
+        # Pieces are lifted off the board as they capture, so sliders behind
+        # them join in, and put back at the end
+        lifted = [(origin, squares[origin])]
+        squares[origin] = EMPTY
+        if victim and not squares[target]:
+            taken = target - 16 if self.turn else target + 16
+            lifted.append((taken, squares[taken]))
+            squares[taken] = EMPTY
+        white = not self.turn
+        while True:
+            square, piece_type = self.least_attacker(target, white)
+            if not piece_type:
+                break
+            gain.append(attacker_value - gain[-1])
+            if max(-gain[-2], gain[-1]) < 0:
+                gain.pop()
+                break
+            lifted.append((square, squares[square]))
+            squares[square] = EMPTY
+            attacker_value = piece_type_vals[piece_type]
+            white = not white
+        for square, piece in lifted:
+            squares[square] = piece
+
+        while len(gain) > 1:
+            last = gain.pop()
+            gain[-1] = -max(-gain[-1], last)
+        return gain[0]
+
+    def perft(self, depth):
+        """
+        Count the leaf nodes of the legal move tree, to test move generation.
+
+        Args:
+            depth: an int representing the plies to go down.
+        Returns:
+            An int.
+        """
+        if depth == 0:
+            return 1
+        nodes = 0
+        for move in self.generate_moves():
+            self.make(move)
+            if self.was_legal():
+                nodes += self.perft(depth - 1) if depth > 1 else 1
+            self.unmake()
+        return nodes
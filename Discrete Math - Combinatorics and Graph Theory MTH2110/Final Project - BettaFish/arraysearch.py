@@ -0,0 +1,378 @@
+"""
+The search of minimax.py on an arrayboard.ArrayBoard, where moves are ints
+and made and unmade in place, for Minimax(array_board=True). The windows,
+pruning, and reductions are minimax.NegamaxSearch's; negamax() and the move
+ordering are written again here for the board underneath, with every move
+generated and sorted at once instead of picked in stages.
+"""
+
+from arrayboard import ArrayBoard, SQUARES_88, PAWN
+from minimax import (
+    NegamaxSearch,
+    INFINITY,
+    MATE_SCORE,
+    MATE_BOUND,
+    LMR_MIN_DEPTH,
+    LMR_FULL_MOVES,
+    LMR_DEEP_MOVES,
+    DELTA_MARGIN,
+)
+from ordering import MAX_PLY, HASH_MOVE, CAPTURE, KILLER, QUIET, PIECE_VALUES
+from tablebase import wdl_score
+from transposition import encode_move, decode_move
+
+# Moves are sorted as one int each: the ordering score shifted past the
+# 16 bits of the move
+MOVE_BITS = 16
+MOVE_MASK = (1 << MOVE_BITS) - 1
+# Ordering buckets are shifted past any history or MVV-LVA score
+BUCKET_SHIFT = 48
+
+
+class ArraySearch(NegamaxSearch):
+    """
+    Searches one root position for a Minimax, which keeps the iterative
+    deepening, time limits, and statistics. The counters here are copied
+    into the Minimax by sync() whenever it might read them.
+    """
+
+    def __init__(self, owner):
+        """
+        Args:
+            owner: the minimax.Minimax that's searching; its board is
+                converted once here.
+        """
+        self.owner = owner
+        self.board = ArrayBoard.from_board(owner.board)
+        self.table = owner.table
+        self.tablebase = owner.tablebase
+        self.root_moves = None
+        if owner.root_moves is not None:
+            self.root_moves = [encode_move(move) for move in owner.root_moves]
+        self.ordering = owner.orderer.enabled
+        self.null_move = owner.null_move
+        self.null_move_reduction = owner.null_move_reduction
+        self.lmr = owner.lmr
+        self.pvs = owner.pvs
+        self.aspiration = owner.aspiration
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        # history[color][from_square | to_square << 6]
+        self.history = [[0] * 4096 for _ in range(2)]
+        self.nodes = owner.nodes
+        self.next_check = owner.next_check
+        # The best (score, pv) at the root so far, with the pv as chess.Move
+        # objects, read by the Minimax if the iteration is interrupted
+        self.root_best = None
+        self.qnodes = owner.qnodes
+        self.leaf_nodes = owner.leaf_nodes
+        self.null_move_tries = owner.null_move_tries
+        self.null_move_cutoffs = owner.null_move_cutoffs
+        self.reductions = owner.reductions
+        self.re_searches = owner.re_searches
+        self.cutoffs = owner.orderer.cutoffs
+        self.first_move_cutoffs = owner.orderer.first_move_cutoffs
+        self.cutoff_index_sum = owner.orderer.cutoff_index_sum
+
+    def sync(self):
+        """
+        Copy the counters into the Minimax.
+        """
+        owner = self.owner
+        owner.nodes = self.nodes
+        owner.qnodes = self.qnodes
+        owner.leaf_nodes = self.leaf_nodes
+        owner.null_move_tries = self.null_move_tries
+        owner.null_move_cutoffs = self.null_move_cutoffs
+        owner.reductions = self.reductions
+        owner.re_searches = self.re_searches
+        owner.orderer.cutoffs = self.cutoffs
+        owner.orderer.first_move_cutoffs = self.first_move_cutoffs
+        owner.orderer.cutoff_index_sum = self.cutoff_index_sum
+
+    def check_time(self):
+        """
+        Raise minimax.SearchTimeout if the Minimax's time is up.
+        """
+        self.sync()
+        self.owner.check_time()
+        self.next_check = self.owner.next_check
+
+    def unwind(self):
+        """
+        Unmake every move an interrupted search left on the board.
+        """
+        while self.board.ply:
+            self.board.unmake()
+
+    def aspiration_search(self, depth, guess):
+        """
+        NegamaxSearch.aspiration_search(), with the pv decoded.
+
+        Returns:
+            A (score, pv) tuple, where pv is a list of chess.Move objects.
+        """
+        score, pv = super().aspiration_search(depth, guess)
+        return (score, [decode_move(move) for move in pv])
+
+    def probe_entry(self, key):
+        """
+        Returns:
+            The table's entry for a key, with the move as an int, or None.
+        """
+        return self.table.probe_code(key)
+
+    def store_entry(self, key, depth, score, bound, move):
+        """
+        Store a move int's result in the table.
+        """
+        self.table.store_code(key, depth, score, bound, move)
+
+    def push_null(self):
+        """
+        Pass the turn.
+        """
+        self.board.make_null()
+
+    def pop_null(self):
+        """
+        Take back push_null().
+        """
+        self.board.unmake()
+
+    def probe_tablebase(self, ply):
+        """
+        The tablebase probe of Minimax.negamax(). The board is only converted
+        to a chess.Board once it has few enough pieces.
+
+        Returns:
+            The tablebase score, or None if the position isn't in the tables.
+        """
+        board = self.board
+        if board.castling or board.piece_count() > self.tablebase.max_pieces:
+            return None
+        wdl = self.tablebase.probe_wdl(board.to_board())
+        if wdl is None:
+            return None
+        return wdl_score(wdl, ply)
+
+    def mvv_lva(self, move):
+        """
+        Returns:
+            The MVV-LVA score of a capture or promotion, as ordering.mvv_lva().
+        """
+        board = self.board
+        value = PIECE_VALUES[board.victim(move)]
+        if move >> 12:
+            value += PIECE_VALUES[move >> 12]
+        attacker = board.squares[SQUARES_88[move & 63]] & 7
+        return value * 100000 - PIECE_VALUES[attacker]
+
+    def order(self, moves, ply, hash_move):
+        """
+        Sort moves into the buckets of ordering.MoveOrderer.order(): the hash
+        move, captures and promotions by MVV-LVA, killer moves, then quiet
+        moves by history score.
+
+        Returns:
+            The sorted list of move ints.
+        """
+        if not self.ordering:
+            return moves
+        board = self.board
+        killers = self.killers[ply] if ply < MAX_PLY else (0, 0)
+        history = self.history[board.turn]
+        keyed = []
+        for move in moves:
+            if move == hash_move:
+                score = HASH_MOVE << BUCKET_SHIFT
+            elif move >> 12 or board.is_capture(move):
+                score = (CAPTURE << BUCKET_SHIFT) + self.mvv_lva(move)
+            elif move == killers[0]:
+                score = (KILLER << BUCKET_SHIFT) + 1
+            elif move == killers[1]:
+                score = KILLER << BUCKET_SHIFT
+            else:
+                score = (QUIET << BUCKET_SHIFT) + history[move & 4095]
+            keyed.append(score << MOVE_BITS | move)
+        keyed.sort(reverse=True)
+        return [key & MOVE_MASK for key in keyed]
+
+    def record_cutoff(self, move, index, depth, ply, quiet):
+        """
+        The same as MoveOrderer.record_cutoff().
+        """
+        self.cutoffs += 1
+        self.cutoff_index_sum += index
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if not quiet:
+            return
+        killers = self.killers[ply] if ply < MAX_PLY else None
+        if killers is not None and killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[self.board.turn][move & 4095] += depth * depth
+
+    def negamax(self, depth, alpha, beta, ply):
+        """
+        The same as Minimax.negamax().
+
+        Returns:
+            A (score, pv) tuple where pv is the list of best move ints.
+        """
+        board = self.board
+        if depth > 0:
+            self.nodes += 1
+            if self.nodes >= self.next_check:
+                self.check_time()
+        if self.tablebase is not None and ply > 0 and board.halfmove_clock == 0:
+            stored = self.probe_tablebase(ply)
+            if stored is not None:
+                return (stored, [])
+        if depth == 0:
+            self.leaf_nodes += 1
+            return (self.quiescence(alpha, beta, ply), [])
+
+        pv_node = beta - alpha > 1
+        alpha_orig = alpha
+        key = board.key
+        stored, hash_move = self.probe_table(key, depth, alpha, beta, ply)
+        if stored is not None and ply > 0 and not pv_node:
+            return (stored, [hash_move] if hash_move else [])
+
+        in_check = board.is_check()
+        if (
+            self.null_move
+            and not pv_node
+            and ply > 0
+            and depth > self.null_move_reduction
+            and not in_check
+            and board.relative_score() >= beta
+            and board.moves[board.ply - 1]  # never two null moves in a row
+            and board.has_pieces()
+        ):
+            null_eval = self.search_null_move(depth, beta, ply)
+            if null_eval >= beta:
+                return (beta if null_eval >= MATE_BOUND else null_eval, [])
+
+        moves = board.generate_moves()
+        if ply == 0 and self.root_moves is not None:
+            moves = [move for move in moves if move in self.root_moves]
+        moves = self.order(moves, ply, hash_move)
+
+        best_eval = -INFINITY
+        best_line = []
+        index = 0
+        for move in moves:
+            quiet = not (move >> 12 or board.is_capture(move))
+            board.make(move)
+            if not board.was_legal():
+                board.unmake()
+                continue
+            gives_check = board.is_check()
+            child_eval = None
+            if depth == 1 and not gives_check:
+                child_eval = -board.relative_score()
+            if child_eval is not None and child_eval <= alpha:
+                # The child's quiescence search would stand pat and fail
+                # high straight away
+                self.nodes += 1
+                self.qnodes += 1
+                self.leaf_nodes += 1
+                if self.nodes >= self.next_check:
+                    self.check_time()
+                cur_eval, line = child_eval, []
+            else:
+                reduction = 0
+                if (
+                    self.lmr
+                    and depth >= LMR_MIN_DEPTH
+                    and index >= LMR_FULL_MOVES
+                    and not in_check
+                    and quiet
+                    and not gives_check
+                ):
+                    reduction = 1 if index < LMR_DEEP_MOVES else 2
+                    reduction = min(reduction, depth - 2)
+                cur_eval, line = self.search_child(
+                    index, depth, alpha, beta, ply, reduction
+                )
+            board.unmake()
+
+            if cur_eval > best_eval:
+                best_eval = cur_eval
+                best_line = [move] + line
+                if ply == 0:
+                    self.root_best = (
+                        best_eval,
+                        [decode_move(code) for code in best_line],
+                    )
+            if best_eval > alpha:
+                alpha = best_eval
+            if alpha >= beta:
+                self.record_cutoff(move, index, depth, ply, quiet)
+                break
+            index += 1
+
+        if not best_line:  # no legal moves
+            if in_check:
+                return (-MATE_SCORE + ply, [])
+            return (0, [])
+        self.store_table(key, depth, alpha_orig, beta, best_eval, best_line[0], ply)
+        return (best_eval, best_line)
+
+    def quiescence(self, alpha, beta, ply):
+        """
+        The same as Minimax.quiescence().
+
+        Returns:
+            An int score from the side to move's point of view.
+        """
+        board = self.board
+        self.nodes += 1
+        self.qnodes += 1
+        if self.nodes >= self.next_check:
+            self.check_time()
+        in_check = board.is_check()
+
+        if in_check:
+            best_eval = -MATE_SCORE + ply
+            moves = board.generate_moves()
+        else:
+            best_eval = board.relative_score()
+            if best_eval >= beta:
+                return best_eval
+            if best_eval > alpha:
+                alpha = best_eval
+            moves = [
+                move
+                for move in board.generate_moves(captures_only=True)
+                if best_eval + self.capture_value(move) + DELTA_MARGIN > alpha
+                and board.static_exchange(move) >= 0
+            ]
+            moves.sort(key=self.mvv_lva, reverse=True)
+
+        for move in moves:
+            board.make(move)
+            if not board.was_legal():
+                board.unmake()
+                continue
+            cur_eval = -self.quiescence(-beta, -alpha, ply + 1)
+            board.unmake()
+            if cur_eval > best_eval:
+                best_eval = cur_eval
+            if best_eval > alpha:
+                alpha = best_eval
+            if alpha >= beta:
+                break
+        return best_eval
+
+    def capture_value(self, move):
+        """
+        Returns:
+            The material a capture wins before any recapture.
+        """
+        value = PIECE_VALUES[self.board.victim(move)]
+        if move >> 12:
+            value += PIECE_VALUES[move >> 12] - PIECE_VALUES[PAWN]
+        return value
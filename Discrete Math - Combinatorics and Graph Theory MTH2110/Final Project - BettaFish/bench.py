@@ -0,0 +1,274 @@
+"""
+Benchmarks the engine on a fixed suite of positions, so changes to the
+search or evaluation can be compared by nodes, speed, and accuracy.
+"""
+
+import argparse
+import json
+import os
+import time
+import chess
+import eval
+import minimax
+from transposition import TranspositionTable
+
+# The suite and baseline are kept beside this file, wherever it's run from
+SUITE_PATH = os.path.join(os.path.dirname(__file__), "bench.epd")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+
+# Metrics where a smaller number is better, used when comparing to a baseline.
+# Nodes only count against a run at a fixed depth; at a fixed time more
+# nodes means a faster search.
+LOWER_IS_BETTER = ("time_to_depth", "us_per_call")
+
+# The Minimax switches --ablation turns off one at a time
+SWITCHES = ("ordering", "pvs", "aspiration", "null_move", "lmr")
+
+
+def load_suite(path=SUITE_PATH):
+    """
+    Read the positions of an EPD file.
+
+    Args:
+        path: the path of the EPD file.
+    Returns:
+        A list of dicts with each position's "id", "fen", and "best_moves"
+        (the "bm" moves as UCI strings, empty if it has none).
+    """
+    suite = []
+    with open(path, encoding="utf-8") as epd:
+        for line in epd:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            board, operations = chess.Board.from_epd(line)
+            suite.append(
+                {
+                    "id": operations.get("id", board.fen()),
+                    "fen": board.fen(),
+                    "best_moves": [move.uci() for move in operations.get("bm", [])],
+                }
+            )
+    return suite
+
+
+def run_position(position, max_depth=64, movetime=None, options=None):
+    """
+    Search one position with a fresh transposition table, so every run of
+    the same position at the same depth searches the same tree.
+
+    Args:
+        position: a dict from load_suite().
+        max_depth: an int representing the deepest iteration to run.
+        movetime: an optional number of seconds to think for.
+        options: an optional dict of keyword arguments for Minimax.
+    Returns:
+        A dict with the position's "id", the chosen "move", whether it was
+        "correct" (None if the position has no best move), and the search's
+        "depth", "nodes", and "time".
+    """
+    searcher = minimax.Minimax(
+        chess.Board(position["fen"]), TranspositionTable(), **(options or {})
+    )
+    start = time.perf_counter()
+    _, move = searcher.search(max_depth=max_depth, movetime=movetime)
+    elapsed = time.perf_counter() - start
+    correct = None
+    if position["best_moves"]:
+        correct = move is not None and move.uci() in position["best_moves"]
+    return {
+        "id": position["id"],
+        "move": move.uci() if move else None,
+        "correct": correct,
+        "depth": searcher.stats.as_dict()["depth"],
+        "nodes": searcher.nodes,
+        "time": elapsed,
+    }
+
+
+def summarize(results):
+    """
+    Returns:
+        A dict with the total "nodes", "time_to_depth" (total seconds), "nps",
+        "accuracy" over the positions that have a best move, and the average
+        "depth" reached.
+    """
+    nodes = sum(result["nodes"] for result in results)
+    elapsed = sum(result["time"] for result in results)
+    scored = [result["correct"] for result in results if result["correct"] is not None]
+    return {
+        "nodes": nodes,
+        "time_to_depth": elapsed,
+        "nps": nodes / elapsed if elapsed > 0 else 0.0,
+        "accuracy": sum(scored) / len(scored) if scored else 0.0,
+        "depth": sum(result["depth"] for result in results) / len(results),
+    }
+
+
+def run_suite(suite, depth=4, movetime=1.0):
+    """
+    Run every position once at a fixed depth and once for a fixed time.
+
+    Returns:
+        A dict with "fixed_depth" and "fixed_time" entries, each holding the
+        summary and the per-position results.
+    """
+    report = {}
+    for name, limits in (
+        ("fixed_depth", {"max_depth": depth}),
+        ("fixed_time", {"movetime": movetime}),
+    ):
+        results = [run_position(position, **limits) for position in suite]
+        report[name] = dict(summarize(results), limits=limits, positions=results)
+    return report
+
+
+def run_ablation(suite, depth=3):
+    """
+    Run every position at a fixed depth with the whole search, then with
+    each of SWITCHES turned off in turn, to see how much of the tree each
+    one saves.
+
+    Returns:
+        A dict from "all" and "no_" plus each switch to the summary of its
+        run.
+    """
+    runs = {"all": {}}
+    runs.update({f"no_{switch}": {switch: False} for switch in SWITCHES})
+    return {
+        name: summarize(
+            [run_position(position, depth, options=options) for position in suite]
+        )
+        for name, options in runs.items()
+    }
+
+
+def time_per_call(function, arguments, repeat):
+    """
+    Returns:
+        The average microseconds function takes over every tuple of
+        arguments, running through them repeat times.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in arguments:
+            function(*args)
+    return (time.perf_counter() - start) / (repeat * len(arguments)) * 1e6
+
+
+def microbenchmarks(suite, repeat=200):
+    """
+    Time the evaluation and move generation on the suite's positions.
+
+    Returns:
+        A dict from the name of each function to its "us_per_call".
+    """
+    boards = [chess.Board(position["fen"]) for position in suite]
+    with_moves = [
+        (board, next(iter(board.legal_moves)), eval.calc_piece_activity(board))
+        for board in boards
+    ]
+    return {
+        "evaluate_board": {
+            "us_per_call": time_per_call(eval.evaluate_board, with_moves, repeat)
+        },
+        "calc_piece_activity": {
+            "us_per_call": time_per_call(
+                eval.calc_piece_activity, [(board,) for board in boards], repeat
+            )
+        },
+        "legal_moves": {
+            "us_per_call": time_per_call(
+                lambda board: list(board.legal_moves),
+                [(board,) for board in boards],
+                repeat,
+            )
+        },
+    }
+
+
+def compare(report, baseline):
+    """
+    Compare every number in a report with the same number in a baseline.
+
+    Returns:
+        A list of (name, baseline, current, change) tuples, where change is
+        the relative change as a fraction, positive when the report is
+        better.
+    """
+    rows = []
+    for section, values in report.items():
+        for metric, current in values.items():
+            if not isinstance(current, (int, float)):
+                continue
+            old = baseline.get(section, {}).get(metric)
+            if not old:
+                continue
+            change = (current - old) / old
+            fixed_depth_nodes = section == "fixed_depth" and metric == "nodes"
+            if metric in LOWER_IS_BETTER or fixed_depth_nodes:
+                change = -change
+            rows.append((f"{section}.{metric}", old, current, change))
+    return rows
+
+
+def main():
+    """
+    Run the benchmark from the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suite", default=SUITE_PATH)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--movetime", type=float, default=1.0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--save", action="store_true", help="overwrite the baseline with this run"
+    )
+    parser.add_argument(
+        "--ablation",
+        type=int,
+        metavar="DEPTH",
+        help="only compare the nodes with each search switch off at this depth",
+    )
+    options = parser.parse_args()
+
+    suite = load_suite(options.suite)
+    if options.ablation is not None:
+        ablation = run_ablation(suite, options.ablation)
+        for name, summary in ablation.items():
+            ratio = summary["nodes"] / ablation["all"]["nodes"]
+            print(
+                f"{name}: nodes {summary['nodes']} ({ratio:.2f}x), "
+                f"time {summary['time_to_depth']:.2f}s"
+            )
+        return
+    report = run_suite(suite, options.depth, options.movetime)
+    report.update(microbenchmarks(suite))
+
+    for name in ("fixed_depth", "fixed_time"):
+        summary = report[name]
+        print(
+            f"{name}: nodes {summary['nodes']}, nps {summary['nps']:.0f}, "
+            f"time {summary['time_to_depth']:.2f}s, depth {summary['depth']:.1f}, "
+            f"accuracy {summary['accuracy']:.0%}"
+        )
+    for name in ("evaluate_board", "calc_piece_activity", "legal_moves"):
+        print(f"{name}: {report[name]['us_per_call']:.1f}us per call")
+
+    if options.save:
+        with open(options.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"saved baseline to {options.baseline}")
+        return
+    try:
+        with open(options.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        print("no baseline to compare with; run with --save to make one")
+        return
+    for name, old, current, change in compare(report, baseline):
+        print(f"{name}: {old:.4g} -> {current:.4g} ({change:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
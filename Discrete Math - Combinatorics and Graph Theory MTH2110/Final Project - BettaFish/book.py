@@ -0,0 +1,173 @@
+"""
+Reads and builds Polyglot opening books, so the bot can play its first moves
+instantly instead of searching the same opening positions every game.
+"""
+
+import os
+import random
+import struct
+import sys
+import chess
+import chess.pgn
+import chess.polyglot
+
+BEST = "best"
+WEIGHTED = "weighted"
+
+# Each entry is a big-endian key, move, weight, and learn value
+ENTRY_FORMAT = ">QHHI"
+MAX_WEIGHT = 0xFFFF
+
+
+class OpeningBook:
+    """
+    Looks up moves in a Polyglot .bin book. The file is memory-mapped and
+    searched by binary search on its sorted Zobrist keys, so it's never read
+    into memory all at once.
+    """
+
+    def __init__(self, path, policy=WEIGHTED, seed=None):
+        self.path = path
+        self.policy = policy
+        self.random = random.Random(seed)
+        self.reader = chess.polyglot.open_reader(path)
+
+    def close(self):
+        """
+        Unmap the book file.
+        """
+        self.reader.close()
+
+    def moves(self, board):
+        """
+        Args:
+            board: a chess.Board() object.
+        Returns:
+            A list of (move, weight) tuples for every book move in the position.
+        """
+        return [(entry.move, entry.weight) for entry in self.reader.find_all(board)]
+
+    def choose(self, board):
+        """
+        Pick a book move for the position.
+
+        Args:
+            board: a chess.Board() object.
+        Returns:
+            A chess.Move, chosen at random in proportion to the weights or as
+            the highest weight depending on the policy, or None if the
+            position isn't in the book.
+        """
+        try:
+            if self.policy == BEST:
+                return self.reader.find(board).move
+            return self.reader.weighted_choice(board, random=self.random).move
+        except IndexError:
+            return None
+
+
+def open_book(path, policy=WEIGHTED, seed=None):
+    """
+    Returns:
+        An OpeningBook, or None if there's no book file at path.
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    return OpeningBook(path, policy, seed)
+
+
+def encode_move(board, move):
+    """
+    Encode a move the way Polyglot stores it: castling is written as the
+    king capturing its own rook, and promotions as 1 (knight) to 4 (queen).
+
+    Args:
+        board: a chess.Board() object before the move is made.
+        move: a legal chess.Move.
+    Returns:
+        An int that fits in 16 bits.
+    """
+    to_square = move.to_square
+    if board.is_castling(move):
+        rook_file = 7 if board.is_kingside_castling(move) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | move.from_square << 6 | promotion << 12
+
+
+def game_weight(result, color):
+    """
+    Returns:
+        An int weight for a move played by color in a game with this result:
+        2 for a win, 1 for a draw, and 0 for a loss or unfinished game.
+    """
+    if result == "1/2-1/2":
+        return 1
+    if result == ("1-0" if color == chess.WHITE else "0-1"):
+        return 2
+    return 0
+
+
+def build_book(pgn_paths, book_path, max_ply=16, min_games=2):
+    """
+    Build a Polyglot book from PGN games. Every move played in the first
+    max_ply plies is weighted by how well it scored, and moves played fewer
+    than min_games times are left out.
+
+    Args:
+        pgn_paths: a list of paths to PGN files.
+        book_path: the path to write the .bin book to.
+        max_ply: an int representing how many plies of each game to use.
+        min_games: an int representing how often a move has to be played.
+    Returns:
+        An int representing the number of entries written.
+    """
+    counts = {}
+    weights = {}
+    for pgn_path in pgn_paths:
+        with open(pgn_path, encoding="utf-8", errors="replace") as pgn:
+            while True:
+                game = chess.pgn.read_game(pgn)
+                if game is None:
+                    break
+                result = game.headers.get("Result", "*")
+                board = game.board()
+                for ply, move in enumerate(game.mainline_moves()):
+                    if ply >= max_ply:
+                        break
+                    entry = (
+                        chess.polyglot.zobrist_hash(board),
+                        encode_move(board, move),
+                    )
+                    counts[entry] = counts.get(entry, 0) + 1
+                    weights[entry] = weights.get(entry, 0) + game_weight(
+                        result, board.turn
+                    )
+                    board.push(move)
+
+    entries = [
+        (key, move, weights[(key, move)])
+        for (key, move), count in counts.items()
+        if count >= min_games and weights[(key, move)] > 0
+    ]
+    # Scale the weights down if any won't fit in 16 bits
+    largest = max((weight for _, _, weight in entries), default=0)
+    if largest > MAX_WEIGHT:
+        entries = [
+            (key, move, max(1, weight * MAX_WEIGHT // largest))
+            for key, move, weight in entries
+        ]
+    entries.sort(key=lambda entry: (entry[0], -entry[2]))
+
+    with open(book_path, "wb") as book:
+        for key, move, weight in entries:
+            book.write(struct.pack(ENTRY_FORMAT, key, move, weight, 0))
+    return len(entries)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: python book.py OUTPUT.bin GAMES.pgn [GAMES.pgn ...]")
+        sys.exit(1)
+    written = build_book(sys.argv[2:], sys.argv[1])
+    print(f"wrote {written} entries to {sys.argv[1]}")
@@ -3,8 +3,16 @@ Initialization of a controller which manipulates the python chess library
 object.
 """
 
+import time
 import chess
+import book
+import engine
 import minimax
+import parallel
+import stats
+import tablebase
+import timeman
+from transposition import TranspositionTable
 
 
 class ControlGame:
@@ -13,11 +21,51 @@ class ControlGame:
     for legality of moves.
     """
 
-    def __init__(self, board):
+    def __init__(
+        self,
+        board,
+        movetime=3.0,
+        max_depth=32,
+        workers=1,
+        ponder=True,
+        book_path="book.bin",
+        book_policy=book.WEIGHTED,
+        syzygy_path=None,
+        stats_log=None,
+        clock=None,
+        increment=0.0,
+    ):
         self.board = board
         self.captured_pieces_white = []
         self.captured_pieces_black = []
-        self.depth = 5
+        self.max_depth = max_depth
+        self.movetime = movetime
+        # Think times come from the bot's clock if it has one, else movetime
+        self.time_manager = timeman.TimeManager(board, movetime, clock, increment)
+        self.move_start = time.perf_counter()
+        self.table = TranspositionTable(size_mb=64)
+        # The background engine is only started the first time it's needed
+        self.engine = None
+        self.ponder = ponder
+        # The position the engine is pondering, and its ponder request's id
+        self.ponder_board = None
+        self.ponder_id = None
+        self.request_id = None
+        self.thinking = False
+        self.info = {}
+        # Book moves are played without searching until the game leaves the book
+        self.book = book.open_book(book_path, book_policy)
+        # Endgames with few enough pieces are looked up instead of searched
+        self.syzygy_path = syzygy_path
+        self.tablebase = tablebase.open_tablebase(syzygy_path)
+        # Searching with more than one worker runs in separate processes
+        self.workers = workers
+        self.parallel = None
+        if workers > 1:
+            self.parallel = parallel.ParallelSearch(workers, syzygy_path=syzygy_path)
+        # Search statistics of the last move, optionally appended to a JSONL file
+        self.stats_log = stats_log
+        self.last_stats = {}
 
     def move(self, move_from: int, move_to: int):
         """
@@ -31,7 +79,7 @@ class ControlGame:
         move = chess.Move(from_square=move_from, to_square=move_to)
         if move_promote in self.board.legal_moves:
             print("HELLO")
-            self.board.push(move_promote)
+            self.time_manager.push(self.board, move_promote)
             return True
         if move in self.board.legal_moves:
             # Check if the move is a capture
@@ -39,7 +87,7 @@ class ControlGame:
                 captured_piece = self.board.piece_at(move.to_square).symbol()
                 if self.board.turn:  # White's turn, so black piece is captured
                     self.captured_pieces_black.append(captured_piece)
-            self.board.push(move)
+            self.time_manager.push(self.board, move)
             return True
         return False
 
@@ -49,66 +97,158 @@ class ControlGame:
         """
         move = chess.Move.from_uci(string)
         if move in self.board.legal_moves:
-            self.board.push(move)
+            self.time_manager.push(self.board, move)
 
     def bot_move(self):
         """
         bot makes a move
         """
-        minmax = minimax.Minimax(self.board)
-
-        # self.is_endgame()
+        self.move_start = time.perf_counter()
+        if self.play_book_move():
+            return
+        soft, hard = self.time_manager.allot(self.board)
+
+        if self.parallel is not None:
+            results = self.parallel.search(
+                self.board,
+                max_depth=self.max_depth,
+                movetime=hard,
+                on_iteration=timeman.SearchTimer(soft, hard).on_iteration,
+            )
+            print(results[0], " ".join(move.uci() for move in self.parallel.pv))
+            search_stats = self.parallel.stats
+        else:
+            minmax = minimax.Minimax(self.board, self.table, tablebase=self.tablebase)
+            minmax.on_iteration = timeman.SearchTimer(soft, hard).on_iteration
+            self.table.reset_stats()
+            results = minmax.search(max_depth=self.max_depth, movetime=hard)
+            print(results[0], " ".join(move.uci() for move in minmax.pv))
+            search_stats = minmax.stats.as_dict()
+        if results[1] is None:
+            return  # checkmate or stalemate; there's no move to play
+        self.record_stats(search_stats, results[1])
+        self.play_bot_move(results[1])
+
+    def record_stats(self, search_stats, move):
+        """
+        Keep the statistics of the bot's last search in self.last_stats, print
+        a summary, and append them to the stats log if there is one.
 
-        results = minmax.alpha_beta_min(
-            self.depth, float("-inf"), float("inf"), chess.Move.null()
+        Args:
+            search_stats: a dict from SearchStats.as_dict().
+            move: the chess.Move the search chose.
+        """
+        self.last_stats = search_stats
+        print(
+            f"depth: {search_stats['depth']}, nodes: {search_stats['nodes']}, "
+            f"nps: {search_stats['nps']:.0f}, ebf: {search_stats['ebf']:.2f}, "
+            f"tt hit rate: {search_stats['tt_hit_rate']:.2f}, "
+            f"first move cutoffs: {search_stats['first_move_cutoff_rate']:.2f}"
         )
-        print(results[0])
-        if self.board.is_capture(results[1]):
-            self.captured_pieces_white.append(
-                self.board.piece_at(results[1].to_square).symbol()
-            )
-        self.board.push(results[1])
+        if self.stats_log is not None:
+            record = dict(search_stats, fen=self.board.fen(), move=move.uci())
+            stats.write_jsonl(self.stats_log, record)
 
-    def is_endgame(self):
+    def play_bot_move(self, move):
         """
-        Determines if the game is in the endgame phase based on material count.
+        Push the bot's move, keeping track of the piece it captured and the
+        time it took
+        """
+        if self.board.is_capture(move):
+            if self.board.is_en_passant(move):
+                captured_piece = "P" if self.board.turn == chess.BLACK else "p"
+            else:
+                captured_piece = self.board.piece_at(move.to_square).symbol()
+            self.captured_pieces_white.append(captured_piece)
+        self.time_manager.spend(time.perf_counter() - self.move_start)
+        self.time_manager.push(self.board, move)
 
-        Args:
-            board (chess.Board): The current board state.
+    def play_book_move(self):
+        """
+        Play a move from the opening book if the position is in it.
 
         Returns:
-            bool: True if it's endgame, False otherwise.
-        """
-        # Mapping dictionary for piece symbols to chess constants
-        piece_map = {
-            "P": chess.PAWN,
-            "N": chess.KNIGHT,
-            "B": chess.BISHOP,
-            "R": chess.ROOK,
-            "Q": chess.QUEEN,
-            "K": chess.KING,
-        }
-        piece_vals = {"P": 100, "N": 280, "B": 320, "R": 479, "Q": 929, "K": 60000}
-
-        total_material = 0
-
-        for piece_type, value in piece_vals.items():
-            # Get the corresponding chess constant
-            chess_piece = piece_map[piece_type]
-
-            # Calculate total material for major pieces
-            if chess_piece in (chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN):
-                total_material += (
-                    len(self.board.pieces(chess_piece, chess.WHITE)) * value
-                )
-                total_material += (
-                    len(self.board.pieces(chess_piece, chess.BLACK)) * value
+            bool: True if a book move was played.
+        """
+        if self.book is None:
+            return False
+        move = self.book.choose(self.board)
+        if move is None:
+            self.book.close()
+            self.book = None  # once out of book, the game can't return to it
+            return False
+        print("book:", move.uci())
+        self.play_bot_move(move)
+        return True
+
+    def start_bot_move(self):
+        """
+        Start the bot thinking about its move in the background engine. Call
+        poll_bot_move() regularly to find out when it has decided. Book moves
+        are played straight away. If the player made the reply the engine was
+        pondering, its ponder search carries on as the real one.
+        """
+        self.move_start = time.perf_counter()
+        ponder_id, self.ponder_id = self.ponder_id, None
+        if self.play_book_move():
+            return
+        if self.engine is None:
+            self.engine = engine.BackgroundEngine(syzygy_path=self.syzygy_path)
+        soft, hard = self.time_manager.allot(self.board)
+        if ponder_id is not None and self.board == self.ponder_board:
+            self.request_id = ponder_id
+            self.engine.ponderhit(ponder_id, movetime=hard, soft_time=soft)
+        else:
+            self.request_id = self.engine.go(
+                self.board, movetime=hard, max_depth=self.max_depth, soft_time=soft
+            )
+        self.thinking = True
+        self.info = {"depth": 0, "nodes": 0}
+
+    def poll_bot_move(self):
+        """
+        Check for messages from the background engine, updating self.info with
+        the search's depth and node count and playing the move once it's
+        found. After playing, the engine ponders the position after the
+        player's expected reply: if the player makes it, start_bot_move()
+        turns that search into the real one, and otherwise it has at least
+        warmed the table.
+
+        Returns:
+            bool: True if the bot played a move.
+        """
+        if self.engine is None:
+            return False
+        for response in self.engine.poll():
+            if not self.thinking or response["id"] != self.request_id:
+                continue  # left over from an abandoned search or ponder
+            if response["type"] == "info":
+                self.info = {"depth": response["depth"], "nodes": response["nodes"]}
+                continue
+            self.thinking = False
+            print(response["score"])
+            if response["move"] is None:
+                return False
+            self.record_stats(response["stats"], chess.Move.from_uci(response["move"]))
+            self.play_bot_move(chess.Move.from_uci(response["move"]))
+            if self.ponder and response["ponder"] is not None:
+                self.ponder_board = self.board.copy()
+                self.ponder_board.push_uci(response["ponder"])
+                self.ponder_id = self.engine.go(
+                    self.ponder_board, max_depth=self.max_depth, ponder=True
                 )
+            return True
+        return False
 
-        # Define a threshold for endgame based on material
-        if total_material <= 2500:  # Adjust threshold as needed
-            self.depth = 6
-        if total_material <= 1500:  # Adjust threshold as needed
-            self.depth = 7
-        if total_material <= 1000:  # Adjust threshold as needed
-            self.depth = 8
+    def close(self):
+        """
+        Shut down any engine processes.
+        """
+        if self.engine is not None:
+            self.engine.close()
+        if self.book is not None:
+            self.book.close()
+        if self.tablebase is not None:
+            self.tablebase.close()
+        if self.parallel is not None:
+            self.parallel.close()
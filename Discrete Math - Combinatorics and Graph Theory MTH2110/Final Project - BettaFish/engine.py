@@ -0,0 +1,237 @@
+"""
+Runs the chess engine in a background process so the game window keeps
+drawing and responding to events while the bot thinks.
+"""
+
+import multiprocessing
+import queue
+import time
+import chess
+import minimax
+import tablebase
+import timeman
+from transposition import TranspositionTable
+
+# Seconds between progress messages sent back while searching
+INFO_INTERVAL = 0.1
+
+# Seconds a finished ponder search waits between checks for a ponderhit
+PONDER_WAIT = 0.01
+
+
+def engine_worker(
+    requests, responses, active_id, table_mb, syzygy_path=None, hit=None, limits=None
+):
+    """
+    Loop in the background process: take a search request, search until it
+    finishes or is replaced by a newer request, and send back the result.
+
+    A ponder request searches without a time limit and sends nothing back
+    until it gets a ponderhit. From then on it's the real search, with the
+    time limits of the hit counted from when the worker sees it.
+
+    Args:
+        requests: a multiprocessing.Queue of request dicts, or None to quit.
+        responses: a multiprocessing.Queue the "info" and "bestmove" dicts are
+            put on.
+        active_id: a shared multiprocessing.Value holding the id of the only
+            request that should still be searched.
+        table_mb: the size of the transposition table, kept between requests
+            so pondering warms it up for the next search.
+        syzygy_path: an optional directory of Syzygy tablebase files.
+        hit: a shared multiprocessing.Value holding the id of the ponder
+            request that got a ponderhit.
+        limits: a shared multiprocessing.Array of the hit's (soft_time,
+            movetime), with a negative soft_time for none.
+    """
+    table = TranspositionTable(table_mb)
+    endgames = tablebase.open_tablebase(syzygy_path)
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id = request["id"]
+        if active_id.value != request_id:
+            continue  # replaced before it started
+
+        board = chess.Board(request["fen"])
+        for move in request["moves"]:
+            board.push_uci(move)
+        searcher = minimax.Minimax(board, table, tablebase=endgames)
+        # hit_start is when a ponder search saw its ponderhit, and timer
+        # holds the limits it had from then on
+        hit_start = [None]
+        timer = [None]
+
+        def ponder_hit():
+            if hit_start[0] is None and hit.value == request_id:
+                hit_start[0] = time.perf_counter()
+                soft_time, movetime = limits[:]
+                timer[0] = (
+                    timeman.SearchTimer(soft_time, movetime) if soft_time >= 0 else None
+                )
+            return hit_start[0] is not None
+
+        def stop_check():
+            if active_id.value != request_id:
+                return True
+            if not request["ponder"] or not ponder_hit():
+                return False
+            return time.perf_counter() - hit_start[0] >= limits[1]
+
+        def on_iteration(iteration):
+            if not ponder_hit() or timer[0] is None:
+                return False
+            elapsed = time.perf_counter() - hit_start[0]
+            return timer[0].on_iteration(dict(iteration, time=elapsed))
+
+        searcher.stop_check = stop_check
+        last_info = [0.0]
+
+        def send_info(search):
+            now = time.perf_counter()
+            if now - last_info[0] >= INFO_INTERVAL:
+                last_info[0] = now
+                responses.put(
+                    {
+                        "type": "info",
+                        "id": request_id,
+                        "depth": search.depth,
+                        "nodes": search.nodes,
+                    }
+                )
+
+        searcher.progress = send_info
+        if request["ponder"]:
+            searcher.on_iteration = on_iteration
+        elif request["soft_time"] is not None:
+            soft_timer = timeman.SearchTimer(request["soft_time"], request["movetime"])
+            searcher.on_iteration = soft_timer.on_iteration
+        score, move = searcher.search(
+            max_depth=request["max_depth"], movetime=request["movetime"]
+        )
+        if request["ponder"]:
+            # A ponder search that ends early holds its move for the hit
+            while active_id.value == request_id and not ponder_hit():
+                time.sleep(PONDER_WAIT)
+            if active_id.value != request_id:
+                continue
+        responses.put(
+            {
+                "type": "bestmove",
+                "id": request_id,
+                "move": move.uci() if move else None,
+                "ponder": searcher.pv[1].uci() if len(searcher.pv) > 1 else None,
+                "score": score,
+                "depth": len(searcher.iterations),
+                "nodes": searcher.nodes,
+                "stats": searcher.stats.as_dict(),
+            }
+        )
+
+
+class BackgroundEngine:
+    """
+    Talks to an engine_worker process through a request queue and a response
+    queue. Only the newest request is searched; starting a new one or calling
+    stop() makes the worker abandon whatever it is searching.
+    """
+
+    def __init__(self, table_mb=64, syzygy_path=None):
+        self.requests = multiprocessing.Queue()
+        self.responses = multiprocessing.Queue()
+        self.active_id = multiprocessing.Value("i", -1)
+        self.hit = multiprocessing.Value("i", -1)
+        self.limits = multiprocessing.Array("d", 2)
+        self.next_id = 0
+        self.process = multiprocessing.Process(
+            target=engine_worker,
+            args=(
+                self.requests,
+                self.responses,
+                self.active_id,
+                table_mb,
+                syzygy_path,
+                self.hit,
+                self.limits,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+    def go(self, board, movetime=None, max_depth=64, soft_time=None, ponder=False):
+        """
+        Start searching a position, abandoning any earlier search.
+
+        Args:
+            board: a chess.Board() object; it isn't modified.
+            movetime: an optional number of seconds to think for; None searches
+                until stop() is called or max_depth is reached, as pondering
+                does.
+            max_depth: an int representing the deepest iteration to run.
+            soft_time: an optional number of seconds after which no new
+                iteration is started, adjusted by a timeman.SearchTimer;
+                movetime is then the hard limit.
+            ponder: a bool; if True, the search is of the position after the
+                reply the opponent is expected to play, and its move is only
+                sent once ponderhit() is called.
+        Returns:
+            The int id that this request's responses will carry.
+        """
+        request_id = self.next_id
+        self.next_id += 1
+        self.active_id.value = request_id
+        self.requests.put(
+            {
+                "id": request_id,
+                "fen": board.root().fen(),
+                "moves": [move.uci() for move in board.move_stack],
+                "movetime": movetime,
+                "max_depth": max_depth,
+                "soft_time": soft_time,
+                "ponder": ponder,
+            }
+        )
+        return request_id
+
+    def ponderhit(self, request_id, movetime, soft_time=None):
+        """
+        Turn a ponder search into the real search, once the opponent has
+        played the expected reply, keeping what it has searched so far.
+
+        Args:
+            request_id: the int id go() returned for the ponder request.
+            movetime: the number of seconds it may search from now on.
+            soft_time: an optional number of seconds after which no new
+                iteration is started, as in go().
+        """
+        self.limits[:] = [-1.0 if soft_time is None else soft_time, movetime]
+        self.hit.value = request_id
+
+    def stop(self):
+        """
+        Make the worker abandon its current search.
+        """
+        self.active_id.value = -1
+
+    def poll(self):
+        """
+        Returns:
+            A list of every response dict that has arrived, without waiting.
+        """
+        responses = []
+        while True:
+            try:
+                responses.append(self.responses.get_nowait())
+            except queue.Empty:
+                return responses
+
+    def close(self):
+        """
+        Stop the worker process.
+        """
+        self.stop()
+        self.requests.put(None)
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -4,6 +4,8 @@ structure, piece development, etc. and returns an int that's positive if white
 is better, and negative if black is better.
 """
 
+import json
+import os
 import chess
 import logging
 import numpy as np
@@ -100,406 +102,6 @@ b_king_pst = np.array(
     ]
 )
 w_king_pst = np.flipud(b_king_pst)
-pst_dic = {
-    # The bot is playing as black
-    "P": (
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,  #       ^ player | idx = 0
-        78,
-        83,
-        86,
-        73,
-        102,
-        82,
-        85,
-        90,  #       |        |           .
-        7,
-        29,
-        21,
-        44,
-        40,
-        31,
-        44,
-        7,  #       |        |            .
-        -17,
-        16,
-        -2,
-        15,
-        14,
-        0,
-        15,
-        -13,  #       |        |             .
-        -26,
-        3,
-        10,
-        9,
-        6,
-        1,
-        0,
-        -23,  #       |        |              .
-        -22,
-        9,
-        5,
-        -11,
-        -10,
-        -2,
-        3,
-        -19,  #       |        |               .
-        -31,
-        8,
-        -7,
-        -37,
-        -36,
-        -14,
-        3,
-        -31,  #       |        |                .
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-    ),  #   BOT |        V                  idx = 63
-    "N": (
-        -66,
-        -53,
-        -75,
-        -75,
-        -10,
-        -55,
-        -58,
-        -70,
-        -3,
-        -6,
-        100,
-        -36,
-        4,
-        62,
-        -4,
-        -14,
-        10,
-        67,
-        1,
-        74,
-        73,
-        27,
-        62,
-        -2,
-        24,
-        24,
-        45,
-        37,
-        33,
-        41,
-        25,
-        17,
-        -1,
-        5,
-        31,
-        21,
-        22,
-        35,
-        2,
-        0,
-        -18,
-        10,
-        13,
-        22,
-        18,
-        15,
-        11,
-        -14,
-        -23,
-        -15,
-        2,
-        0,
-        2,
-        0,
-        -23,
-        -20,
-        -74,
-        -23,
-        -26,
-        -24,
-        -19,
-        -35,
-        -22,
-        -69,
-    ),
-    "B": (
-        -59,
-        -78,
-        -82,
-        -76,
-        -23,
-        -107,
-        -37,
-        -50,
-        -11,
-        20,
-        35,
-        -42,
-        -39,
-        31,
-        2,
-        -22,
-        -9,
-        39,
-        -32,
-        41,
-        52,
-        -10,
-        28,
-        -14,
-        25,
-        17,
-        20,
-        34,
-        26,
-        25,
-        15,
-        10,
-        13,
-        10,
-        17,
-        23,
-        17,
-        16,
-        0,
-        7,
-        14,
-        25,
-        24,
-        15,
-        8,
-        25,
-        20,
-        15,
-        19,
-        20,
-        11,
-        6,
-        7,
-        6,
-        20,
-        16,
-        -7,
-        2,
-        -15,
-        -12,
-        -14,
-        -15,
-        -10,
-        -10,
-    ),
-    "R": (
-        35,
-        29,
-        33,
-        4,
-        37,
-        33,
-        56,
-        50,
-        55,
-        29,
-        56,
-        67,
-        55,
-        62,
-        34,
-        60,
-        19,
-        35,
-        28,
-        33,
-        45,
-        27,
-        25,
-        15,
-        0,
-        5,
-        16,
-        13,
-        18,
-        -4,
-        -9,
-        -6,
-        -28,
-        -35,
-        -16,
-        -21,
-        -13,
-        -29,
-        -46,
-        -30,
-        -42,
-        -28,
-        -42,
-        -25,
-        -25,
-        -35,
-        -26,
-        -46,
-        -53,
-        -38,
-        -31,
-        -26,
-        -29,
-        -43,
-        -44,
-        -53,
-        -30,
-        -24,
-        -18,
-        5,
-        -2,
-        -18,
-        -31,
-        -32,
-    ),
-    "Q": (
-        6,
-        1,
-        -8,
-        -104,
-        69,
-        24,
-        88,
-        26,
-        14,
-        32,
-        60,
-        -10,
-        20,
-        76,
-        57,
-        24,
-        -2,
-        43,
-        32,
-        60,
-        72,
-        63,
-        43,
-        2,
-        1,
-        -16,
-        22,
-        17,
-        25,
-        20,
-        -13,
-        -6,
-        -14,
-        -15,
-        -2,
-        -5,
-        -1,
-        -10,
-        -20,
-        -22,
-        -30,
-        -6,
-        -13,
-        -11,
-        -16,
-        -11,
-        -16,
-        -27,
-        -36,
-        -18,
-        0,
-        -19,
-        -15,
-        -15,
-        -21,
-        -38,
-        -39,
-        -30,
-        -31,
-        -13,
-        -31,
-        -36,
-        -34,
-        -42,
-    ),
-    "K": (
-        4,
-        54,
-        47,
-        -99,
-        -99,
-        60,
-        83,
-        -62,
-        -32,
-        10,
-        55,
-        56,
-        56,
-        55,
-        10,
-        3,
-        -62,
-        12,
-        -57,
-        44,
-        -67,
-        28,
-        37,
-        -31,
-        -55,
-        50,
-        11,
-        -4,
-        -19,
-        13,
-        0,
-        -49,
-        -55,
-        -43,
-        -52,
-        -28,
-        -51,
-        -47,
-        -8,
-        -50,
-        -47,
-        -42,
-        -43,
-        -79,
-        -64,
-        -32,
-        -29,
-        -32,
-        -4,
-        3,
-        -14,
-        -50,
-        -57,
-        -18,
-        13,
-        4,
-        17,
-        30,
-        -3,
-        -14,
-        6,
-        -1,
-        40,
-        18,
-    ),
-}
-
 pst = {
     "P": (b_pawn_pst, w_pawn_pst),
     "N": (b_knight_pst, w_knight_pst),
@@ -508,6 +110,33 @@ pst = {
     "Q": (b_queen_pst, w_queen_pst),
     "K": (b_king_pst, w_king_pst),
 }
+
+# piece_vals indexed by chess piece type, with 0 for an empty square
+piece_type_vals = [0] + [
+    piece_vals[chess.piece_symbol(p).upper()] for p in chess.PIECE_TYPES
+]
+
+
+def flatten_pst(color):
+    """
+    Flattens one color's piece-square tables into a single list so a piece on
+    a square can be looked up with one index instead of [row][col].
+
+    Args:
+        color: chess.WHITE or chess.BLACK.
+    Returns:
+        A list of 7 * 64 ints where index piece_type * 64 + square holds the
+        PST value of that piece on that square.
+    """
+    flat = [0] * 64
+    for piece_type in chess.PIECE_TYPES:
+        table = pst[chess.piece_symbol(piece_type).upper()][color]
+        flat += [int(table[square // 8, square % 8]) for square in chess.SQUARES]
+    return flat
+
+
+# flat_pst[color][piece_type * 64 + square], black first like pst
+flat_pst = (flatten_pst(chess.BLACK), flatten_pst(chess.WHITE))
 # def sum_piece_vals(board_epd=chess.Board().epd()):
 #     """
 #     Sums up the piece values of all the pieces on the board.
@@ -548,32 +177,140 @@ def find_piece_index(board_epd="", idx=0):
     return index
 
 
+def bit_planes(board=chess.Board()):
+    """
+    Expands the board's occupancy bitboards into 0/1 planes, one row of 64
+    squares for every (color, piece type) pair.
+
+    Args:
+        board: A `chess.Board()` object.
+    Returns:
+        A (12, 64) numpy array of uint8; row color_index * 6 + piece_type - 1
+        (white first) has a 1 on every square holding that piece.
+    """
+    masks = np.array(
+        [
+            board.pieces_mask(piece_type, color)
+            for color in (chess.WHITE, chess.BLACK)
+            for piece_type in chess.PIECE_TYPES
+        ],
+        dtype="<u8",
+    )
+    return np.unpackbits(masks.view(np.uint8), bitorder="little").reshape(12, 64)
+
+
+def build_pst_matrix():
+    """
+    Stacks the piece values and PSTs into one signed matrix that lines up with
+    bit_planes(): white rows are positive and black rows negative.
+
+    Returns:
+        A (12, 64) numpy array of int64.
+    """
+    matrix = np.zeros((12, 64), dtype=np.int64)
+    for color_index, color in enumerate((chess.WHITE, chess.BLACK)):
+        sign = 1 if color else -1
+        for piece_type in chess.PIECE_TYPES:
+            row = color_index * 6 + piece_type - 1
+            matrix[row] = sign * (
+                piece_type_vals[piece_type]
+                + np.array(flat_pst[color][piece_type * 64 : piece_type * 64 + 64])
+            )
+    return matrix
+
+
+pst_matrix = build_pst_matrix()
+pst_vector = pst_matrix.reshape(-1)
+
+# Tables written by texel.py; loaded on import if the file exists
+TUNED_TABLES_PATH = os.path.join(os.path.dirname(__file__), "tuned_tables.json")
+
+
+def tables_dict():
+    """
+    Returns:
+        A dict of the current "piece_vals" and "pst" (black's 8x8 table for
+        each piece symbol, as nested lists), in the format load_tables()
+        reads.
+    """
+    return {
+        "piece_vals": dict(piece_vals),
+        "pst": {symbol: tables[0].tolist() for symbol, tables in pst.items()},
+    }
+
+
+def apply_tables(tables):
+    """
+    Replace the piece values and PSTs with new ones. Everything derived from
+    them is updated in place, so modules that imported piece_vals,
+    piece_type_vals, flat_pst or pst_vector see the new values too.
+
+    Args:
+        tables: a dict in the format of tables_dict().
+    """
+    piece_vals.update(tables["piece_vals"])
+    for symbol, rows in tables["pst"].items():
+        # The white tables are flipped views of the black ones
+        pst[symbol][0][:] = np.array(rows)
+    piece_type_vals[:] = [0] + [
+        piece_vals[chess.piece_symbol(p).upper()] for p in chess.PIECE_TYPES
+    ]
+    flat_pst[chess.BLACK][:] = flatten_pst(chess.BLACK)
+    flat_pst[chess.WHITE][:] = flatten_pst(chess.WHITE)
+    pst_matrix[:] = build_pst_matrix()
+
+
+def load_tables(path=TUNED_TABLES_PATH):
+    """
+    Load piece values and PSTs from a JSON file written by texel.py.
+
+    Args:
+        path: the path of the JSON file.
+    """
+    with open(path, encoding="utf-8") as tables_file:
+        apply_tables(json.load(tables_file))
+
+
+if os.path.exists(TUNED_TABLES_PATH):
+    load_tables()
+
+
 def calc_piece_activity(board=chess.Board()):
     """
-    Computes the score based on piece activity and material value using numpy arrays
-    for PST lookup and evaluates from Black's perspective.
+    Computes the score based on piece activity and material value with one dot
+    product of the board's bit planes against the stacked PST matrix.
 
     Args:
         board: A `chess.Board()` object.
     Returns:
         An integer score; positive for White's advantage, negative for Black's advantage.
     """
-    sum = 0
-    board_epd = board.epd().split(" ")[0]  # Get only the board positions
+    return int(bit_planes(board).reshape(-1) @ pst_vector)
 
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            piece_symbol = piece.symbol()
-            is_white = piece.color  # True if white, False if black
-            pst_table = pst[piece_symbol.upper()][is_white]  # Get relevant PST
-            pst_value = pst_table[square // 8, square % 8]
-            piece_value = piece_vals[piece_symbol.upper()]
 
-            # Accumulate score (positive for White, negative for Black)
-            sum += (1 if is_white else -1) * (piece_value + pst_value)
+def calc_piece_activity_batch(boards):
+    """
+    Scores many boards at once, for tuning or analysing positions in bulk.
 
-    return sum
+    Args:
+        boards: a list of `chess.Board()` objects.
+    Returns:
+        A numpy array of int64 scores, one per board, each equal to
+        calc_piece_activity() of that board.
+    """
+    if not boards:
+        return np.zeros(0, dtype=np.int64)
+    masks = np.array(
+        [
+            board.pieces_mask(piece_type, color)
+            for board in boards
+            for color in (chess.WHITE, chess.BLACK)
+            for piece_type in chess.PIECE_TYPES
+        ],
+        dtype="<u8",
+    )
+    planes = np.unpackbits(masks.view(np.uint8), bitorder="little")
+    return planes.reshape(len(boards), 12 * 64) @ pst_vector
 
 
 def evaluate_board(
@@ -614,9 +351,8 @@ def evaluate_board(
 
         # Handle en passant
         if board.is_en_passant(move):
-            capture_square += (
-                8  # the pawn that got en-passant'd would be behind the attacking pawn
-            )
+            # the pawn that got en-passant'd would be behind the attacking pawn
+            capture_square += -8 if board.turn else 8
 
         # Only get a captured piece if there was a capture
         cptd_piece = board.piece_at(capture_square).symbol().upper()
@@ -644,3 +380,137 @@ def evaluate_board(
 
     # Return the final evaluated score without additional overhead
     return side * (score + pst_dif + capture_dif)
+
+
+class Evaluator:
+    """
+    Keeps the material and piece-square totals of both colors up to date as
+    moves are made and unmade, so scoring a position costs O(1) per move
+    instead of a pass over the whole board.
+
+    Moves must be made with push() and unmade with pop() so the totals follow
+    the board.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.stack = []
+        self.material = [0, 0]  # [black, white]
+        self.positional = [0, 0]
+        for square, piece in board.piece_map().items():
+            self.material[piece.color] += piece_type_vals[piece.piece_type]
+            self.positional[piece.color] += flat_pst[piece.color][
+                piece.piece_type * 64 + square
+            ]
+
+    def score(self):
+        """
+        Returns:
+            An int where a positive number means white is favored, equal to
+            calc_piece_activity() of the current board.
+        """
+        material = self.material
+        positional = self.positional
+        return material[1] + positional[1] - material[0] - positional[0]
+
+    def relative_score(self):
+        """
+        Returns:
+            An int where a positive number means the side to move is favored.
+        """
+        return self.score() if self.board.turn else -self.score()
+
+    def move_deltas(self, move):
+        """
+        Works out how a move changes each color's totals without making it.
+
+        Args:
+            move: a legal chess.Move object, or chess.Move.null().
+        Returns:
+            A (material_us, positional_us, material_them, positional_them)
+            tuple of changes, where us is the side making the move.
+        """
+        if not move:
+            # A null move only passes the turn
+            return (0, 0, 0, 0)
+        board = self.board
+        us = board.turn
+        from_square = move.from_square
+        to_square = move.to_square
+        table_us = flat_pst[us]
+        piece_type = board.piece_type_at(from_square)
+
+        material_us = 0
+        positional_us = -table_us[piece_type * 64 + from_square]
+        if move.promotion:
+            material_us = piece_type_vals[move.promotion] - piece_type_vals[chess.PAWN]
+            positional_us += table_us[move.promotion * 64 + to_square]
+        else:
+            positional_us += table_us[piece_type * 64 + to_square]
+
+        if piece_type == chess.KING and abs(to_square - from_square) == 2:
+            # Castling also moves the rook next to the king
+            if to_square > from_square:
+                rook_from, rook_to = from_square + 3, from_square + 1
+            else:
+                rook_from, rook_to = from_square - 4, from_square - 1
+            positional_us += (
+                table_us[chess.ROOK * 64 + rook_to]
+                - table_us[chess.ROOK * 64 + rook_from]
+            )
+
+        material_them = 0
+        positional_them = 0
+        captured_square = to_square
+        captured = board.piece_type_at(to_square)
+        if (
+            piece_type == chess.PAWN
+            and captured is None
+            and board.ep_square == to_square
+        ):
+            captured_square = to_square - 8 if us else to_square + 8
+            captured = chess.PAWN
+        if captured:
+            material_them = -piece_type_vals[captured]
+            positional_them = -flat_pst[not us][captured * 64 + captured_square]
+        return (material_us, positional_us, material_them, positional_them)
+
+    def score_after(self, move):
+        """
+        Returns:
+            The score() the board would have after a move, without making it.
+        """
+        material_us, positional_us, material_them, positional_them = self.move_deltas(
+            move
+        )
+        change = material_us + positional_us - material_them - positional_them
+        return self.score() + (change if self.board.turn else -change)
+
+    def push(self, move):
+        """
+        Make a move on the board and update the totals.
+        """
+        material_us, positional_us, material_them, positional_them = self.move_deltas(
+            move
+        )
+        material = self.material
+        positional = self.positional
+        self.stack.append((material[0], material[1], positional[0], positional[1]))
+        us = self.board.turn
+        material[us] += material_us
+        positional[us] += positional_us
+        material[not us] += material_them
+        positional[not us] += positional_them
+        self.board.push(move)
+
+    def pop(self):
+        """
+        Unmake the last move on the board and restore the totals.
+
+        Returns:
+            The chess.Move that was unmade.
+        """
+        material = self.material
+        positional = self.positional
+        material[0], material[1], positional[0], positional[1] = self.stack.pop()
+        return self.board.pop()
@@ -28,12 +28,12 @@ def main():
             # do things when user mouse presses something
             chess_view.user_interface(event)
 
-        chess_view.draw()  # draw the chess board onto next screen
-
-        pygame.display.flip()  # update the screen
+        # draw what changed onto the screen, and update only those parts
+        pygame.display.update(chess_view.draw())
 
         clock.tick(30)  # 30 fps
 
+    chess_view.control.close()  # stop the background engine
     pygame.quit()
 
 
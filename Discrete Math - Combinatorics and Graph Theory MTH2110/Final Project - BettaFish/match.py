@@ -0,0 +1,361 @@
+"""
+Plays two engine configurations against each other over a pool of worker
+processes, to measure whether a change makes the engine stronger.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import chess
+import chess.engine
+import chess.pgn
+import bench
+import minimax
+from transposition import TranspositionTable
+
+OPENINGS_PATH = os.path.join(os.path.dirname(__file__), "openings.epd")
+
+# Games still going after this many plies are scored as draws
+MAX_PLIES = 300
+
+
+class SearchPlayer:
+    """
+    Plays moves with this tree's Minimax, built with the options of a
+    configuration, such as {"lmr": False}. The transposition table is kept
+    for the whole game, as it is in the GUI.
+    """
+
+    def __init__(self, options, table_mb=16):
+        self.options = options
+        self.table = TranspositionTable(table_mb)
+
+    def play(self, board, movetime=None, nodes=None):
+        """
+        Returns:
+            The chess.Move chosen within the time or node limit.
+        """
+        searcher = minimax.Minimax(board, self.table, **self.options)
+        move = searcher.search(movetime=movetime, max_nodes=nodes)[1]
+        return move if move is not None else next(iter(board.legal_moves))
+
+    def close(self):
+        """
+        Nothing to shut down.
+        """
+
+
+class UciPlayer:
+    """
+    Plays moves with a UCI engine, such as uci.py in another checkout of
+    this repository, started with the command of a configuration.
+    """
+
+    def __init__(self, command):
+        self.engine = chess.engine.SimpleEngine.popen_uci(command)
+
+    def play(self, board, movetime=None, nodes=None):
+        """
+        Returns:
+            The chess.Move chosen within the time or node limit.
+        """
+        limit = chess.engine.Limit(time=movetime, nodes=nodes)
+        return self.engine.play(board, limit).move
+
+    def close(self):
+        """
+        Quit the engine process.
+        """
+        self.engine.quit()
+
+
+def make_player(config):
+    """
+    Args:
+        config: a dict that's either {"uci": command} for a UCI engine, where
+            command is a path to a Python script or a list of arguments, or
+            {"options": {...}} of keyword arguments for Minimax.
+    Returns:
+        A SearchPlayer or UciPlayer.
+    """
+    if "uci" in config:
+        command = config["uci"]
+        if isinstance(command, str):
+            command = [sys.executable, command]
+        return UciPlayer(command)
+    return SearchPlayer(config.get("options", {}))
+
+
+def play_game(job):
+    """
+    Play one game in a worker process.
+
+    Args:
+        job: a dict with the "opening" FEN, the "white" and "black" configs
+            and their "white_name" and "black_name", the "movetime" and
+            "nodes" limits per move, the "max_plies", and the game "round".
+    Returns:
+        A dict with the "result" string, the job's "a_is_white" flag, and the
+        game's "pgn" text.
+    """
+    board = chess.Board(job["opening"])
+    players = {
+        chess.WHITE: make_player(job["white"]),
+        chess.BLACK: make_player(job["black"]),
+    }
+    try:
+        while not board.is_game_over(claim_draw=True):
+            if len(board.move_stack) >= job["max_plies"]:
+                break
+            player = players[board.turn]
+            board.push(player.play(board, job["movetime"], job["nodes"]))
+    finally:
+        for player in players.values():
+            player.close()
+
+    outcome = board.outcome(claim_draw=True)
+    result = outcome.result() if outcome else "1/2-1/2"
+    game = chess.pgn.Game.from_board(board)
+    game.headers["Event"] = "BettaFish self-play"
+    game.headers["Round"] = str(job["round"])
+    game.headers["White"] = job["white_name"]
+    game.headers["Black"] = job["black_name"]
+    game.headers["Result"] = result
+    game.headers["Opening"] = job["opening_id"]
+    return {"result": result, "a_is_white": job["a_is_white"], "pgn": str(game)}
+
+
+def score_for_a(game):
+    """
+    Returns:
+        1, 0.5, or 0 for engine A's result in a finished game.
+    """
+    if game["result"] == "1/2-1/2":
+        return 0.5
+    white_won = game["result"] == "1-0"
+    return 1.0 if white_won == game["a_is_white"] else 0.0
+
+
+def elo_from_score(score):
+    """
+    Returns:
+        The Elo difference that gives an expected score (0-1).
+    """
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def score_from_elo(elo):
+    """
+    Returns:
+        The expected score (0-1) for an Elo difference.
+    """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_estimate(wins, draws, losses):
+    """
+    Estimate engine A's Elo difference over engine B.
+
+    Returns:
+        An (elo, margin) tuple, where the true difference is within
+        elo +/- margin with about 95% confidence.
+    """
+    games = wins + draws + losses
+    if not games:
+        return (0.0, float("inf"))
+    score = (wins + draws / 2) / games
+    variance = (wins + draws / 4) / games - score**2
+    error = 1.96 * math.sqrt(max(variance, 0) / games)
+    low = elo_from_score(score - error)
+    high = elo_from_score(score + error)
+    return (elo_from_score(score), (high - low) / 2)
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """
+    The log-likelihood ratio of the sequential probability ratio test, using
+    the normal approximation to the trinomial game results.
+
+    Args:
+        wins, draws, losses: ints counting engine A's results.
+        elo0: the Elo difference of the null hypothesis.
+        elo1: the Elo difference of the alternative hypothesis.
+    Returns:
+        A float; large positive values favor elo1 and negative ones elo0.
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins + draws / 4) / games - score**2
+    if variance <= 0:
+        return 0.0
+    score0 = score_from_elo(elo0)
+    score1 = score_from_elo(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha=0.05, beta=0.05):
+    """
+    Returns:
+        The (lower, upper) LLR bounds: below lower accept elo0, above upper
+        accept elo1.
+    """
+    return (math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha))
+
+
+def match_jobs(config_a, config_b, openings, games, movetime, nodes, max_plies):
+    """
+    Returns:
+        A list of play_game() jobs. Each opening is played twice with the
+        colors swapped, cycling through the openings until there are enough
+        games.
+    """
+    jobs = []
+    for round_number in range(games):
+        opening = openings[(round_number // 2) % len(openings)]
+        a_is_white = round_number % 2 == 0
+        white, black = (config_a, config_b) if a_is_white else (config_b, config_a)
+        jobs.append(
+            {
+                "opening": opening["fen"],
+                "opening_id": opening["id"],
+                "white": white,
+                "black": black,
+                "white_name": "A" if a_is_white else "B",
+                "black_name": "B" if a_is_white else "A",
+                "a_is_white": a_is_white,
+                "movetime": movetime,
+                "nodes": nodes,
+                "max_plies": max_plies,
+                "round": round_number + 1,
+            }
+        )
+    return jobs
+
+
+def run_match(
+    config_a,
+    config_b,
+    openings_path=OPENINGS_PATH,
+    games=100,
+    movetime=None,
+    nodes=None,
+    workers=None,
+    sprt=None,
+    pgn_path=None,
+    max_plies=MAX_PLIES,
+):
+    """
+    Play a match between two configurations.
+
+    Args:
+        config_a: the config (see make_player()) being tested.
+        config_b: the config it's compared against.
+        openings_path: an EPD file of starting positions.
+        games: an int representing the most games to play.
+        movetime: an optional number of seconds per move.
+        nodes: an optional int representing the most nodes per move.
+        workers: an int representing the processes to play games in at once.
+        sprt: an optional (elo0, elo1) tuple; the match stops as soon as the
+            test accepts either hypothesis.
+        pgn_path: an optional file to append every game to.
+        max_plies: an int representing when to score a long game as a draw.
+    Returns:
+        A dict with A's "wins", "draws", and "losses", its "elo" and 95%
+        "margin", the "llr" and SPRT "verdict" (None if undecided or not
+        run), and the PGN text of every game in "pgn".
+    """
+    if movetime is None and nodes is None:
+        raise ValueError("a match needs a movetime or nodes limit")
+    openings = bench.load_suite(openings_path)
+    jobs = match_jobs(config_a, config_b, openings, games, movetime, nodes, max_plies)
+    counts = {1.0: 0, 0.5: 0, 0.0: 0}
+    pgns = []
+    llr = 0.0
+    verdict = None
+    lower, upper = sprt_bounds()
+
+    pool = multiprocessing.Pool(workers or multiprocessing.cpu_count())
+    try:
+        for game in pool.imap_unordered(play_game, jobs):
+            counts[score_for_a(game)] += 1
+            pgns.append(game["pgn"])
+            if pgn_path is not None:
+                with open(pgn_path, "a", encoding="utf-8") as pgn_file:
+                    pgn_file.write(game["pgn"] + "\n\n")
+            if sprt is not None:
+                llr = sprt_llr(counts[1.0], counts[0.5], counts[0.0], *sprt)
+                if llr <= lower:
+                    verdict = "H0"
+                elif llr >= upper:
+                    verdict = "H1"
+                if verdict is not None:
+                    break
+    finally:
+        pool.terminate()
+        pool.join()
+
+    elo, margin = elo_estimate(counts[1.0], counts[0.5], counts[0.0])
+    return {
+        "wins": counts[1.0],
+        "draws": counts[0.5],
+        "losses": counts[0.0],
+        "elo": elo,
+        "margin": margin,
+        "llr": llr,
+        "verdict": verdict,
+        "pgn": pgns,
+    }
+
+
+def main():
+    """
+    Run a match from the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--a", default="{}", help='engine A as JSON, e.g. {"options": {"lmr": false}}'
+    )
+    parser.add_argument(
+        "--b", default="{}", help='engine B as JSON, e.g. {"uci": "../old/uci.py"}'
+    )
+    parser.add_argument("--openings", default=OPENINGS_PATH)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--movetime", type=float, default=None)
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"), default=None
+    )
+    parser.add_argument("--pgn", default=None, help="file to append the games to")
+    options = parser.parse_args()
+
+    movetime = options.movetime
+    if movetime is None and options.nodes is None:
+        movetime = 0.1
+    report = run_match(
+        json.loads(options.a),
+        json.loads(options.b),
+        options.openings,
+        options.games,
+        movetime,
+        options.nodes,
+        options.workers,
+        options.sprt,
+        options.pgn,
+    )
+    print(
+        f"A: +{report['wins']} ={report['draws']} -{report['losses']}, "
+        f"elo {report['elo']:+.1f} +/- {report['margin']:.1f}"
+    )
+    if options.sprt is not None:
+        print(f"llr {report['llr']:.2f}, verdict: {report['verdict'] or 'undecided'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,674 @@
 """
-Minimax to find the option with the least 
+Minimax to find the option with the least
 """
 
+import time
 from eval import *
+from transposition import TranspositionTable, position_key, EXACT, LOWER, UPPER
+from ordering import MoveOrderer, PIECE_VALUES, mvv_lva, static_exchange
+from tablebase import wdl_score
+from stats import SearchStats
 
+# How many nodes to search between checks of the clock
+CHECK_INTERVAL = 1024
 
-class Minimax:
+INFINITY = 1000000
+MATE_SCORE = 100000
+# Scores past this are mates, and store their distance from the current node
+MATE_BOUND = MATE_SCORE - 1000
+
+# Half-width of the first aspiration window around the last iteration's score
+ASPIRATION_WINDOW = 50
+
+# Depth reduction for the null move search
+NULL_MOVE_REDUCTION = 2
+
+# Late move reductions: quiet moves after the first LMR_FULL_MOVES are
+# searched one ply shallower, or two after LMR_DEEP_MOVES, when at least
+# LMR_MIN_DEPTH plies remain
+LMR_MIN_DEPTH = 3
+LMR_FULL_MOVES = 3
+LMR_DEEP_MOVES = 6
+
+# Margin for delta pruning: captures that can't raise the score to alpha even
+# with this much positional gain on top are skipped in quiescence search
+DELTA_MARGIN = 200
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out.
+    """
+
+
+def score_to_table(score, ply):
+    """
+    Convert a mate score from distance-to-root to distance-to-node so it can
+    be reused when the position is reached at a different ply.
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """
+    Convert a stored mate score back to distance-to-root.
+    """
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class NegamaxSearch:
+    """
+    The parts of the search that don't depend on the board underneath: the
+    aspiration windows, the transposition table bounds, principal variation
+    search with late move reductions, and the null move search. Minimax
+    searches a chess.Board and arraysearch.ArraySearch an ArrayBoard; each
+    provides negamax() and the hooks below.
+
+    Hooks:
+        probe_entry(key) and store_entry(key, depth, score, bound, move):
+            the table's probe and store, with moves as the board keeps them.
+        push_null() and pop_null(): make and unmake a null move.
+    """
+
+    def aspiration_search(self, depth, guess):
+        """
+        Search the root with a narrow window around the previous iteration's
+        score, widening it whenever the true score falls outside.
+
+        Returns:
+            A (score, pv) tuple.
+        """
+        if not self.aspiration or depth < 3 or abs(guess) >= MATE_BOUND:
+            return self.negamax(depth, -INFINITY, INFINITY, 0)
+        delta = ASPIRATION_WINDOW
+        alpha, beta = guess - delta, guess + delta
+        while True:
+            score, pv = self.negamax(depth, alpha, beta, 0)
+            if score <= alpha:
+                alpha = max(score - delta, -INFINITY)
+            elif score >= beta:
+                beta = min(score + delta, INFINITY)
+            else:
+                return (score, pv)
+            delta *= 2
+            if delta > 4 * ASPIRATION_WINDOW:
+                alpha, beta = -INFINITY, INFINITY
+
+    def probe_table(self, key, depth, alpha, beta, ply):
+        """
+        Check the transposition table for a stored result that can replace
+        searching the current position.
+
+        Returns:
+            A (stored, hash_move) tuple where stored is a score if the stored
+            result is usable, else None, and hash_move is the stored best move
+            to search first, if any.
+        """
+        entry = self.probe_entry(key)
+        if entry is None:
+            return (None, None)
+        entry_depth, entry_score, bound, entry_move = entry
+        if entry_depth < depth:
+            return (None, entry_move)
+        entry_score = score_from_table(entry_score, ply)
+        if bound == EXACT:
+            return (entry_score, entry_move)
+        if bound == LOWER and entry_score >= beta:
+            return (entry_score, entry_move)
+        if bound == UPPER and entry_score <= alpha:
+            return (entry_score, entry_move)
+        return (None, entry_move)
+
+    def store_table(self, key, depth, alpha, beta, best_eval, best_move, ply):
+        """
+        Save the result of searching the current position, marking whether
+        the score is exact or only a bound because of a cutoff.
+        """
+        if best_eval <= alpha:
+            bound = UPPER
+        elif best_eval >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.store_entry(key, depth, score_to_table(best_eval, ply), bound, best_move)
+
+    def search_child(self, index, depth, alpha, beta, ply, reduction=0):
+        """
+        Search the position after a move, which the caller makes and unmakes.
+        The first move gets the full window; later moves get a null window,
+        unless pvs is off, and are only re-searched with the full window if
+        they beat alpha. A reduced move that beats alpha is first searched
+        again at full depth.
+
+        Returns:
+            A (score, pv) tuple from the parent's point of view.
+        """
+        if index == 0:
+            cur_eval, line = self.negamax(depth - 1, -beta, -alpha, ply + 1)
+        else:
+            child_alpha = -alpha - 1 if self.pvs else -beta
+            cur_eval, line = self.negamax(
+                depth - 1 - reduction, child_alpha, -alpha, ply + 1
+            )
+            if reduction:
+                self.reductions += 1
+                if -cur_eval > alpha:
+                    self.re_searches += 1
+                    cur_eval, line = self.negamax(
+                        depth - 1, child_alpha, -alpha, ply + 1
+                    )
+            if self.pvs and alpha < -cur_eval < beta:
+                cur_eval, line = self.negamax(depth - 1, -beta, -alpha, ply + 1)
+        return (-cur_eval, line)
+
+    def search_null_move(self, depth, beta, ply):
+        """
+        Let the opponent move twice in a row with a reduced-depth, null window
+        search. If the position is still at least beta, a real move would
+        almost certainly be too, so the node can be cut off without searching
+        its moves.
+
+        Returns:
+            The null move search's score from the side to move's point of view.
+        """
+        self.null_move_tries += 1
+        self.push_null()
+        null_eval, _ = self.negamax(
+            depth - 1 - self.null_move_reduction, -beta, -beta + 1, ply + 1
+        )
+        self.pop_null()
+        if -null_eval >= beta:
+            self.null_move_cutoffs += 1
+        return -null_eval
+
+
+class Minimax(NegamaxSearch):
     """
     Run minimax on a chess game :) to find the position that maximizes the
     bot's chances of winning.
+
+    The search is written as negamax: every score is from the point of view of
+    the side to move, so one routine serves both players.
     """
 
-    def __init__(self, board):
+    def __init__(
+        self,
+        board,
+        table=None,
+        ordering=True,
+        tablebase=None,
+        null_move=True,
+        null_move_reduction=NULL_MOVE_REDUCTION,
+        lmr=True,
+        array_board=False,
+        pvs=True,
+        aspiration=True,
+    ):
         self.board = board
-        pass
+        self.table = table if table is not None else TranspositionTable()
+        # An optional tablebase.Tablebase for positions with few pieces
+        self.tablebase = tablebase
+        # Switches for the selective search and the search windows, so each
+        # can be measured alone
+        self.null_move = null_move
+        self.null_move_reduction = null_move_reduction
+        self.lmr = lmr
+        self.pvs = pvs
+        self.aspiration = aspiration
+        # Search on an arrayboard.ArrayBoard, converted from the board at
+        # the root, instead of on the chess.Board itself. The two searches
+        # share NegamaxSearch, but the array search sorts every move up
+        # front instead of picking them in stages as the MoveOrderer does
+        self.array_board = array_board
+        self.null_move_tries = 0
+        self.null_move_cutoffs = 0
+        self.reductions = 0
+        self.re_searches = 0
+        self.orderer = MoveOrderer(enabled=ordering)
+        self.evaluator = Evaluator(board)
+        # Every node is counted in nodes; quiescence nodes, including the
+        # leaf nodes at the horizon, are also counted in qnodes
+        self.nodes = 0
+        self.qnodes = 0
+        self.leaf_nodes = 0
+        self.stats = SearchStats()
+        self.deadline = None
+        # The search stops once nodes reaches max_nodes, if it's set, and
+        # check_time() is called when it reaches next_check
+        self.max_nodes = None
+        self.next_check = CHECK_INTERVAL
+        self.root_ply = len(board.move_stack)
+        self.pv = []
+        self.iterations = []
+        self.root_moves = None
+        # The best (score, pv) at the root so far in the current iteration
+        self.root_best = None
+        self.depth = 0
+        # Optional callables: stop_check() returns True to abort the search,
+        # progress(searcher) is called every CHECK_INTERVAL nodes, and
+        # on_iteration(iteration) after every completed iteration, stopping
+        # the search if it returns True
+        self.stop_check = None
+        self.progress = None
+        self.on_iteration = None
 
-    def alpha_beta_max(self, depth, alpha, beta, move, score=0):
-        try:
-            cur_score = evaluate_board(self.board, move, score)
-        except:
-            cur_score = 0
-        if depth == 0:
-            return (cur_score, move)
-        max_eval = float("-inf")
-        best_move = None
-
-        if not move == chess.Move.null():
-            self.board.push(move)
-
-        list_of_legal_moves = list(self.board.legal_moves)
-        for i in list_of_legal_moves:
-            cur_eval = self.alpha_beta_min(depth - 1, alpha, beta, i, cur_score)[0]
-           
-            if cur_eval > max_eval:
-                max_eval = cur_eval
-                best_move = i
-            if cur_eval >= beta:
+    def search(
+        self,
+        max_depth=64,
+        movetime=None,
+        deadline=None,
+        start_depth=1,
+        root_moves=None,
+        max_nodes=None,
+    ):
+        """
+        Iteratively deepen the search one ply at a time until max_depth is
+        reached or the time budget runs out.
+
+        Args:
+            max_depth: an int representing the deepest iteration to run.
+            movetime: an optional number of seconds to think for.
+            deadline: an optional time.perf_counter() value to stop at.
+            start_depth: an int representing the first iteration to run.
+            root_moves: an optional list of chess.Move objects; only these
+                are searched at the root.
+            max_nodes: an optional int representing the most nodes to search;
+                the search stops on reaching it exactly.
+        Returns:
+            A (score, move) tuple from the deepest completed iteration, where
+            score is positive if the side to move is better, or from the best
+            root move found so far if the first iteration was stopped. The
+            full line is left in self.pv.
+        """
+        start = time.perf_counter()
+        if movetime is not None:
+            deadline = start + movetime
+        self.nodes = 0
+        self.qnodes = 0
+        self.leaf_nodes = 0
+        self.orderer.reset_stats()
+        self.stats = SearchStats()
+        self.table.new_search()
+        table_counts = (self.table.hits, self.table.misses)
+        self.root_ply = len(self.board.move_stack)
+        self.pv = []
+        self.iterations = []
+        self.deadline = None
+        self.max_nodes = max_nodes
+        self.schedule_check()
+        self.evaluator = Evaluator(self.board)
+        self.root_moves = root_moves
+        result = (self.evaluator.relative_score(), None)
+
+        # Endgames in the tablebase don't need searching at all
+        if self.tablebase is not None and self.tablebase.covers(self.board):
+            probed = self.tablebase.best_move(self.board)
+            if probed is not None and (root_moves is None or probed[1] in root_moves):
+                self.pv = [probed[1]]
+                return (wdl_score(probed[0], 0), probed[1])
+
+        searcher = self
+        if self.array_board:
+            import arraysearch  # it imports this module
+
+            searcher = arraysearch.ArraySearch(self)
+
+        for depth in range(start_depth, max_depth + 1):
+            self.depth = depth
+            self.root_best = None
+            try:
+                score, pv = searcher.aspiration_search(depth, result[0])
+            except SearchTimeout:
+                # Undo the moves the unfinished iteration had pushed
+                if searcher is not self:
+                    searcher.unwind()
+                while len(self.board.move_stack) > self.root_ply:
+                    self.evaluator.pop()
+                if searcher is not self:
+                    self.root_best = searcher.root_best
+                # Without a finished iteration, the best root move searched
+                # so far is better than none
+                if result[1] is None and self.root_best is not None:
+                    result = (self.root_best[0], self.root_best[1][0])
+                    self.pv = self.root_best[1]
+                break
+            finally:
+                if searcher is not self:
+                    searcher.sync()
+            if not pv:  # no legal moves at the root
                 break
-            if max_eval > alpha:
-                alpha = max_eval
+            result = (score, pv[0])
+            self.pv = pv
+            iteration_nodes = self.nodes - sum(i["nodes"] for i in self.iterations)
+            self.iterations.append(
+                {
+                    "depth": depth,
+                    "score": score,
+                    "move": pv[0],
+                    "pv": pv,
+                    "nodes": iteration_nodes,
+                    "time": time.perf_counter() - start,
+                    # How many times bigger the tree got for one more ply
+                    "ebf": (
+                        iteration_nodes / self.iterations[-1]["nodes"]
+                        if self.iterations
+                        else float(iteration_nodes)
+                    ),
+                }
+            )
+            self.update_stats(start, table_counts)
+            if self.on_iteration is not None and self.on_iteration(self.iterations[-1]):
+                break
+            # The first iteration always finishes so there's a move to play
+            self.deadline = deadline
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if abs(score) >= MATE_BOUND:  # a forced mate was found
+                break
+        self.deadline = None
+        self.update_stats(start, table_counts)
+        return result
+
+    def update_stats(self, start, table_counts):
+        """
+        Copy the search's counters into self.stats.
+
+        Args:
+            start: the time.perf_counter() value the search started at.
+            table_counts: a (hits, misses) tuple of the transposition table's
+                counters when the search started.
+        """
+        stats = self.stats
+        stats.interior_nodes = self.nodes - self.qnodes
+        stats.leaf_nodes = self.leaf_nodes
+        stats.quiescence_nodes = self.qnodes - self.leaf_nodes
+        stats.elapsed = time.perf_counter() - start
+        stats.beta_cutoffs = self.orderer.cutoffs
+        stats.first_move_cutoffs = self.orderer.first_move_cutoffs
+        stats.tt_hits = self.table.hits - table_counts[0]
+        stats.tt_probes = stats.tt_hits + self.table.misses - table_counts[1]
+        previous = 0.0
+        stats.iterations = []
+        for iteration in self.iterations:
+            stats.iterations.append(
+                {
+                    "depth": iteration["depth"],
+                    "score": iteration["score"],
+                    "nodes": iteration["nodes"],
+                    "time": iteration["time"] - previous,
+                    "ebf": iteration["ebf"],
+                    "pv": [move.uci() for move in iteration["pv"]],
+                }
+            )
+            previous = iteration["time"]
+
+    def generate_next_move(self, depth):
+        """
+        Search to a fixed depth with no time limit.
+
+        Returns:
+            A (score, move) tuple.
+        """
+        return self.search(max_depth=depth)
+
+    def check_time(self):
+        """
+        Report progress, and raise SearchTimeout if the deadline has passed,
+        the node budget is spent, or the search was asked to stop.
+        """
+        if self.progress is not None:
+            self.progress(self)
+        if self.stop_check is not None and self.stop_check():
+            raise SearchTimeout()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+        self.schedule_check()
 
-        if not move == chess.Move.null():
-            self.board.pop()
+    def schedule_check(self):
+        """
+        Set the node count of the next check_time(): CHECK_INTERVAL nodes on,
+        or sooner if that's where the node budget runs out.
+        """
+        self.next_check = self.nodes + CHECK_INTERVAL
+        if self.max_nodes is not None:
+            self.next_check = min(self.next_check, self.max_nodes)
 
-        return (max_eval, best_move)
+    def negamax(self, depth, alpha, beta, ply):
+        """
+        Negamax alpha-beta with principal variation search (see
+        search_child).
 
-    def alpha_beta_min(self, depth, alpha, beta, move, score=0):
-        try:
-            cur_score = evaluate_board(self.board, move, score)
-        except:
-            cur_score = 0
+        Args:
+            depth: an int representing the remaining depth to search.
+            alpha: the score the side to move is already guaranteed.
+            beta: the score the opponent is already guaranteed.
+            ply: an int representing the distance from the root.
+        Returns:
+            A (score, pv) tuple where pv is the list of best moves from here.
+        """
+        # Leaf nodes are counted by the quiescence search they start
+        if depth > 0:
+            self.nodes += 1
+            if self.nodes >= self.next_check:
+                self.check_time()
+        # WDL is only exact right after a capture or pawn move, since it
+        # assumes the fifty-move counter is zero
+        if (
+            self.tablebase is not None
+            and ply > 0
+            and self.board.halfmove_clock == 0
+            and self.tablebase.covers(self.board)
+        ):
+            wdl = self.tablebase.probe_wdl(self.board)
+            if wdl is not None:
+                return (wdl_score(wdl, ply), [])
         if depth == 0:
-            return (cur_score, move)
-        min_eval = float("inf")
-        best_move = None
-
-        if not move == chess.Move.null():
-            self.board.push(move)
-
-        list_of_legal_moves = list(self.board.legal_moves)
-        for i in list_of_legal_moves:
-            cur_eval = self.alpha_beta_max(depth - 1, alpha, beta, i, cur_score)[0]
-            if cur_eval < min_eval:
-                min_eval = cur_eval
-                best_move = i
-            if cur_eval <= alpha:
+            self.leaf_nodes += 1
+            return (self.quiescence(alpha, beta, ply), [])
+        side = 1 if self.board.turn == chess.WHITE else -1
+
+        pv_node = beta - alpha > 1
+        alpha_orig = alpha
+        key = position_key(self.board)
+        stored, hash_move = self.probe_table(key, depth, alpha, beta, ply)
+        # The root and PV nodes are always searched so the full line is known
+        if stored is not None and ply > 0 and not pv_node:
+            return (stored, [hash_move] if hash_move else [])
+
+        in_check = self.board.is_check()
+        if (
+            self.null_move
+            and not pv_node
+            and ply > 0
+            and depth > self.null_move_reduction
+            and not in_check
+            and self.evaluator.relative_score() >= beta
+            and self.board.move_stack[-1]  # never two null moves in a row
+            and self.has_pieces()
+        ):
+            null_eval = self.search_null_move(depth, beta, ply)
+            if null_eval >= beta:
+                # A null move search can't prove a mate, so don't claim one
+                return (beta if null_eval >= MATE_BOUND else null_eval, [])
+
+        if ply == 0:
+            moves = list(self.board.legal_moves)
+            if self.root_moves is not None:
+                moves = [move for move in moves if move in self.root_moves]
+            moves = self.orderer.order(self.board, moves, ply, hash_move)
+        else:
+            # Below the root, moves are generated lazily in stages
+            moves = self.orderer.pick(self.board, ply, hash_move)
+
+        best_eval = -INFINITY
+        best_line = []
+        for index, move in enumerate(moves):
+            child_eval = None
+            if depth == 1 and not self.board.gives_check(move):
+                child_eval = side * self.evaluator.score_after(move)
+            if child_eval is not None and child_eval <= alpha:
+                # The child's quiescence search would stand pat and fail
+                # high straight away, so skip making the move
+                self.nodes += 1
+                self.qnodes += 1
+                self.leaf_nodes += 1
+                if self.nodes >= self.next_check:
+                    self.check_time()
+                cur_eval, line = child_eval, []
+            else:
+                reduction = 0
+                if (
+                    self.lmr
+                    and depth >= LMR_MIN_DEPTH
+                    and index >= LMR_FULL_MOVES
+                    and not in_check
+                    and not move.promotion
+                    and not self.board.is_capture(move)
+                    and not self.board.gives_check(move)
+                ):
+                    reduction = 1 if index < LMR_DEEP_MOVES else 2
+                    reduction = min(reduction, depth - 2)
+                self.evaluator.push(move)
+                cur_eval, line = self.search_child(
+                    index, depth, alpha, beta, ply, reduction
+                )
+                self.evaluator.pop()
+
+            if cur_eval > best_eval:
+                best_eval = cur_eval
+                best_line = [move] + line
+                if ply == 0:
+                    self.root_best = (best_eval, best_line)
+            if best_eval > alpha:
+                alpha = best_eval
+            if alpha >= beta:
+                self.orderer.record_cutoff(self.board, move, index, depth, ply)
                 break
-            if min_eval < beta:
-                beta = min_eval
 
-        if not move == chess.Move.null():
-            self.board.pop()
+        if not best_line:  # no legal moves
+            if in_check:
+                return (-MATE_SCORE + ply, [])
+            return (0, [])
+        self.store_table(key, depth, alpha_orig, beta, best_eval, best_line[0], ply)
+        return (best_eval, best_line)
+
+    def probe_entry(self, key):
+        """
+        Returns:
+            The table's (depth, score, bound, move) entry for a key, or None.
+        """
+        return self.table.probe(key)
+
+    def store_entry(self, key, depth, score, bound, move):
+        """
+        Store a chess.Move's result in the table.
+        """
+        self.table.store(key, depth, score, bound, move)
+
+    def push_null(self):
+        """
+        Pass the turn.
+        """
+        self.evaluator.push(chess.Move.null())
+
+    def pop_null(self):
+        """
+        Take back push_null().
+        """
+        self.evaluator.pop()
+
+    def has_pieces(self):
+        """
+        Returns:
+            True if the side to move has a piece other than pawns and its
+            king. Without one, zugzwang is likely, and passing (the null
+            move) could be better than any real move.
+        """
+        board = self.board
+        return bool(board.occupied_co[board.turn] & ~(board.pawns | board.kings))
+
+    def quiescence(self, alpha, beta, ply):
+        """
+        Keep searching captures past the horizon until the position is quiet,
+        so a leaf is never scored in the middle of an exchange.
+
+        The side to move may always "stand pat" on the static score instead of
+        capturing. Captures that lose material by static exchange evaluation
+        are skipped, as are captures that couldn't reach alpha even after
+        winning the captured piece (delta pruning). When in check every
+        evasion is searched instead, since standing pat isn't allowed.
+
+        Args:
+            alpha: the score the side to move is already guaranteed.
+            beta: the score the opponent is already guaranteed.
+            ply: an int representing the distance from the root.
+        Returns:
+            An int score from the side to move's point of view.
+        """
+        self.nodes += 1
+        self.qnodes += 1
+        if self.nodes >= self.next_check:
+            self.check_time()
+        in_check = self.board.is_check()
+
+        if in_check:
+            best_eval = -MATE_SCORE + ply
+            moves = list(self.board.legal_moves)
+        else:
+            best_eval = self.evaluator.relative_score()
+            if best_eval >= beta:
+                return best_eval
+            if best_eval > alpha:
+                alpha = best_eval
+            # Captures are generated pseudo-legal and only checked for
+            # legality once they've passed the cheaper filters
+            moves = [
+                move
+                for move in self.board.generate_pseudo_legal_captures()
+                if best_eval + self.capture_value(move) + DELTA_MARGIN > alpha
+                and static_exchange(self.board, move) >= 0
+            ]
+            moves.sort(key=lambda move: mvv_lva(self.board, move), reverse=True)
+
+        king = self.board.king(self.board.turn)
+        blockers = None
+        for move in moves:
+            if not in_check:
+                if blockers is None:
+                    blockers = self.board._slider_blockers(king)
+                if not self.board._is_safe(king, blockers, move):
+                    continue
+            self.evaluator.push(move)
+            cur_eval = -self.quiescence(-beta, -alpha, ply + 1)
+            self.evaluator.pop()
+            if cur_eval > best_eval:
+                best_eval = cur_eval
+            if best_eval > alpha:
+                alpha = best_eval
+            if alpha >= beta:
+                break
+        return best_eval
 
-        return (min_eval, best_move)
+    def capture_value(self, move):
+        """
+        Returns:
+            The material a capture wins before any recapture.
+        """
+        if self.board.is_en_passant(move):
+            victim = chess.PAWN
+        else:
+            victim = self.board.piece_type_at(move.to_square)
+        value = PIECE_VALUES[victim]
+        if move.promotion:
+            value += PIECE_VALUES[move.promotion] - PIECE_VALUES[chess.PAWN]
+        return value
@@ -0,0 +1,315 @@
+"""
+Orders moves so that alpha-beta searches the likely best move first, which
+makes cutoffs happen sooner and shrinks the tree.
+"""
+
+import itertools
+import chess
+from eval import piece_vals, piece_type_vals
+
+MAX_PLY = 128
+
+# Buckets that moves get sorted into, searched from highest to lowest
+HASH_MOVE = 4
+CAPTURE = 3
+KILLER = 2
+QUIET = 1
+
+SYMBOLS = {
+    chess.PAWN: "P",
+    chess.KNIGHT: "N",
+    chess.BISHOP: "B",
+    chess.ROOK: "R",
+    chess.QUEEN: "Q",
+    chess.KING: "K",
+}
+# piece_vals indexed by chess piece type, with 0 for an empty square; the
+# same list as eval's, so it follows tables loaded from texel.py
+PIECE_VALUES = piece_type_vals
+
+
+def mvv_lva(board, move):
+    """
+    Scores a capture by Most Valuable Victim - Least Valuable Attacker, so
+    taking a queen with a pawn is tried before taking a pawn with a queen.
+
+    Args:
+        board: a chess.Board() object before the move is made.
+        move: a chess.Move object that captures or promotes.
+    Returns:
+        An int; higher numbers should be searched first.
+    """
+    attacker = board.piece_type_at(move.from_square)
+    if board.is_en_passant(move):
+        victim = chess.PAWN
+    else:
+        victim = board.piece_type_at(move.to_square)
+    victim_value = piece_vals[SYMBOLS[victim]] if victim else 0
+    if move.promotion:
+        victim_value += piece_vals[SYMBOLS[move.promotion]]
+    return victim_value * 100000 - piece_vals[SYMBOLS[attacker]]
+
+
+def attackers_mask(board, square, occupied):
+    """
+    Finds every piece of either color attacking a square, treating only the
+    squares in occupied as blockers, so that sliding pieces behind a piece
+    that already captured are found too.
+
+    Args:
+        board: a chess.Board() object.
+        square: an int (0-63) representing the attacked square.
+        occupied: a bitboard of the squares that still hold pieces.
+    Returns:
+        A bitboard of the attacking pieces' squares.
+    """
+    rank_pieces = chess.BB_RANK_MASKS[square] & occupied
+    file_pieces = chess.BB_FILE_MASKS[square] & occupied
+    diag_pieces = chess.BB_DIAG_MASKS[square] & occupied
+    queens = board.queens
+    rooks_and_queens = board.rooks | queens
+    bishops_and_queens = board.bishops | queens
+
+    attackers = (
+        (chess.BB_KING_ATTACKS[square] & board.kings)
+        | (chess.BB_KNIGHT_ATTACKS[square] & board.knights)
+        | (chess.BB_RANK_ATTACKS[square][rank_pieces] & rooks_and_queens)
+        | (chess.BB_FILE_ATTACKS[square][file_pieces] & rooks_and_queens)
+        | (chess.BB_DIAG_ATTACKS[square][diag_pieces] & bishops_and_queens)
+        | (
+            chess.BB_PAWN_ATTACKS[chess.WHITE][square]
+            & board.pawns
+            & board.occupied_co[chess.BLACK]
+        )
+        | (
+            chess.BB_PAWN_ATTACKS[chess.BLACK][square]
+            & board.pawns
+            & board.occupied_co[chess.WHITE]
+        )
+    )
+    return attackers & occupied
+
+
+def static_exchange(board, move):
+    """
+    Static exchange evaluation: plays out every capture on the move's target
+    square, cheapest attacker first, and lets either side stop capturing
+    whenever continuing would lose material.
+
+    Args:
+        board: a chess.Board() object before the move is made.
+        move: a chess.Move object, usually a capture.
+    Returns:
+        An int representing the material the side to move wins (positive) or
+        loses (negative) on that square.
+    """
+    to_square = move.to_square
+    occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+    if board.is_en_passant(move):
+        victim = chess.PAWN
+        occupied &= ~chess.BB_SQUARES[to_square + (-8 if board.turn else 8)]
+    else:
+        victim = board.piece_type_at(to_square) or 0
+
+    gain = [PIECE_VALUES[victim]]
+    attacker_value = PIECE_VALUES[board.piece_type_at(move.from_square)]
+    if move.promotion:
+        gain[0] += PIECE_VALUES[move.promotion] - PIECE_VALUES[chess.PAWN]
+        attacker_value = PIECE_VALUES[move.promotion]
+
+    color = not board.turn
+    while True:
+        attackers = attackers_mask(board, to_square, occupied)
+        attackers &= board.occupied_co[color]
+        if not attackers:
+            break
+        for piece_type in chess.PIECE_TYPES:
+            candidates = attackers & board.pieces_mask(piece_type, color)
+            if candidates:
+                break
+        square = chess.lsb(candidates)
+        gain.append(attacker_value - gain[-1])
+        if max(-gain[-2], gain[-1]) < 0:
+            # Stopping here is better for both sides, so this capture
+            # doesn't change the result
+            gain.pop()
+            break
+        occupied &= ~chess.BB_SQUARES[square]
+        attacker_value = PIECE_VALUES[piece_type]
+        color = not color
+
+    while len(gain) > 1:
+        last = gain.pop()
+        gain[-1] = -max(-gain[-1], last)
+    return gain[0]
+
+
+class MoveOrderer:
+    """
+    Keeps the killer move and history tables for one search and sorts the
+    moves of each node: hash move, captures by MVV-LVA, killer moves, then
+    quiet moves by history score.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # history[color][from_square][to_square]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in range(2)]
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Zero the cutoff counters.
+        """
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoff_index_sum = 0
+
+    def order(self, board, moves, ply, hash_move=None):
+        """
+        Sort a list of legal moves from most to least promising.
+
+        Args:
+            board: a chess.Board() object the moves are legal in.
+            moves: a list of chess.Move objects.
+            ply: an int representing the distance from the root.
+            hash_move: the best move stored in the transposition table.
+        Returns:
+            The sorted list of moves.
+        """
+        if not self.enabled:
+            return moves
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        history = self.history[board.turn]
+
+        def key(move):
+            if move == hash_move:
+                return (HASH_MOVE, 0)
+            if move.promotion or board.is_capture(move):
+                return (CAPTURE, mvv_lva(board, move))
+            if move == killers[0]:
+                return (KILLER, 1)
+            if move == killers[1]:
+                return (KILLER, 0)
+            return (QUIET, history[move.from_square][move.to_square])
+
+        moves.sort(key=key, reverse=True)
+        return moves
+
+    def pick(self, board, ply, hash_move=None):
+        """
+        Generate the legal moves of a position in the same order as order(),
+        one stage at a time: the hash move, captures and promotions by
+        MVV-LVA, killer moves, then quiet moves by history score. Each stage
+        is only generated once the ones before it run out, and moves are only
+        checked for legality as they're handed out, so a cutoff on an early
+        move skips most of the move generation.
+
+        Args:
+            board: a chess.Board() object; it must be back in the same
+                position each time the next move is asked for.
+            ply: an int representing the distance from the root.
+            hash_move: the best move stored in the transposition table.
+        Yields:
+            Legal chess.Move objects.
+        """
+        king = board.king(board.turn)
+        if not self.enabled or king is None or board.is_check():
+            # Check evasions are few, so generate them all at once
+            yield from self.order(board, list(board.legal_moves), ply, hash_move)
+            return
+        # python-chess's own legality test for pseudo-legal moves, given the
+        # pieces pinned to the king
+        blockers = board._slider_blockers(king)
+
+        if (
+            hash_move
+            and board.is_pseudo_legal(hash_move)
+            and board._is_safe(king, blockers, hash_move)
+        ):
+            yield hash_move
+
+        captures = list(board.generate_pseudo_legal_captures())
+        captures.extend(
+            board.generate_pseudo_legal_moves(
+                board.pawns, chess.BB_BACKRANKS & ~board.occupied
+            )
+        )
+        captures.sort(key=lambda move: mvv_lva(board, move), reverse=True)
+        for move in captures:
+            if move != hash_move and board._is_safe(king, blockers, move):
+                yield move
+
+        killers = tuple(self.killers[ply]) if ply < MAX_PLY else (None, None)
+        for index, killer in enumerate(killers):
+            if (
+                killer
+                and killer != hash_move
+                and killer not in killers[:index]
+                and not killer.promotion
+                and board.is_pseudo_legal(killer)
+                and not board.is_capture(killer)
+                and board._is_safe(king, blockers, killer)
+            ):
+                yield killer
+
+        history = self.history[board.turn]
+        # Castling is generated on its own, since python-chess treats it as
+        # the king moving onto its rook's square
+        quiets = [
+            move
+            for move in itertools.chain(
+                board.generate_pseudo_legal_moves(chess.BB_ALL, ~board.occupied),
+                board.generate_castling_moves(),
+            )
+            if not move.promotion
+            and move != hash_move
+            and move not in killers
+            and not board.is_en_passant(move)
+        ]
+        quiets.sort(
+            key=lambda move: history[move.from_square][move.to_square], reverse=True
+        )
+        for move in quiets:
+            if board._is_safe(king, blockers, move):
+                yield move
+
+    def record_cutoff(self, board, move, index, depth, ply):
+        """
+        Remember a move that caused a beta cutoff.
+
+        Args:
+            board: a chess.Board() object the move is legal in.
+            move: the chess.Move that caused the cutoff.
+            index: an int representing the move's position in the sorted list.
+            depth: an int representing the remaining search depth.
+            ply: an int representing the distance from the root.
+        """
+        self.cutoffs += 1
+        self.cutoff_index_sum += index
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        if move.promotion or board.is_capture(move):
+            return
+        if ply < MAX_PLY and self.killers[ply][0] != move:
+            self.killers[ply][1] = self.killers[ply][0]
+            self.killers[ply][0] = move
+        self.history[board.turn][move.from_square][move.to_square] += depth * depth
+
+    def stats(self):
+        """
+        Returns:
+            A dict with the number of cutoffs, the fraction that happened on
+            the first move searched, and the average index of the cutoff move.
+        """
+        return {
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": (
+                self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+            ),
+            "average_cutoff_index": (
+                self.cutoff_index_sum / self.cutoffs if self.cutoffs else 0.0
+            ),
+        }
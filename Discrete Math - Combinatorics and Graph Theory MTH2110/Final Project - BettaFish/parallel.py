@@ -0,0 +1,482 @@
+"""
+Runs the minimax search in several worker processes at once so the bot can
+use more than one CPU core (threads wouldn't help because of the GIL).
+"""
+
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import time
+import chess
+import minimax
+import tablebase
+from stats import SearchStats
+from tablebase import wdl_score
+from transposition import AGES, TranspositionTable
+
+LAZY_SMP = "lazy_smp"
+ROOT_SPLIT = "root_split"
+
+# How long the main process waits for a worker's iteration before checking
+# whether the search should stop, in seconds
+POLL_INTERVAL = 0.01
+
+# Each worker process's state, set by init_worker(): the shared table, its
+# own tablebase, and the stop event, node counter and iteration queue it
+# shares with the main process
+worker_table = None
+worker_tablebase = None
+worker_stop = None
+worker_nodes = None
+worker_info = None
+
+
+def init_worker(table_path, syzygy_path, stop, nodes, info):
+    """
+    Map the shared transposition table into a worker process, and keep the
+    objects it shares with the main process.
+    """
+    global worker_table, worker_tablebase, worker_stop, worker_nodes, worker_info
+    worker_table = TranspositionTable.load(table_path, write_back=True)
+    worker_tablebase = tablebase.open_tablebase(syzygy_path)
+    worker_stop = stop
+    worker_nodes = nodes
+    worker_info = info
+
+
+def uci_iteration(iteration):
+    """
+    Returns:
+        A copy of a Minimax iteration dict with its moves as UCI strings, so
+        it can be sent between processes.
+    """
+    return {
+        "depth": iteration["depth"],
+        "score": iteration["score"],
+        "move": iteration["move"].uci(),
+        "pv": [move.uci() for move in iteration["pv"]],
+        "time": iteration["time"],
+    }
+
+
+def search_worker(job):
+    """
+    Search one position in a worker process, stopping early when the main
+    process sets the stop event or the workers' nodes reach the budget.
+
+    Args:
+        job: a dict with the position's "fen", the "max_depth", "movetime",
+            "max_nodes", and "start_depth" of the search, the "root_moves" (as
+            UCI strings) to search, or None for all, the table "age" of the
+            search, the "search" number it belongs to, and the "worker"
+            number, which tag the iterations it sends back.
+    Returns:
+        A dict with the worker's "iterations" (depth, score, move as UCI, and
+        pv as UCI for each completed depth), its "partial" iteration, with
+        depth 0, if it was stopped before finishing one but had searched a
+        root move, its total "nodes", and its "stats" from
+        SearchStats.as_dict().
+    """
+    board = chess.Board(job["fen"])
+    root_moves = None
+    if job["root_moves"] is not None:
+        root_moves = [chess.Move.from_uci(move) for move in job["root_moves"]]
+    # Minimax.search() starts a new search, which brings the age up to the
+    # main process's, so every worker stores entries with the same age
+    worker_table.age = (job["age"] - 1) % AGES
+    searcher = minimax.Minimax(board, worker_table, tablebase=worker_tablebase)
+    counted = [0]
+
+    def count_nodes(searcher):
+        with worker_nodes.get_lock():
+            worker_nodes.value += searcher.nodes - counted[0]
+        counted[0] = searcher.nodes
+
+    def stop_check():
+        if worker_stop.is_set():
+            return True
+        return job["max_nodes"] is not None and worker_nodes.value >= job["max_nodes"]
+
+    def send_iteration(iteration):
+        worker_info.put((job["search"], job["worker"], uci_iteration(iteration)))
+
+    searcher.progress = count_nodes
+    searcher.stop_check = stop_check
+    searcher.on_iteration = send_iteration
+    score, move = searcher.search(
+        max_depth=job["max_depth"],
+        movetime=job["movetime"],
+        start_depth=job["start_depth"],
+        root_moves=root_moves,
+    )
+    count_nodes(searcher)
+    partial = None
+    if not searcher.iterations and move is not None:
+        partial = uci_iteration(
+            {"depth": 0, "score": score, "move": move, "pv": searcher.pv, "time": 0}
+        )
+    return {
+        "iterations": [uci_iteration(iteration) for iteration in searcher.iterations],
+        "partial": partial,
+        "nodes": searcher.nodes,
+        "stats": searcher.stats.as_dict(),
+    }
+
+
+class ParallelSearch:
+    """
+    Searches a position with a pool of worker processes.
+
+    Every worker stores to and probes one transposition table, a memory-mapped
+    file they all share, so each one's results cut the others' trees short.
+    In "lazy_smp" mode every worker searches the whole position, with every
+    other worker starting one ply deeper; reading each other's entries as
+    they're written sends them down different lines, and the search stops
+    when the first one finishes. In "root_split" mode the root moves are
+    dealt out among the workers and the best move is taken from the deepest
+    iteration every worker finished; the root moves of any worker stopped
+    before finishing one are listed in self.unsearched.
+    """
+
+    def __init__(self, workers=None, mode=LAZY_SMP, table_mb=16, syzygy_path=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.mode = mode
+        self.table_mb = table_mb
+        # The table's file is only for sharing it, so it's removed on close()
+        descriptor, self.table_path = tempfile.mkstemp(suffix=".npy")
+        os.close(descriptor)
+        TranspositionTable(table_mb).save(self.table_path)
+        self.table = TranspositionTable.load(self.table_path, write_back=True)
+        # Endgames at the root are looked up before any worker starts
+        self.tablebase = tablebase.open_tablebase(syzygy_path)
+        self.stop = multiprocessing.Event()
+        self.shared_nodes = multiprocessing.Value("q", 0)
+        self.info = multiprocessing.Queue()
+        self.pool = multiprocessing.Pool(
+            self.workers,
+            initializer=init_worker,
+            initargs=(
+                self.table_path,
+                syzygy_path,
+                self.stop,
+                self.shared_nodes,
+                self.info,
+            ),
+        )
+        # Searches are numbered so iterations left over from an earlier one
+        # are ignored; reported is the deepest iteration passed on so far,
+        # and finished holds root split iterations by depth and worker
+        self.searches = 0
+        self.reported = 0
+        self.finished = {}
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.depth = 0
+        self.pv = []
+        self.unsearched = []
+        self.stats = SearchStats().as_dict()
+
+    def close(self):
+        """
+        Shut down the worker processes and remove the shared table's file.
+        """
+        self.pool.close()
+        self.pool.join()
+        if self.tablebase is not None:
+            self.tablebase.close()
+        self.table = None
+        os.remove(self.table_path)
+
+    def clear(self):
+        """
+        Remove every entry from the shared transposition table.
+        """
+        self.table.clear()
+
+    def jobs(self, board, max_depth, movetime, max_nodes):
+        """
+        Split a search into one job per worker.
+        """
+        job = {
+            "fen": board.fen(),
+            "max_depth": max_depth,
+            "movetime": movetime,
+            "max_nodes": max_nodes,
+            "start_depth": 1,
+            "root_moves": None,
+            "age": self.table.age,
+            "search": self.searches,
+        }
+        if self.mode == ROOT_SPLIT:
+            moves = [move.uci() for move in board.legal_moves]
+            splits = [moves[i :: self.workers] for i in range(self.workers)]
+            return [
+                dict(job, root_moves=split, worker=i)
+                for i, split in enumerate(splits)
+                if split
+            ]
+        return [
+            dict(job, start_depth=min(1 + i % 2, max_depth), worker=i)
+            for i in range(self.workers)
+        ]
+
+    def search(
+        self,
+        board,
+        max_depth=64,
+        movetime=None,
+        stop_check=None,
+        max_nodes=None,
+        on_iteration=None,
+    ):
+        """
+        Search a position with every worker.
+
+        Args:
+            board: a chess.Board() object; it isn't modified.
+            max_depth: an int representing the deepest iteration to run.
+            movetime: an optional number of seconds to think for.
+            stop_check: an optional callable that returns True to stop every
+                worker, like Minimax.stop_check.
+            max_nodes: an optional int representing the most nodes all the
+                workers search between them, counted every
+                minimax.CHECK_INTERVAL nodes of each worker.
+            on_iteration: an optional callable given each deeper iteration
+                as it finishes, like Minimax.on_iteration, with the moves as
+                chess.Move objects and the total "nodes" and "time" so far;
+                the workers stop if it returns True.
+        Returns:
+            A (score, move) tuple like Minimax.search(); the line is left in
+            self.pv, the nodes, time to depth and depth in self.nodes,
+            self.elapsed and self.depth, the deepest worker's statistics,
+            with the total nodes, in self.stats, and any root moves the best
+            move wasn't compared against in self.unsearched.
+        """
+        start = time.perf_counter()
+        self.searches += 1
+        self.stop.clear()
+        self.shared_nodes.value = 0
+        self.reported = 0
+        self.finished = {}
+        self.unsearched = []
+
+        if self.tablebase is not None and self.tablebase.covers(board):
+            probed = self.tablebase.best_move(board)
+            if probed is not None:
+                self.nodes = 0
+                self.elapsed = time.perf_counter() - start
+                self.depth = 0
+                self.pv = [probed[1]]
+                self.stats = SearchStats().as_dict()
+                return (wdl_score(probed[0], 0), probed[1])
+
+        self.table.new_search()
+        jobs = self.jobs(board, max_depth, movetime, max_nodes)
+        pending = [self.pool.apply_async(search_worker, (job,)) for job in jobs]
+        while not all(result.ready() for result in pending):
+            self.forward_iterations(len(jobs), start, on_iteration)
+            if stop_check is not None and stop_check():
+                self.stop.set()
+            # Lazy SMP is done once any worker finishes; the rest are helpers
+            if self.mode == LAZY_SMP and any(result.ready() for result in pending):
+                self.stop.set()
+        results = [result.get() for result in pending]
+        self.elapsed = time.perf_counter() - start
+        self.nodes = sum(result["nodes"] for result in results)
+
+        if self.mode == ROOT_SPLIT:
+            best = self.merge_root_split(results, jobs)
+        else:
+            best = self.merge_lazy_smp(results)
+        self.stats = self.merge_stats(results, best)
+        if best is None:
+            self.depth = 0
+            self.pv = []
+            return (0, None)
+        # The workers' last iterations may still be on their way over
+        if best["depth"] > self.reported:
+            self.report(best, start, on_iteration)
+        self.depth = best["depth"]
+        self.pv = [chess.Move.from_uci(move) for move in best["pv"]]
+        return (best["score"], chess.Move.from_uci(best["move"]))
+
+    def forward_iterations(self, jobs, start, on_iteration):
+        """
+        Wait briefly for the workers' iterations, passing each depth on to
+        on_iteration once it's complete: as soon as any worker finishes it in
+        lazy SMP, and once every worker has in root split.
+
+        Args:
+            jobs: an int representing how many workers are searching.
+            start: the time.perf_counter() value the search started at.
+            on_iteration: the search's on_iteration callable, or None.
+        """
+        try:
+            search, worker, iteration = self.info.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            return
+        depth = iteration["depth"]
+        if search != self.searches or depth <= self.reported:
+            return
+        if self.mode == ROOT_SPLIT:
+            self.finished.setdefault(depth, {})[worker] = iteration
+            if len(self.finished[depth]) < jobs:
+                return
+            by_worker = self.finished.pop(depth)
+            # Ties go to the lowest worker, as they do in merge_root_split()
+            iteration = max(
+                (by_worker[worker] for worker in sorted(by_worker)), key=score_of
+            )
+        self.report(iteration, start, on_iteration)
+
+    def report(self, iteration, start, on_iteration):
+        """
+        Pass a finished depth to on_iteration, and stop the workers if it
+        returns True.
+        """
+        self.reported = iteration["depth"]
+        if on_iteration is None:
+            return
+        full = {
+            "depth": iteration["depth"],
+            "score": iteration["score"],
+            "move": chess.Move.from_uci(iteration["move"]),
+            "pv": [chess.Move.from_uci(move) for move in iteration["pv"]],
+            "nodes": self.shared_nodes.value,
+            "time": time.perf_counter() - start,
+        }
+        if on_iteration(full):
+            self.stop.set()
+
+    def merge_lazy_smp(self, results):
+        """
+        Returns:
+            The iteration dict of the deepest search any worker finished, with
+            the better score breaking ties, else the best partial iteration,
+            or None if no worker searched a root move.
+        """
+        finished = [
+            result["iterations"][-1] if result["iterations"] else result["partial"]
+            for result in results
+        ]
+        finished = [iteration for iteration in finished if iteration is not None]
+        if not finished:
+            return None
+        return max(
+            finished, key=lambda iteration: (iteration["depth"], iteration["score"])
+        )
+
+    def merge_root_split(self, results, jobs):
+        """
+        Pick the best move among the workers' root moves. If a worker was
+        stopped before finishing its first iteration, the other workers'
+        first iterations are compared with its partial iteration, if it has
+        one, and its root moves are listed in self.unsearched, since the best
+        of them may not have been searched.
+
+        Args:
+            results: the dicts search_worker() returned, in worker order.
+            jobs: the jobs they were given, from jobs().
+        Returns:
+            The best iteration dict among the workers at the deepest depth
+            that all of them finished, else among their first iterations and
+            partial iterations, or None if no worker searched a root move.
+        """
+        depth = min(
+            result["iterations"][-1]["depth"] if result["iterations"] else 0
+            for result in results
+        )
+        candidates = []
+        for result, job in zip(results, jobs):
+            if not result["iterations"]:
+                self.unsearched.extend(
+                    chess.Move.from_uci(move) for move in job["root_moves"]
+                )
+                if result["partial"] is not None:
+                    candidates.append(result["partial"])
+                continue
+            # Workers start at depth 1, so an unfinished worker means depth 0
+            finished = max(depth, result["iterations"][0]["depth"])
+            candidates.extend(
+                iteration
+                for iteration in result["iterations"]
+                if iteration["depth"] == finished
+            )
+        if not candidates:
+            return None
+        return max(candidates, key=score_of)
+
+    def merge_stats(self, results, best):
+        """
+        Returns:
+            The statistics dict of the worker that searched deepest, with the
+            nodes, time and nodes per second of all the workers together.
+        """
+        deepest = max(results, key=lambda result: result["stats"]["depth"])
+        merged = dict(deepest["stats"])
+        merged["nodes"] = self.nodes
+        merged["elapsed"] = self.elapsed
+        merged["nps"] = self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+        merged["depth"] = best["depth"] if best is not None else 0
+        merged["workers"] = len(results)
+        merged["unsearched_moves"] = [move.uci() for move in self.unsearched]
+        return merged
+
+
+def score_of(iteration):
+    """
+    Returns:
+        The score of an iteration dict, to pick the best of several.
+    """
+    return iteration["score"]
+
+
+def scaling_report(fen=chess.STARTING_FEN, max_workers=None, depth=5, mode=LAZY_SMP):
+    """
+    Measures how the time to reach a depth changes as workers are added. The
+    workers' summed nodes per second would mostly count work they repeat, so
+    the speedup is taken from the time alone.
+
+    Args:
+        fen: a FEN string of the position to search.
+        max_workers: an int representing the most workers to try; defaults to
+            the number of CPU cores.
+        depth: an int representing the depth every run searches to.
+        mode: "lazy_smp" or "root_split".
+    Returns:
+        A list of dicts with the "workers", "nodes", "time_to_depth", and
+        "speedup" over one worker of each run.
+    """
+    max_workers = max_workers or multiprocessing.cpu_count()
+    report = []
+    workers = 1
+    while workers <= max_workers:
+        searcher = ParallelSearch(workers, mode)
+        try:
+            searcher.search(chess.Board(fen), max_depth=depth)
+        finally:
+            searcher.close()
+        report.append(
+            {
+                "workers": workers,
+                "nodes": searcher.nodes,
+                "time_to_depth": searcher.elapsed,
+                "speedup": (
+                    report[0]["time_to_depth"] / searcher.elapsed if report else 1.0
+                ),
+            }
+        )
+        workers *= 2
+    return report
+
+
+if __name__ == "__main__":
+    scaling_mode = sys.argv[1] if len(sys.argv) > 1 else LAZY_SMP
+    for row in scaling_report(mode=scaling_mode):
+        print(
+            f"workers: {row['workers']}, nodes: {row['nodes']}, "
+            f"time to depth: {row['time_to_depth']:.2f}s, "
+            f"speedup: {row['speedup']:.2f}x"
+        )
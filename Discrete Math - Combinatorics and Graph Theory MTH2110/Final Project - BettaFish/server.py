@@ -0,0 +1,510 @@
+"""
+Hosts many games against BettaFish at once over HTTP on localhost. Each
+game is a session with its own board, and its "go" requests are searched by
+a fixed pool of engine processes, taking turns between sessions so a busy
+game can't hold up the others.
+
+    POST   /sessions               {"fen": ...} starts a game
+    GET    /sessions/<id>          the game's position and moves
+    POST   /sessions/<id>/move     {"move": "e2e4"} plays a move
+    POST   /sessions/<id>/go       {"movetime": 1.0, "depth": 8} plays the
+                                   engine's move and returns it
+    DELETE /sessions/<id>          ends a game
+    GET    /stats                  moves per second and queue latency
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import time
+import uuid
+import chess
+import minimax
+from transposition import TranspositionTable
+
+DEFAULT_MOVETIME = 1.0
+MAX_MOVETIME = 30.0
+MAX_DEPTH = 64
+
+# Latencies and move times kept for the stats endpoint
+STATS_WINDOW = 1000
+# Moves per second is also measured over the last this many seconds
+RATE_WINDOW = 60.0
+
+STATUS_TEXT = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    500: "Internal Server Error",
+}
+
+# The JSON types a field may have, named for error messages
+NUMBER = ((int, float), "a number")
+INTEGER = ((int,), "an integer")
+BOOLEAN = ((bool,), "true or false")
+STRING = ((str,), "a string")
+
+# Each engine process keeps one table, made by init_worker()
+worker_table = None
+
+
+class HttpError(Exception):
+    """
+    Raised while handling a request to answer it with an error status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def field(data, name, default, kind):
+    """
+    Read one field of a request body, checking its type.
+
+    Args:
+        data: the request's JSON object.
+        name: the field's name.
+        default: the value if the field is left out.
+        kind: NUMBER, INTEGER, BOOLEAN, or STRING.
+    Returns:
+        The field's value, raising HttpError 400 if it has the wrong type.
+    """
+    value = data.get(name, default)
+    types, description = kind
+    # bool is a subclass of int, but true isn't a number here
+    if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+        raise HttpError(400, f"{name} must be {description}")
+    return value
+
+
+def init_worker(table_mb):
+    """
+    Make the transposition table of an engine process.
+    """
+    global worker_table
+    worker_table = TranspositionTable(table_mb)
+
+
+def search_job(job):
+    """
+    Search a position in an engine process.
+
+    Args:
+        job: a dict with the "fen" the game started from, its "moves" as UCI,
+            and the "movetime" and "depth" limits.
+    Returns:
+        A dict with the best "move" as UCI (None if there's no legal move),
+        its "score" for the side to move, the "pv", and the "depth",
+        "nodes", and "time" of the search.
+    """
+    board = chess.Board(job["fen"])
+    for move in job["moves"]:
+        board.push_uci(move)
+    searcher = minimax.Minimax(board, worker_table)
+    start = time.perf_counter()
+    score, move = searcher.search(max_depth=job["depth"], movetime=job["movetime"])
+    return {
+        "move": move.uci() if move else None,
+        "score": score,
+        "pv": [pv_move.uci() for pv_move in searcher.pv],
+        "depth": searcher.stats.as_dict()["depth"],
+        "nodes": searcher.nodes,
+        "time": time.perf_counter() - start,
+    }
+
+
+class FairQueue:
+    """
+    Queues work per session and hands it out round robin, one item from
+    each session with work in turn, so every game gets the next free engine
+    before any game gets two.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.turns = collections.deque()
+        self.available = asyncio.Semaphore(0)
+
+    def put(self, session_id, item):
+        """
+        Add an item to the end of a session's queue.
+        """
+        if session_id not in self.pending:
+            self.pending[session_id] = collections.deque()
+            self.turns.append(session_id)
+        self.pending[session_id].append(item)
+        self.available.release()
+
+    async def get(self):
+        """
+        Wait for the next item.
+
+        Returns:
+            A (session_id, item) tuple from the session whose turn it is.
+        """
+        await self.available.acquire()
+        session_id = self.turns.popleft()
+        items = self.pending[session_id]
+        item = items.popleft()
+        if items:
+            self.turns.append(session_id)
+        else:
+            del self.pending[session_id]
+        return (session_id, item)
+
+    def __len__(self):
+        return sum(len(items) for items in self.pending.values())
+
+
+class Session:
+    """
+    One game: its board and how many of its searches are queued or running.
+    """
+
+    def __init__(self, fen=chess.STARTING_FEN):
+        self.board = chess.Board(fen)
+        self.searches = 0
+
+    def as_dict(self, session_id):
+        """
+        Returns:
+            A dict of the session's "id", starting "fen", current "position",
+            "moves" as UCI, and "result" ("*" while the game goes on).
+        """
+        return {
+            "id": session_id,
+            "fen": self.board.root().fen(),
+            "position": self.board.fen(),
+            "moves": [move.uci() for move in self.board.move_stack],
+            "result": self.board.result(claim_draw=True),
+            "searching": self.searches > 0,
+        }
+
+
+class EngineServer:
+    """
+    The sessions, the fair queue of their "go" requests, and the pool of
+    engine processes that searches them.
+    """
+
+    def __init__(self, workers=None, table_mb=16, max_movetime=MAX_MOVETIME):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.table_mb = table_mb
+        self.max_movetime = max_movetime
+        self.sessions = {}
+        self.queue = None
+        self.pool = None
+        self.dispatchers = []
+        self.running = 0
+        self.started = time.perf_counter()
+        self.moves = 0
+        self.move_times = collections.deque(maxlen=STATS_WINDOW)
+        self.latencies = collections.deque(maxlen=STATS_WINDOW)
+        self.search_times = collections.deque(maxlen=STATS_WINDOW)
+
+    async def start(self, host="127.0.0.1", port=8023):
+        """
+        Start the engine processes and listen for connections.
+
+        Returns:
+            The asyncio.Server; its sockets tell the port if port was 0.
+        """
+        self.queue = FairQueue()
+        # Spawned rather than forked, so the engine processes don't inherit
+        # client connections and keep them open after they're answered
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.table_mb,),
+        )
+        # One dispatcher per process, so a search starts as soon as one is free
+        self.dispatchers = [
+            asyncio.create_task(self.dispatch()) for _ in range(self.workers)
+        ]
+        self.started = time.perf_counter()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        """
+        Stop the dispatchers and shut down the engine processes.
+        """
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def dispatch(self):
+        """
+        Take "go" requests off the queue in turn and search them.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            session_id, request = await self.queue.get()
+            session = self.sessions.get(session_id)
+            if session is None:
+                # The game ended while this waited
+                if not request["future"].done():
+                    request["future"].set_exception(
+                        HttpError(404, f"session {session_id} was deleted")
+                    )
+                continue
+            if request["future"].done():
+                session.searches -= 1
+                continue
+            board = session.board
+            job = {
+                "fen": board.root().fen(),
+                "moves": [move.uci() for move in board.move_stack],
+                "movetime": request["movetime"],
+                "depth": request["depth"],
+            }
+            dispatched = time.perf_counter()
+            self.running += 1
+            try:
+                result = await loop.run_in_executor(self.pool, search_job, job)
+                self.finish(session_id, session, request, result, dispatched)
+            except Exception as error:
+                # Answered with the error, so the dispatcher keeps going
+                if not request["future"].done():
+                    request["future"].set_exception(error)
+            finally:
+                self.running -= 1
+                session.searches -= 1
+
+    def finish(self, session_id, session, request, result, dispatched):
+        """
+        Record a finished search, play its move if asked to, and answer the
+        request with it.
+        """
+        finished = time.perf_counter()
+        self.latencies.append(dispatched - request["queued"])
+        self.search_times.append(result["time"])
+        if result["move"] is not None:
+            self.moves += 1
+            self.move_times.append(finished)
+            if request["play"] and self.sessions.get(session_id) is session:
+                session.board.push_uci(result["move"])
+        result["queue_time"] = dispatched - request["queued"]
+        if not request["future"].done():
+            request["future"].set_result(result)
+
+    async def go(self, session_id, data):
+        """
+        Queue a search of a session's position and wait for it.
+
+        Args:
+            session_id: the id of the session.
+            data: a dict with optional "movetime" (seconds, at most
+                max_movetime), "depth", and "play" (whether to play the move
+                found, True by default).
+        Returns:
+            The result of search_job(), with the "queue_time" it waited.
+        """
+        session = self.session(session_id)
+        if session.board.is_game_over(claim_draw=True):
+            raise HttpError(409, "the game is over")
+        # One search at a time, since each one starts from the game's board
+        if session.searches:
+            raise HttpError(409, "the engine is already searching this game")
+        movetime = float(field(data, "movetime", DEFAULT_MOVETIME, NUMBER))
+        if not 0 < movetime <= self.max_movetime:
+            raise HttpError(
+                400, f"movetime must be above 0 and at most {self.max_movetime}"
+            )
+        depth = field(data, "depth", MAX_DEPTH, INTEGER)
+        if not 1 <= depth <= MAX_DEPTH:
+            raise HttpError(400, f"depth must be from 1 to {MAX_DEPTH}")
+        play = field(data, "play", True, BOOLEAN)
+        future = asyncio.get_running_loop().create_future()
+        session.searches += 1
+        self.queue.put(
+            session_id,
+            {
+                "future": future,
+                "movetime": movetime,
+                "depth": depth,
+                "play": play,
+                "queued": time.perf_counter(),
+            },
+        )
+        return await future
+
+    def session(self, session_id):
+        """
+        Returns:
+            The Session with an id, raising HttpError 404 if there isn't one.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HttpError(404, f"no session {session_id}")
+        return session
+
+    def stats(self):
+        """
+        Returns:
+            A dict with the number of "sessions", "queued" and "running"
+            searches, engine "workers", "moves" found, "uptime",
+            "moves_per_second" over the uptime and "recent_moves_per_second"
+            over the last RATE_WINDOW seconds, and the "queue_latency" and
+            "search_time" mean, median, 95th percentile, and max in seconds.
+        """
+        now = time.perf_counter()
+        uptime = now - self.started
+        recent = sum(1 for finished in self.move_times if now - finished <= RATE_WINDOW)
+        return {
+            "sessions": len(self.sessions),
+            "queued": len(self.queue) if self.queue is not None else 0,
+            "running": self.running,
+            "workers": self.workers,
+            "moves": self.moves,
+            "uptime": uptime,
+            "moves_per_second": self.moves / uptime if uptime > 0 else 0.0,
+            "recent_moves_per_second": (
+                recent / min(uptime, RATE_WINDOW) if uptime > 0 else 0.0
+            ),
+            "queue_latency": summarize_times(self.latencies),
+            "search_time": summarize_times(self.search_times),
+        }
+
+    async def route(self, method, path, data):
+        """
+        Carry out one request.
+
+        Returns:
+            A (status, reply) tuple, where reply is a dict to send as JSON.
+        """
+        parts = [part for part in path.split("/") if part]
+        if parts == ["stats"] and method == "GET":
+            return (200, self.stats())
+        if parts == ["sessions"] and method == "POST":
+            try:
+                session = Session(field(data, "fen", chess.STARTING_FEN, STRING))
+            except ValueError as error:
+                raise HttpError(400, str(error)) from error
+            session_id = uuid.uuid4().hex
+            self.sessions[session_id] = session
+            return (201, session.as_dict(session_id))
+        if len(parts) == 2 and parts[0] == "sessions":
+            session = self.session(parts[1])
+            if method == "GET":
+                return (200, session.as_dict(parts[1]))
+            if method == "DELETE":
+                del self.sessions[parts[1]]
+                return (200, {"id": parts[1], "deleted": True})
+        if len(parts) == 3 and parts[0] == "sessions" and method == "POST":
+            session = self.session(parts[1])
+            if parts[2] == "go":
+                result = await self.go(parts[1], data)
+                return (200, dict(result, session=session.as_dict(parts[1])))
+            if parts[2] == "move":
+                if session.searches:
+                    raise HttpError(409, "the engine is searching this game")
+                move = field(data, "move", None, STRING)
+                try:
+                    session.board.push_uci(move)
+                except ValueError as error:
+                    raise HttpError(400, f"illegal move {move}") from error
+                return (200, session.as_dict(parts[1]))
+        if parts and parts[0] in ("stats", "sessions"):
+            raise HttpError(405, f"{method} isn't supported on {path}")
+        raise HttpError(404, f"nothing at {path}")
+
+    async def handle_connection(self, reader, writer):
+        """
+        Read one HTTP request from a connection, answer it, and close it.
+        """
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HttpError(400, "the body must be a JSON object")
+            status, reply = await self.route(method, target.split("?")[0], data)
+        except HttpError as error:
+            status, reply = error.status, {"error": error.message}
+        except (ValueError, asyncio.IncompleteReadError) as error:
+            status, reply = 400, {"error": str(error) or "malformed request"}
+        except Exception as error:
+            # Whatever went wrong, the client still gets an answer
+            status, reply = 500, {"error": repr(error)}
+        payload = json.dumps(reply).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode() + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+def summarize_times(times):
+    """
+    Returns:
+        A dict with the "mean", "median", "p95", and "max" of a list of
+        seconds, all 0.0 if it's empty.
+    """
+    if not times:
+        return {"mean": 0.0, "median": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(times)
+    return {
+        "mean": sum(ordered) / len(ordered),
+        "median": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+async def serve(host, port, workers, table_mb):
+    """
+    Run the server until it's interrupted.
+    """
+    engine_server = EngineServer(workers, table_mb)
+    server = await engine_server.start(host, port)
+    print(f"serving on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        engine_server.close()
+
+
+def main():
+    """
+    Start the server from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8023)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--hash", type=int, default=16, help="MB per worker")
+    options = parser.parse_args()
+    try:
+        asyncio.run(serve(options.host, options.port, options.workers, options.hash))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Collects statistics about a search so the engine's performance can be
+compared across code changes.
+"""
+
+import json
+
+
+class SearchStats:
+    """
+    Counters for one search, filled in by Minimax after every iteration.
+
+    Interior nodes are searched with depth left, leaf nodes are the positions
+    reached at the horizon, and quiescence nodes are the captures searched
+    past the horizon.
+    """
+
+    def __init__(self):
+        self.interior_nodes = 0
+        self.leaf_nodes = 0
+        self.quiescence_nodes = 0
+        self.elapsed = 0.0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        # One dict per completed iteration with its depth, nodes, time, ebf
+        self.iterations = []
+
+    @property
+    def nodes(self):
+        """
+        The total number of nodes searched.
+        """
+        return self.interior_nodes + self.leaf_nodes + self.quiescence_nodes
+
+    def ebf(self):
+        """
+        Returns:
+            The effective branching factor: how many times bigger each
+            iteration's tree was than the one before, on average (the
+            geometric mean), or 0.0 with fewer than two iterations.
+        """
+        counts = [iteration["nodes"] for iteration in self.iterations]
+        if len(counts) < 2 or counts[0] <= 0 or counts[-1] <= 0:
+            return 0.0
+        return (counts[-1] / counts[0]) ** (1 / (len(counts) - 1))
+
+    def as_dict(self):
+        """
+        Returns:
+            A dict of every statistic, ready to print or save as JSON.
+        """
+        nodes = self.nodes
+        return {
+            "nodes": nodes,
+            "interior_nodes": self.interior_nodes,
+            "leaf_nodes": self.leaf_nodes,
+            "quiescence_nodes": self.quiescence_nodes,
+            "elapsed": self.elapsed,
+            "nps": nodes / self.elapsed if self.elapsed > 0 else 0.0,
+            "beta_cutoffs": self.beta_cutoffs,
+            "first_move_cutoff_rate": (
+                self.first_move_cutoffs / self.beta_cutoffs
+                if self.beta_cutoffs
+                else 0.0
+            ),
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            "depth": self.iterations[-1]["depth"] if self.iterations else 0,
+            "ebf": self.ebf(),
+            "iterations": [dict(iteration) for iteration in self.iterations],
+        }
+
+
+def write_jsonl(path, record):
+    """
+    Append a record to a JSON Lines log, one JSON object per line.
+
+    Args:
+        path: the path of the log file; it's created if it doesn't exist.
+        record: a dict that can be converted to JSON.
+    """
+    with open(path, "a", encoding="utf-8") as log:
+        log.write(json.dumps(record) + "\n")
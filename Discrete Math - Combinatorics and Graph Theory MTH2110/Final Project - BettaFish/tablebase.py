@@ -0,0 +1,175 @@
+"""
+Probes Syzygy endgame tablebases from a local directory, so positions with
+few enough pieces are looked up instead of searched.
+"""
+
+import os
+import chess
+import chess.syzygy
+from transposition import position_key
+
+# Score of a tablebase win; below MATE_BOUND so it isn't mistaken for a mate
+TB_WIN = 90000
+
+
+def wdl_score(wdl, ply):
+    """
+    Convert a WDL result to a search score. Cursed wins and blessed losses
+    are draws under the fifty-move rule, so they score 0.
+
+    Args:
+        wdl: an int from -2 (loss) to 2 (win) for the side to move.
+        ply: an int representing the distance from the root, so nearer wins
+            score higher.
+    Returns:
+        An int score from the side to move's point of view.
+    """
+    if wdl == 2:
+        return TB_WIN - ply
+    if wdl == -2:
+        return -TB_WIN + ply
+    return 0
+
+
+def fifty_move_wdl(wdl, dtz, halfmove_clock):
+    """
+    Correct a WDL result, which assumes the fifty-move counter is zero, for
+    the counter the position actually has: a win or loss whose next capture
+    or pawn move would come after the counter reaches 100 is a draw.
+
+    Args:
+        wdl: an int from -2 (loss) to 2 (win) for the side to move.
+        dtz: the position's DTZ, from Tablebase.probe_dtz().
+        halfmove_clock: the position's fifty-move counter, in plies.
+    Returns:
+        The WDL, with such wins as cursed wins (1) and losses as blessed
+        losses (-1).
+    """
+    if wdl in (2, -2) and halfmove_clock + abs(dtz) > 100:
+        return wdl // 2
+    return wdl
+
+
+class Tablebase:
+    """
+    Wraps a python-chess Syzygy tablebase with a cache of probe results keyed
+    by Zobrist hash, since the search reaches the same endgame positions many
+    times.
+    """
+
+    def __init__(self, directory, cache_size=1 << 16):
+        self.directory = directory
+        self.tables = chess.syzygy.open_tablebase(directory)
+        # Table names look like "KQvK", one letter per piece
+        self.max_pieces = max((len(name) - 1 for name in self.tables.wdl), default=0)
+        self.cache_size = cache_size
+        self.wdl_cache = {}
+        self.dtz_cache = {}
+        self.probes = 0
+        self.hits = 0
+
+    def close(self):
+        """
+        Close the table files.
+        """
+        self.tables.close()
+
+    def covers(self, board):
+        """
+        Returns:
+            True if the position has few enough pieces to be in the tables.
+            Positions with castling rights never are.
+        """
+        return (
+            chess.popcount(board.occupied) <= self.max_pieces
+            and not board.castling_rights
+        )
+
+    def cached_probe(self, cache, probe, board):
+        """
+        Look a position up in a cache, probing the tables on a miss. Missing
+        tables are cached as None too. The cache is emptied when full.
+        """
+        self.probes += 1
+        key = position_key(board)
+        if key in cache:
+            self.hits += 1
+            return cache[key]
+        if len(cache) >= self.cache_size:
+            cache.clear()
+        result = probe(board)
+        cache[key] = result
+        return result
+
+    def probe_wdl(self, board):
+        """
+        Returns:
+            An int from -2 (loss) to 2 (win) for the side to move, or None if
+            the position isn't in the tables.
+        """
+        return self.cached_probe(self.wdl_cache, self.tables.get_wdl, board)
+
+    def probe_dtz(self, board):
+        """
+        Returns:
+            An int distance to the next capture or pawn move (negative when
+            losing), or None if the position isn't in the tables.
+        """
+        return self.cached_probe(self.dtz_cache, self.tables.get_dtz, board)
+
+    def best_move(self, board):
+        """
+        Pick the root move that keeps the best WDL result, making progress by
+        DTZ: the fastest conversion when winning and the slowest when losing.
+        Results are corrected for the board's fifty-move counter, so a win
+        that can't convert before it runs out counts as a draw.
+
+        Args:
+            board: a chess.Board() object covered by the tables; it's restored
+                before returning.
+        Returns:
+            A (wdl, move) tuple for the side to move, or None if any resulting
+            position is missing from the tables or there are no legal moves.
+        """
+        best = None
+        for move in list(board.legal_moves):
+            board.push(move)
+            if board.is_checkmate():
+                child = (-2, 0)
+            else:
+                child = (self.probe_wdl(board), self.probe_dtz(board))
+                if child[0] is not None and child[1] is not None:
+                    wdl = fifty_move_wdl(child[0], child[1], board.halfmove_clock)
+                    child = (wdl, child[1])
+            board.pop()
+            if child[0] is None or child[1] is None:
+                return None
+            # The child's scores are from the opponent's point of view; when
+            # winning, its DTZ is negative and nearer zero is faster
+            rank = (-child[0], child[1])
+            if best is None or rank > best[0]:
+                best = (rank, move)
+        if best is None:
+            return None
+        return (best[0][0], best[1])
+
+    def stats(self):
+        """
+        Returns:
+            A dict with the number of probes, cache hits, and the hit rate.
+        """
+        return {
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+        }
+
+
+def open_tablebase(directory):
+    """
+    Returns:
+        A Tablebase, or None if directory isn't set or doesn't exist.
+    """
+    if directory is None or not os.path.isdir(directory):
+        return None
+    return Tablebase(directory)
@@ -0,0 +1,96 @@
+"""
+Tests for the batch analysis in analyze.py
+"""
+
+import json
+import analyze
+
+EPD = """# a comment
+6k1/5ppp/8/8/8/8/8/R5K1 w - - id "mate";
+rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq -
+8/8/8/4k3/8/8/4P3/4K3 w - - id "pawn";
+"""
+
+PGN = """[Event "test"]
+[Result "*"]
+
+1. e4 e5 2. Nf3 *
+
+[Event "test"]
+[Result "*"]
+
+1. d4 *
+"""
+
+
+def read_results(path):
+    with open(path, encoding="utf-8") as results:
+        return [json.loads(line) for line in results]
+
+
+def test_reads_epd_and_pgn(tmp_path):
+    epd_path = tmp_path / "positions.epd"
+    epd_path.write_text(EPD)
+    ids = [position["id"] for position in analyze.read_positions(str(epd_path))]
+    assert ids == ["mate", "3", "pawn"]
+
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(PGN)
+    positions = list(analyze.read_positions(str(pgn_path)))
+    assert [position["id"] for position in positions] == [
+        "1:0",
+        "1:1",
+        "1:2",
+        "1:3",
+        "2:0",
+        "2:1",
+    ]
+    assert positions[3]["fen"].startswith("rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/")
+
+
+def test_results_are_in_input_order(tmp_path):
+    epd_path = tmp_path / "positions.epd"
+    epd_path.write_text(EPD)
+    out_path = str(tmp_path / "results.jsonl")
+    assert analyze.analyze(str(epd_path), out_path, depth=2, workers=2) == 3
+    results = read_results(out_path)
+    assert [result["id"] for result in results] == ["mate", "3", "pawn"]
+    assert results[0]["move"] == "a1a8"
+    assert all(result["nodes"] > 0 for result in results)
+    assert results[1]["depth"] == 2
+
+
+def test_interrupted_run_resumes(tmp_path):
+    epd_path = tmp_path / "positions.epd"
+    epd_path.write_text(EPD)
+    out_path = tmp_path / "results.jsonl"
+    first = {"id": "mate", "move": "a1a8"}
+    # One finished result and one cut off halfway through writing it
+    out_path.write_text(json.dumps(first) + '\n{"id": "3", "mo')
+    assert analyze.analyze(str(epd_path), str(out_path), depth=1, workers=1) == 2
+    results = read_results(out_path)
+    assert results[0] == first
+    assert [result["id"] for result in results] == ["mate", "3", "pawn"]
+    assert analyze.analyze(str(epd_path), str(out_path), depth=1, workers=1) == 0
+
+
+def test_jobs_are_read_as_the_window_has_room(tmp_path, monkeypatch):
+    read = []
+
+    def positions(path):
+        for index in range(12):
+            read.append(index)
+            yield {"id": str(index), "fen": "8/8/8/4k3/8/8/4P3/4K3 w - - 0 1"}
+
+    def check_window(result):
+        # The result of position i is back before position i + 3 is read
+        assert len(read) <= int(result["id"]) + 3
+
+    monkeypatch.setattr(analyze, "read_positions", positions)
+    monkeypatch.setattr(analyze, "JOBS_PER_WORKER", 2)
+    out_path = str(tmp_path / "results.jsonl")
+    # No depth or movetime searches to DEFAULT_DEPTH, not without limit
+    assert analyze.analyze("many.epd", out_path, workers=1, progress=check_window) == 12
+    assert {result["depth"] for result in read_results(out_path)} == {
+        analyze.DEFAULT_DEPTH
+    }
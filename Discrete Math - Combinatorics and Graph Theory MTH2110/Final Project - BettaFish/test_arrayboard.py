@@ -0,0 +1,101 @@
+"""
+Tests for the array board in arrayboard.py and the search on it
+"""
+
+import random
+import chess
+import chess.polyglot
+import minimax
+from arrayboard import ArrayBoard
+from eval import Evaluator
+from ordering import static_exchange
+from transposition import TranspositionTable, encode_move, decode_move
+
+# The standard perft positions, each with the depth to test it to
+PERFT_SUITE = [
+    (chess.STARTING_FEN, 3),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 2),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 3),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 2),
+    (
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        2,
+    ),
+]
+
+
+def chess_perft(board, depth):
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += chess_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def test_perft_matches_python_chess():
+    for fen, depth in PERFT_SUITE:
+        board = ArrayBoard.from_board(chess.Board(fen))
+        assert board.perft(depth) == chess_perft(chess.Board(fen), depth), fen
+        assert board.ply == 0
+    assert ArrayBoard.from_board(chess.Board()).perft(4) == 197281
+
+
+def test_make_and_unmake_follow_python_chess():
+    rng = random.Random(7)
+    for _ in range(20):
+        board = chess.Board()
+        array_board = ArrayBoard.from_board(board)
+        for _ in range(80):
+            assert array_board.key == chess.polyglot.zobrist_hash(board)
+            assert array_board.score == Evaluator(board).score()
+            assert array_board.is_check() == board.is_check()
+            assert sorted(array_board.legal_moves()) == sorted(
+                encode_move(move) for move in board.legal_moves
+            )
+            for move in board.generate_pseudo_legal_captures():
+                assert array_board.static_exchange(
+                    encode_move(move)
+                ) == static_exchange(board, move)
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            move = rng.choice(moves)
+            board.push(move)
+            array_board.make(encode_move(move))
+        assert array_board.to_board().board_fen() == board.board_fen()
+        while array_board.ply:
+            array_board.unmake()
+        assert array_board.fen() == chess.STARTING_FEN
+        assert array_board.key == chess.polyglot.zobrist_hash(chess.Board())
+
+
+def test_array_search_finds_mate_in_one():
+    board = chess.Board("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    searcher = minimax.Minimax(board, array_board=True)
+    score, best_move = searcher.search(max_depth=3)
+    assert best_move == chess.Move.from_uci("a1a8")
+    assert score >= minimax.MATE_BOUND
+    assert searcher.pv[0] == best_move
+
+
+def test_array_search_matches_board_search():
+    fen = "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"
+    board = chess.Board(fen)
+    searcher = minimax.Minimax(board, TranspositionTable(1), array_board=True)
+    score, best_move = searcher.search(max_depth=4)
+    expected = minimax.Minimax(chess.Board(fen), TranspositionTable(1)).search(4)
+    assert (score, best_move) == expected
+    assert searcher.nodes > 0 and searcher.stats.as_dict()["depth"] == 4
+    for move in searcher.pv:
+        assert move in board.legal_moves
+        board.push(move)
+
+    timed_board = chess.Board()
+    timed = minimax.Minimax(timed_board, array_board=True)
+    _, timed_move = timed.search(max_depth=30, movetime=0.3)
+    assert timed_move in timed_board.legal_moves
+    assert len(timed_board.move_stack) == 0
@@ -0,0 +1,39 @@
+"""
+Tests for the benchmark harness in bench.py
+"""
+
+import bench
+
+
+def test_suite_loads_positions_and_best_moves(tmp_path, monkeypatch):
+    # The suite is found from any working directory
+    monkeypatch.chdir(tmp_path)
+    suite = bench.load_suite()
+    ids = [position["id"] for position in suite]
+    assert len(ids) == len(set(ids))
+    assert any(position["best_moves"] for position in suite)
+    back_rank = suite[ids.index("endgame.back_rank")]
+    assert back_rank["best_moves"] == ["a1a8"]
+
+
+def test_fixed_depth_runs_are_repeatable():
+    suite = bench.load_suite()[:2]
+    first = bench.summarize([bench.run_position(p, max_depth=2) for p in suite])
+    second = bench.summarize([bench.run_position(p, max_depth=2) for p in suite])
+    assert first["nodes"] == second["nodes"] > 0
+    back_rank = [p for p in bench.load_suite() if p["id"] == "endgame.back_rank"]
+    assert bench.run_position(back_rank[0], max_depth=2)["correct"]
+
+
+def test_compare_marks_improvements_positive():
+    baseline = {"fixed_depth": {"nodes": 100, "nps": 1000}}
+    report = {"fixed_depth": {"nodes": 80, "nps": 1100, "positions": []}}
+    changes = {name: change for name, _, _, change in bench.compare(report, baseline)}
+    assert changes["fixed_depth.nodes"] > 0
+    assert changes["fixed_depth.nps"] > 0
+
+
+def test_microbenchmarks_time_each_function():
+    timings = bench.microbenchmarks(bench.load_suite()[:3], repeat=2)
+    assert set(timings) == {"evaluate_board", "calc_piece_activity", "legal_moves"}
+    assert all(timing["us_per_call"] > 0 for timing in timings.values())
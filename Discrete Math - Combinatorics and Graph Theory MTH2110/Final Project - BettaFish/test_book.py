@@ -0,0 +1,60 @@
+"""
+Tests for the Polyglot opening book in book.py
+"""
+
+import chess
+import book
+import controller
+
+GAMES = """[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Nf6 4. O-O 1-0
+
+[Result "1/2-1/2"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Nf6 4. O-O 1/2-1/2
+
+[Result "0-1"]
+
+1. d4 d5 2. c4 e6 0-1
+
+[Result "0-1"]
+
+1. d4 d5 2. c4 e6 0-1
+"""
+
+
+def build(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(GAMES)
+    book_path = tmp_path / "book.bin"
+    book.build_book([pgn_path], book_path, min_games=2)
+    return book_path
+
+
+def test_built_book_weights_moves_by_results(tmp_path):
+    opening_book = book.OpeningBook(build(tmp_path), book.BEST)
+    try:
+        # 1. e4 won one game and drew one, 1. d4 lost both
+        assert opening_book.moves(chess.Board()) == [(chess.Move.from_uci("e2e4"), 3)]
+        board = chess.Board()
+        for move in ["e2e4", "e7e5", "g1f3", "b8c6", "f1c4", "g8f6"]:
+            board.push_uci(move)
+        # Castling is stored as king takes rook but read back as a normal move
+        assert opening_book.choose(board) == chess.Move.from_uci("e1g1")
+        board.push_uci("e1g1")
+        assert opening_book.choose(board) is None
+    finally:
+        opening_book.close()
+
+
+def test_controller_plays_book_moves_then_leaves_book(tmp_path):
+    board = chess.Board()
+    control = controller.ControlGame(board, max_depth=1, book_path=build(tmp_path))
+    control.bot_move()
+    assert board.peek() == chess.Move.from_uci("e2e4")
+    board.push_uci("a7a6")
+    control.bot_move()
+    assert control.book is None
+    assert len(board.move_stack) == 3
+    control.close()
@@ -0,0 +1,85 @@
+"""
+Tests for the background engine process in engine.py
+"""
+
+import time
+import chess
+import controller
+import engine
+
+
+def wait_for_bestmove(background, request_id, timeout=20):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        for response in background.poll():
+            if response["type"] == "bestmove" and response["id"] == request_id:
+                return response
+        time.sleep(0.01)
+    raise AssertionError("no bestmove arrived")
+
+
+def test_background_engine_finds_a_move_without_blocking():
+    board = chess.Board()
+    background = engine.BackgroundEngine(table_mb=1)
+    try:
+        start = time.perf_counter()
+        request_id = background.go(board, movetime=0.3)
+        # go() only queues the request
+        assert time.perf_counter() - start < 0.1
+        response = wait_for_bestmove(background, request_id)
+        assert chess.Move.from_uci(response["move"]) in board.legal_moves
+    finally:
+        background.close()
+
+
+def test_newer_request_replaces_ponder_search():
+    board = chess.Board()
+    background = engine.BackgroundEngine(table_mb=1)
+    try:
+        # An unlimited ponder search only ends when something replaces it
+        ponder_id = background.go(board, movetime=None)
+        time.sleep(0.2)
+        board.push_uci("e2e4")
+        request_id = background.go(board, movetime=0.2)
+        response = wait_for_bestmove(background, request_id)
+        assert chess.Move.from_uci(response["move"]) in board.legal_moves
+        assert ponder_id != request_id
+    finally:
+        background.close()
+
+
+def test_ponder_search_waits_for_ponderhit():
+    board = chess.Board()
+    board.push_uci("e2e4")
+    background = engine.BackgroundEngine(table_mb=1)
+    try:
+        ponder_id = background.go(board, max_depth=3, ponder=True)
+        # Depth 3 finishes long before this, but the move is held back
+        time.sleep(0.5)
+        assert not any(response["type"] == "bestmove" for response in background.poll())
+        background.ponderhit(ponder_id, movetime=0.2)
+        response = wait_for_bestmove(background, ponder_id)
+        assert chess.Move.from_uci(response["move"]) in board.legal_moves
+    finally:
+        background.close()
+
+
+def test_controller_carries_on_the_ponder_search_on_a_ponderhit():
+    control = controller.ControlGame(chess.Board(), book_path=None, movetime=0.2)
+    try:
+        control.start_bot_move()
+        while not control.poll_bot_move():
+            time.sleep(0.01)
+        ponder_id = control.ponder_id
+        assert ponder_id is not None
+        # The player makes the reply the engine expected
+        control.move_uci(control.ponder_board.peek().uci())
+        control.start_bot_move()
+        assert control.request_id == ponder_id
+        deadline = time.perf_counter() + 20
+        while not control.poll_bot_move():
+            assert time.perf_counter() < deadline
+            time.sleep(0.01)
+        assert len(control.board.move_stack) == 3
+    finally:
+        control.close()
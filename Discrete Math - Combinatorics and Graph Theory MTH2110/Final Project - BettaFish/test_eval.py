@@ -0,0 +1,75 @@
+"""
+Tests for the board evaluation in eval.py
+"""
+
+import random
+import chess
+import eval
+
+
+def test_flat_pst_matches_numpy_tables():
+    for piece_type in chess.PIECE_TYPES:
+        symbol = chess.piece_symbol(piece_type).upper()
+        for color in chess.COLORS:
+            for square in chess.SQUARES:
+                assert (
+                    eval.flat_pst[color][piece_type * 64 + square]
+                    == eval.pst[symbol][color][square // 8, square % 8]
+                )
+
+
+def test_evaluator_follows_random_games():
+    # Random games cover captures, castling, en passant, and promotions
+    rng = random.Random(0)
+    for _ in range(30):
+        board = chess.Board()
+        evaluator = eval.Evaluator(board)
+        for _ in range(150):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            move = rng.choice(moves)
+            expected = evaluator.score_after(move)
+            evaluator.push(move)
+            assert evaluator.score() == expected
+            assert evaluator.score() == eval.calc_piece_activity(board)
+        while board.move_stack:
+            evaluator.pop()
+            assert evaluator.score() == eval.calc_piece_activity(board)
+
+
+def test_relative_score_flips_with_side_to_move():
+    board = chess.Board("4k3/8/8/8/8/8/8/QQQQK3 b - - 0 1")
+    evaluator = eval.Evaluator(board)
+    assert evaluator.score() > 0
+    assert evaluator.relative_score() == -evaluator.score()
+
+
+def slow_piece_activity(board):
+    # The square-by-square loop calc_piece_activity used to run
+    total = 0
+    for square, piece in board.piece_map().items():
+        symbol = piece.symbol().upper()
+        value = (
+            eval.piece_vals[symbol]
+            + eval.pst[symbol][piece.color][square // 8, square % 8]
+        )
+        total += value if piece.color else -value
+    return total
+
+
+def test_bitboard_evaluation_matches_square_loop():
+    rng = random.Random(1)
+    boards = []
+    for _ in range(20):
+        board = chess.Board()
+        for _ in range(rng.randrange(1, 120)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        boards.append(board)
+        assert eval.calc_piece_activity(board) == slow_piece_activity(board)
+    batch = eval.calc_piece_activity_batch(boards)
+    assert list(batch) == [slow_piece_activity(board) for board in boards]
+    assert len(eval.calc_piece_activity_batch([])) == 0
@@ -0,0 +1,52 @@
+"""
+Tests for the self-play match runner in match.py
+"""
+
+import io
+import chess.pgn
+import match
+
+
+def test_elo_and_score_convert_both_ways():
+    assert match.elo_from_score(0.5) == 0
+    assert abs(match.score_from_elo(match.elo_from_score(0.64)) - 0.64) < 1e-9
+    elo, margin = match.elo_estimate(60, 20, 20)
+    assert elo > 0 and 0 < margin < elo
+    assert match.elo_estimate(6, 2, 2)[1] > margin
+
+
+def test_sprt_favors_the_hypothesis_the_results_match():
+    lower, upper = match.sprt_bounds()
+    assert lower < 0 < upper
+    assert match.sprt_llr(600, 200, 200, 0, 10) > upper
+    assert match.sprt_llr(200, 200, 600, 0, 10) < lower
+    assert match.sprt_llr(5, 0, 0, 0, 10) == 0  # no spread to measure yet
+    assert match.sprt_llr(0, 0, 0, 0, 10) == 0
+    # Winning and drawing without a loss is still evidence for elo1
+    assert match.sprt_llr(150, 150, 0, 0, 10) > upper
+
+
+def test_jobs_alternate_colors_on_each_opening():
+    openings = [{"fen": chess.STARTING_FEN, "id": "start"}]
+    jobs = match.match_jobs({}, {"options": {"lmr": False}}, openings, 4, 0.1, None, 20)
+    assert [job["a_is_white"] for job in jobs] == [True, False, True, False]
+    assert jobs[1]["white"] == {"options": {"lmr": False}}
+
+
+def test_short_match_writes_pgn(tmp_path):
+    pgn_path = tmp_path / "match.pgn"
+    report = match.run_match(
+        {"options": {}},
+        {"options": {"null_move": False, "lmr": False}},
+        games=2,
+        nodes=300,
+        workers=1,
+        pgn_path=pgn_path,
+        max_plies=6,
+    )
+    assert report["wins"] + report["draws"] + report["losses"] == 2
+    pgn = io.StringIO(pgn_path.read_text())
+    first = chess.pgn.read_game(pgn)
+    second = chess.pgn.read_game(pgn)
+    assert {first.headers["White"], second.headers["White"]} == {"A", "B"}
+    assert len(list(first.mainline_moves())) == 6
@@ -1,12 +1,123 @@
 import chess
 import minimax
 
-board = chess.Board()
-move = chess.Move.from_uci("e2e4")
-board.push(move)
 
-minmax = minimax.Minimax(board)
+def test_search_respects_movetime():
+    timed_board = chess.Board()
+    timed_search = minimax.Minimax(timed_board)
+    score, best_move = timed_search.search(max_depth=30, movetime=0.5)
+    assert best_move in timed_board.legal_moves
+    assert len(timed_board.move_stack) == 0  # aborted iterations are undone
+    assert 1 <= len(timed_search.iterations) < 30
+    assert timed_search.iterations[-1]["time"] < 2
 
-results = minmax.generate_next_move(3)
-board.push(results[1])
-print(board)
+
+def test_node_budget_is_exact():
+    for array_board in (False, True):
+        budget_board = chess.Board()
+        budget_search = minimax.Minimax(budget_board, array_board=array_board)
+        score, best_move = budget_search.search(max_depth=30, max_nodes=5000)
+        assert budget_search.nodes == 5000
+        assert best_move in budget_board.legal_moves
+        assert len(budget_board.move_stack) == 0
+
+
+def test_stopped_first_iteration_keeps_best_root_move():
+    # Qxd5 wins a pawn; a budget too small to finish depth 1 still finds it
+    for array_board in (False, True):
+        partial_board = chess.Board("4k3/8/8/3p4/8/8/8/3QK3 w - - 0 1")
+        partial_search = minimax.Minimax(partial_board, array_board=array_board)
+        score, best_move = partial_search.search(max_depth=5, max_nodes=25)
+        assert partial_search.iterations == []
+        assert best_move == chess.Move.from_uci("d1d5")
+        assert partial_search.pv[0] == best_move
+        assert score > 0
+
+
+def test_search_orders_by_principal_variation():
+    pv_board = chess.Board()
+    pv_search = minimax.Minimax(pv_board)
+    pv_search.search(max_depth=3)
+    assert len(pv_search.pv) == 3
+    assert pv_search.pv[0] == pv_search.iterations[-1]["move"]
+
+
+def test_search_finds_mate_in_one():
+    mate_board = chess.Board("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    mate_search = minimax.Minimax(mate_board)
+    score, best_move = mate_search.search(max_depth=3)
+    assert best_move == chess.Move.from_uci("a1a8")
+    assert score >= minimax.MATE_BOUND
+    assert mate_search.pv[0] == best_move
+
+
+def test_search_returns_legal_principal_variation():
+    pv_board = chess.Board(
+        "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"
+    )
+    pv_search = minimax.Minimax(pv_board)
+    pv_search.search(max_depth=4)
+    for move in pv_search.pv:
+        assert move in pv_board.legal_moves
+        pv_board.push(move)
+
+
+def test_quiescence_sees_the_recapture():
+    # Qxd5 wins a pawn at depth 1 but loses the queen to the c6 pawn
+    qs_board = chess.Board("4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1")
+    qs_search = minimax.Minimax(qs_board)
+    score, best_move = qs_search.search(max_depth=1)
+    assert best_move != chess.Move.from_uci("d1d5")
+    assert qs_search.qnodes > 0
+
+
+def test_selective_search_switches_reduce_nodes():
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+    full = minimax.Minimax(chess.Board(fen), null_move=False, lmr=False)
+    full.search(max_depth=5)
+    assert full.null_move_tries == full.reductions == 0
+    selective = minimax.Minimax(chess.Board(fen))
+    selective.search(max_depth=5)
+    assert selective.null_move_tries > 0
+    assert selective.reductions > 0
+    assert selective.nodes < full.nodes
+
+
+def test_ordering_and_pvs_shrink_the_tree():
+    # Nearly all the pruning comes from the ordering; the null windows of PVS
+    # only save more on top of it, since they pay off when the first move is
+    # best
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+    nodes = {}
+    results = set()
+    for name, options in (
+        ("all", {}),
+        ("no_pvs", {"pvs": False}),
+        ("no_ordering", {"ordering": False}),
+    ):
+        searcher = minimax.Minimax(chess.Board(fen), **options)
+        results.add(searcher.search(max_depth=3))
+        nodes[name] = searcher.nodes
+    assert len(results) == 1
+    assert nodes["no_ordering"] > 10 * nodes["all"]
+    assert nodes["no_pvs"] > nodes["all"]
+
+
+def test_null_move_is_skipped_in_pawn_endgames():
+    # Pawn endings are where passing would wrongly look safe (zugzwang)
+    endgame_board = chess.Board("8/8/1k6/2p5/2P5/1K6/8/8 w - - 0 1")
+    endgame_search = minimax.Minimax(endgame_board)
+    endgame_search.search(max_depth=6)
+    assert endgame_search.null_move_tries == 0
+
+
+if __name__ == "__main__":
+    board = chess.Board()
+    move = chess.Move.from_uci("e2e4")
+    board.push(move)
+
+    minmax = minimax.Minimax(board)
+
+    results = minmax.generate_next_move(3)
+    board.push(results[1])
+    print(board)
@@ -0,0 +1,81 @@
+"""
+Tests for the move ordering in ordering.py
+"""
+
+import random
+import chess
+import minimax
+from ordering import MoveOrderer, mvv_lva, static_exchange
+
+
+def test_mvv_lva_prefers_valuable_victims_and_cheap_attackers():
+    # White pawn and queen can both take the black queen on d5 or pawn on e6
+    board = chess.Board("4k3/8/4p3/3q4/4P3/8/8/3QK3 w - - 0 1")
+    pawn_takes_queen = chess.Move.from_uci("e4d5")
+    queen_takes_queen = chess.Move.from_uci("d1d5")
+    assert mvv_lva(board, pawn_takes_queen) > mvv_lva(board, queen_takes_queen)
+
+
+def test_order_puts_hash_move_then_captures_then_killers():
+    board = chess.Board("4k3/8/4p3/3q4/4P3/8/8/3QK3 w - - 0 1")
+    orderer = MoveOrderer()
+    hash_move = chess.Move.from_uci("e1f2")
+    killer = chess.Move.from_uci("d1a4")
+    orderer.record_cutoff(board, killer, 3, 2, 0)
+
+    ordered = orderer.order(board, list(board.legal_moves), 0, hash_move)
+    assert ordered[0] == hash_move
+    assert ordered[1] == chess.Move.from_uci("e4d5")
+    assert ordered[2] == chess.Move.from_uci("d1d5")
+    assert ordered[3] == killer
+
+
+def test_ordering_reduces_nodes_without_changing_score():
+    fen = "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"
+    unordered = minimax.Minimax(chess.Board(fen), ordering=False)
+    ordered = minimax.Minimax(chess.Board(fen), ordering=True)
+    assert ordered.search(max_depth=3)[0] == unordered.search(max_depth=3)[0]
+    assert ordered.nodes < unordered.nodes
+    assert ordered.orderer.stats()["first_move_cutoff_rate"] > 0.5
+
+
+def test_static_exchange_counts_recaptures_and_x_rays():
+    # Rook takes an undefended pawn
+    board = chess.Board("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1")
+    assert static_exchange(board, chess.Move.from_uci("e1e5")) == 100
+    # Knight takes a pawn defended by a knight, with batteries behind both
+    board = chess.Board("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1")
+    assert static_exchange(board, chess.Move.from_uci("d3e5")) == 100 - 280
+    # Doubled rooks win a queen outright
+    board = chess.Board("4k3/8/8/3q4/8/8/3R4/3RK3 w - - 0 1")
+    assert static_exchange(board, chess.Move.from_uci("d2d5")) == 929
+
+
+def test_pick_yields_every_legal_move_once():
+    # Random games cover castling, en passant, promotions, pins, and checks
+    rng = random.Random(2)
+    orderer = MoveOrderer()
+    for _ in range(40):
+        board = chess.Board()
+        for _ in range(120):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            hash_move = rng.choice(moves)
+            orderer.killers[1] = [rng.choice(moves), chess.Move.from_uci("a2a4")]
+            picked = list(orderer.pick(board, 1, hash_move))
+            assert len(picked) == len(set(picked)) == len(moves)
+            assert set(picked) == set(moves)
+            assert picked[0] == hash_move
+            board.push(rng.choice(moves))
+
+
+def test_pick_hands_out_moves_in_sorted_order():
+    board = chess.Board("4k3/8/4p3/3q4/4P3/8/8/3QK3 w - - 0 1")
+    orderer = MoveOrderer()
+    hash_move = chess.Move.from_uci("e1f2")
+    picker = orderer.pick(board, 0, hash_move)
+    assert next(picker) == hash_move
+    assert next(picker) == chess.Move.from_uci("e4d5")
+    full = orderer.order(board, list(board.legal_moves), 0, hash_move)
+    assert [hash_move, chess.Move.from_uci("e4d5")] + list(picker) == full
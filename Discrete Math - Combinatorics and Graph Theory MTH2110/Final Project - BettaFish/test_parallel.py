@@ -0,0 +1,109 @@
+"""
+Tests for the multiprocess search in parallel.py
+"""
+
+import time
+import chess
+import minimax
+import parallel
+
+FEN = "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"
+
+
+def test_root_split_matches_single_process_score():
+    expected = minimax.Minimax(chess.Board(FEN)).search(max_depth=3)
+    searcher = parallel.ParallelSearch(2, parallel.ROOT_SPLIT)
+    try:
+        score, move = searcher.search(chess.Board(FEN), max_depth=3)
+    finally:
+        searcher.close()
+    assert score == expected[0]
+    assert move in chess.Board(FEN).legal_moves
+    assert searcher.depth == 3
+
+
+def test_lazy_smp_returns_deepest_result():
+    searcher = parallel.ParallelSearch(2, parallel.LAZY_SMP)
+    try:
+        score, move = searcher.search(chess.Board(FEN), max_depth=3)
+    finally:
+        searcher.close()
+    assert move in chess.Board(FEN).legal_moves
+    assert searcher.depth == 3
+    assert searcher.pv[0] == move
+    assert searcher.nodes > 0
+
+
+def test_workers_share_one_table():
+    searcher = parallel.ParallelSearch(2, parallel.LAZY_SMP, table_mb=1)
+    try:
+        searcher.search(chess.Board(FEN), max_depth=3)
+        stored = len(searcher.table)
+        first = searcher.nodes
+        searcher.search(chess.Board(FEN), max_depth=3)
+        again = searcher.nodes
+        searcher.clear()
+        assert len(searcher.table) == 0
+    finally:
+        searcher.close()
+    # The workers' entries are in the main process's view of the table, and
+    # a second search of the same position starts warm
+    assert stored > 0
+    assert again < first
+
+
+def test_stop_and_node_budget_reach_the_workers():
+    searcher = parallel.ParallelSearch(2, parallel.ROOT_SPLIT)
+    iterations = []
+    try:
+        score, move = searcher.search(
+            chess.Board(), max_depth=30, max_nodes=3000, on_iteration=iterations.append
+        )
+        assert move in chess.Board().legal_moves
+        assert searcher.nodes < 3000 + 2 * minimax.CHECK_INTERVAL
+
+        started = time.perf_counter()
+        searcher.search(
+            chess.Board(),
+            max_depth=30,
+            stop_check=lambda: time.perf_counter() - started > 0.5,
+        )
+        assert time.perf_counter() - started < 5
+        assert searcher.depth > 0 and searcher.stats["nodes"] == searcher.nodes
+    finally:
+        searcher.close()
+    assert [iteration["depth"] for iteration in iterations] == list(
+        range(1, len(iterations) + 1)
+    )
+    assert iterations[-1]["move"] == move
+
+
+def test_scaling_report_measures_time_to_depth():
+    report = parallel.scaling_report(FEN, max_workers=2, depth=2)
+    assert [row["workers"] for row in report] == [1, 2]
+    assert report[0]["speedup"] == 1.0
+    assert all(row["time_to_depth"] > 0 and "nps" not in row for row in report)
+
+
+def test_root_split_reports_moves_of_unfinished_workers():
+    def iteration(depth, score, move):
+        return {"depth": depth, "score": score, "move": move, "pv": [move]}
+
+    searcher = parallel.ParallelSearch(3, parallel.ROOT_SPLIT)
+    try:
+        jobs = searcher.jobs(chess.Board(), 4, None, None)
+        results = [
+            {"iterations": [iteration(1, 10, "e2e4"), iteration(2, 5, "e2e4")]},
+            {"iterations": [], "partial": iteration(0, 20, "d2d4")},
+            {"iterations": [], "partial": None},
+        ]
+        best = searcher.merge_root_split(results, jobs)
+    finally:
+        searcher.close()
+    # The first worker's depth 1 is compared with the second's partial, and
+    # the moves of both unfinished workers may not have been searched
+    assert best["move"] == "d2d4"
+    assert searcher.unsearched == [
+        chess.Move.from_uci(move)
+        for move in jobs[1]["root_moves"] + jobs[2]["root_moves"]
+    ]
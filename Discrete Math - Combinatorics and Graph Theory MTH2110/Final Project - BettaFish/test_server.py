@@ -0,0 +1,118 @@
+"""
+Tests for the engine server in server.py
+"""
+
+import asyncio
+import json
+import chess
+import server
+
+
+async def request(port, method, path, data=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(data).encode() if data is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return (int(head.split()[1]), json.loads(payload))
+
+
+def run_with_server(test, workers=1):
+    async def main():
+        engine_server = server.EngineServer(workers=workers, table_mb=1)
+        listener = await engine_server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            return await test(port)
+        finally:
+            listener.close()
+            engine_server.close()
+
+    return asyncio.run(main())
+
+
+def test_fair_queue_takes_turns_between_sessions():
+    async def main():
+        queue = server.FairQueue()
+        for item in ("a1", "a2", "a3"):
+            queue.put("a", item)
+        queue.put("b", "b1")
+        queue.put("c", "c1")
+        return [(await queue.get())[1] for _ in range(5)]
+
+    assert asyncio.run(main()) == ["a1", "b1", "c1", "a2", "a3"]
+
+
+def test_sessions_play_engine_moves():
+    async def test(port):
+        status, session = await request(port, "POST", "/sessions", {})
+        assert status == 201
+        path = f"/sessions/{session['id']}"
+        status, _ = await request(port, "POST", path + "/move", {"move": "e2e4"})
+        assert status == 200
+        status, reply = await request(
+            port, "POST", path + "/go", {"movetime": 0.2, "depth": 2}
+        )
+        assert status == 200
+        board = chess.Board()
+        board.push_uci("e2e4")
+        assert chess.Move.from_uci(reply["move"]) in board.legal_moves
+        assert reply["session"]["moves"] == ["e2e4", reply["move"]]
+
+        status, _ = await request(port, "POST", path + "/move", {"move": "e2e4"})
+        assert status == 400
+        status, _ = await request(port, "POST", path + "/go", {"movetime": 1000})
+        assert status == 400
+        status, _ = await request(port, "GET", "/sessions/missing")
+        assert status == 404
+        return await request(port, "GET", "/stats")
+
+    status, stats = run_with_server(test)
+    assert status == 200
+    assert stats["moves"] == 1 and stats["sessions"] == 1
+    assert stats["moves_per_second"] > 0
+    assert stats["queue_latency"]["max"] >= 0
+
+
+def test_concurrent_sessions_all_get_moves():
+    async def test(port):
+        sessions = [(await request(port, "POST", "/sessions", {}))[1] for _ in range(3)]
+        replies = await asyncio.gather(
+            *(
+                request(port, "POST", f"/sessions/{session['id']}/go", {"depth": 1})
+                for session in sessions
+            )
+        )
+        return replies, (await request(port, "GET", "/stats"))[1]
+
+    replies, stats = run_with_server(test)
+    assert all(status == 200 and reply["move"] for status, reply in replies)
+    assert stats["moves"] == 3 and stats["queued"] == 0
+
+
+def test_one_search_per_session_and_bad_fields():
+    async def test(port):
+        _, session = await request(port, "POST", "/sessions", {})
+        path = f"/sessions/{session['id']}/go"
+        replies = await asyncio.gather(
+            request(port, "POST", path, {"movetime": 0.5, "depth": 2}),
+            request(port, "POST", path, {"movetime": 0.5, "depth": 2}),
+        )
+        bad = [
+            await request(port, "POST", "/sessions", {"fen": 5}),
+            await request(port, "POST", path, {"movetime": None}),
+            await request(port, "POST", path, {"depth": "deep"}),
+            await request(port, "POST", path[:-3] + "/move", {"move": 5}),
+        ]
+        return replies, bad, (await request(port, "GET", path[:-3]))[1]
+
+    replies, bad, session = run_with_server(test)
+    assert sorted(status for status, _ in replies) == [200, 409]
+    assert len(session["moves"]) == 1 and not session["searching"]
+    assert [status for status, _ in bad] == [400, 400, 400, 400]
+    assert all("error" in reply for _, reply in bad)
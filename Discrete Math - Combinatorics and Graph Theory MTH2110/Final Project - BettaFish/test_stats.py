@@ -0,0 +1,48 @@
+"""
+Tests for the search statistics in stats.py
+"""
+
+import json
+import chess
+import minimax
+import stats
+
+
+def test_search_fills_in_stats():
+    fen = "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"
+    searcher = minimax.Minimax(chess.Board(fen))
+    searcher.search(max_depth=4)
+    search_stats = searcher.stats.as_dict()
+    assert search_stats["nodes"] == searcher.nodes
+    assert (
+        search_stats["interior_nodes"]
+        + search_stats["leaf_nodes"]
+        + search_stats["quiescence_nodes"]
+        == searcher.nodes
+    )
+    assert min(search_stats["interior_nodes"], search_stats["leaf_nodes"]) > 0
+    assert search_stats["depth"] == 4
+    assert [iteration["depth"] for iteration in search_stats["iterations"]] == [
+        1,
+        2,
+        3,
+        4,
+    ]
+    assert search_stats["nps"] > 0
+    assert search_stats["ebf"] > 1
+    assert search_stats["beta_cutoffs"] > 0
+    assert 0 < search_stats["first_move_cutoff_rate"] <= 1
+    assert 0 < search_stats["tt_hits"] <= search_stats["tt_probes"]
+
+
+def test_stats_log_writes_one_json_object_per_line(tmp_path):
+    log_path = tmp_path / "stats.jsonl"
+    searcher = minimax.Minimax(chess.Board())
+    for depth in (1, 2):
+        searcher.search(max_depth=depth)
+        stats.write_jsonl(log_path, searcher.stats.as_dict())
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [record["depth"] for record in records] == [1, 2]
+    assert records[1]["iterations"][1]["pv"][0] in [
+        move.uci() for move in chess.Board().legal_moves
+    ]
@@ -0,0 +1,87 @@
+"""
+Tests for the Syzygy tablebase probing in tablebase.py
+"""
+
+import chess
+import minimax
+import tablebase
+
+
+class QueenEndgames:
+    """
+    Stands in for a tablebase.Tablebase with three-piece tables, where
+    whoever has the queen wins.
+    """
+
+    max_pieces = 3
+
+    def covers(self, board):
+        return chess.popcount(board.occupied) <= self.max_pieces
+
+    def probe_wdl(self, board):
+        if not board.queens:
+            return 0
+        return 2 if board.queens & board.occupied_co[board.turn] else -2
+
+    def best_move(self, board):
+        moves = list(board.legal_moves)
+        return (self.probe_wdl(board), moves[0]) if moves else None
+
+
+def test_wdl_scores_prefer_nearer_wins():
+    assert tablebase.wdl_score(2, 3) > tablebase.wdl_score(2, 5) > 0
+    assert tablebase.wdl_score(-2, 3) < 0
+    assert tablebase.wdl_score(1, 3) == tablebase.wdl_score(-1, 3) == 0
+    assert tablebase.wdl_score(2, 0) < minimax.MATE_BOUND
+
+
+def test_empty_directory_covers_nothing(tmp_path):
+    assert tablebase.open_tablebase(None) is None
+    endgames = tablebase.open_tablebase(str(tmp_path))
+    assert endgames.max_pieces == 0
+    assert not endgames.covers(chess.Board("8/8/8/8/8/8/8/K1k5 w - - 0 1"))
+    endgames.close()
+
+
+def test_covered_root_is_looked_up_instead_of_searched():
+    board = chess.Board("7k/8/8/8/8/8/8/KQ6 w - - 0 1")
+    searcher = minimax.Minimax(board, tablebase=QueenEndgames())
+    score, move = searcher.search(max_depth=4)
+    assert score == tablebase.TB_WIN
+    assert move in board.legal_moves
+    assert searcher.nodes == 0
+
+
+def test_search_probes_after_captures():
+    # Taking the rook leaves a won three-piece ending
+    board = chess.Board("3r3k/8/8/8/8/8/8/K2Q4 w - - 0 1")
+    searcher = minimax.Minimax(board, tablebase=QueenEndgames())
+    score, move = searcher.search(max_depth=2)
+    assert move == chess.Move.from_uci("d1d8")
+    assert score == tablebase.TB_WIN - 1
+
+
+def test_array_search_probes_after_captures():
+    board = chess.Board("3r3k/8/8/8/8/8/8/K2Q4 w - - 0 1")
+    searcher = minimax.Minimax(board, tablebase=QueenEndgames(), array_board=True)
+    score, move = searcher.search(max_depth=2)
+    assert move == chess.Move.from_uci("d1d8")
+    assert score == tablebase.TB_WIN - 1
+
+
+def test_root_move_respects_the_fifty_move_counter(tmp_path):
+    endgames = tablebase.Tablebase(str(tmp_path))
+    queens = QueenEndgames()
+    endgames.probe_wdl = queens.probe_wdl
+    # Black, to move after any of white's moves, is mated in 30 plies
+    endgames.probe_dtz = lambda board: -30
+    try:
+        fresh = endgames.best_move(chess.Board("7k/8/8/8/8/8/8/KQ6 w - - 0 1"))
+        late = endgames.best_move(chess.Board("7k/8/8/8/8/8/8/KQ6 w - - 80 90"))
+    finally:
+        endgames.close()
+    assert fresh[0] == 2
+    # The counter runs out before the win converts, so it's only a draw
+    assert late[0] == 1 and tablebase.wdl_score(late[0], 0) == 0
+    assert tablebase.fifty_move_wdl(-2, 20, 81) == -1
+    assert tablebase.fifty_move_wdl(-2, 19, 81) == -2
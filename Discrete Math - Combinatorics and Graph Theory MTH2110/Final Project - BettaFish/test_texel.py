@@ -0,0 +1,84 @@
+"""
+Tests for the Texel tuning in texel.py
+"""
+
+import random
+import chess
+import numpy as np
+import eval
+import texel
+
+
+def random_positions(count, seed=0):
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = chess.Board()
+        for _ in range(rng.randrange(10, 80)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        boards.append(board)
+    return boards
+
+
+def test_encoded_positions_score_like_eval():
+    weights = texel.weights_from_eval()
+    for board in random_positions(30):
+        columns, signs = texel.encode_placement(board.board_fen())
+        score = texel.scores(weights, np.array([columns]), np.array([signs]))[0]
+        assert score == eval.calc_piece_activity(board)
+
+
+def test_parse_line_reads_common_result_formats():
+    fen = chess.STARTING_FEN
+    epd = chess.Board().epd()
+    placement = fen.split()[0]
+    assert texel.parse_line(f'{epd} c9 "1-0";') == (placement, 1.0)
+    assert texel.parse_line(f"{fen} [0.5]") == (placement, 0.5)
+    assert texel.parse_line(f"{fen} 0-1") == (placement, 0.0)
+    assert texel.parse_line(f"{epd} 1/2-1/2") == (placement, 0.5)
+    assert texel.parse_line(f"{fen} 1") == (placement, 1.0)
+    assert texel.parse_line("not a position") is None
+    # The move counters of an unlabelled FEN aren't a result
+    assert texel.parse_line(fen) is None
+    assert texel.parse_line(f"{epd} 1") is None
+    assert texel.parse_line(f"{fen} 2") is None
+
+
+def test_tuning_lowers_the_loss(tmp_path):
+    # Label positions by material so there's something to learn
+    lines = []
+    for board in random_positions(200, seed=1):
+        material = eval.calc_piece_activity(board)
+        lines.append(f"{board.fen()} [{1.0 if material > 0 else 0.0}]")
+    path = tmp_path / "positions.txt"
+    path.write_text("\n".join(lines))
+    columns, signs, results = texel.load_positions(path)
+    assert len(results) == 200
+    _, _, losses = texel.tune(columns, signs, results, epochs=5, batch_size=64)
+    assert losses[-1] < losses[0]
+
+
+def test_written_tables_load_into_eval(tmp_path):
+    original = eval.tables_dict()
+    path = tmp_path / "tables.json"
+    weights = texel.weights_from_eval()
+    weights[texel.PIECE_COLUMNS["n"] * 64 + chess.D5] += 7
+    texel.write_tables(weights, path)
+    knight_on_d5 = eval.flat_pst[chess.BLACK][chess.KNIGHT * 64 + chess.D5]
+    try:
+        eval.load_tables(path)
+        assert eval.flat_pst[chess.BLACK][chess.KNIGHT * 64 + chess.D5] == (
+            knight_on_d5 + 7
+        )
+        # White's tables are black's flipped, so white's knight on d4 moves too
+        assert eval.flat_pst[chess.WHITE][chess.KNIGHT * 64 + chess.D4] == (
+            knight_on_d5 + 7
+        )
+        board = chess.Board("4k3/8/8/3n4/8/8/8/4K3 w - - 0 1")
+        assert eval.calc_piece_activity(board) == eval.Evaluator(board).score()
+    finally:
+        eval.apply_tables(original)
+    assert eval.flat_pst[chess.BLACK][chess.KNIGHT * 64 + chess.D5] == knight_on_d5
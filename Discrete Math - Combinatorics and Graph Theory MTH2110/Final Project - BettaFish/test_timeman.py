@@ -0,0 +1,75 @@
+"""
+Tests for the time manager in timeman.py
+"""
+
+import time
+import chess
+import controller
+import timeman
+
+
+def test_phase_is_updated_move_by_move():
+    board = chess.Board("r3k3/1P6/8/8/8/8/6q1/R3K2Q w Q - 0 1")
+    manager = timeman.TimeManager(board)
+    assert manager.phase == timeman.game_phase(board) == 12
+    # A capture, a promotion that captures, and castling
+    for uci in ("h1g2", "a8b8", "b7b8q", "e8d7", "e1c1"):
+        manager.push(board, chess.Move.from_uci(uci))
+        assert manager.phase == timeman.game_phase(board)
+    assert manager.phase == 10
+
+
+def test_clock_time_is_shared_out_by_phase():
+    opening = chess.Board()
+    endgame = chess.Board("4k3/8/8/8/8/8/4P3/R3K3 w - - 0 1")
+    soft, hard = timeman.TimeManager(opening, clock=60).allot(opening)
+    assert 0 < soft <= hard <= 60 * timeman.MAX_CLOCK_FRACTION
+    endgame_soft, _ = timeman.TimeManager(endgame, clock=60).allot(endgame)
+    assert endgame_soft > soft
+
+    manager = timeman.TimeManager(opening, clock=2.0, increment=1.0)
+    assert manager.allot(opening, moves_to_go=1)[1] <= 2.0
+    manager.spend(1.5)
+    assert manager.clock == 1.5
+
+    only_move = chess.Board("7k/8/8/8/8/8/6q1/7K w - - 0 1")
+    assert timeman.TimeManager(only_move, clock=60).allot(only_move)[0] == 0.0
+
+
+def test_search_timer_extends_and_stops_early():
+    e4, d4 = chess.Move.from_uci("e2e4"), chess.Move.from_uci("d2d4")
+    timer = timeman.SearchTimer(soft=1.0, hard=3.0)
+    assert not timer.on_iteration({"move": e4, "time": 0.2})
+    # A new best move raises the soft limit, so the search goes on past it
+    assert not timer.on_iteration({"move": d4, "time": 1.2})
+    assert timer.soft == 1.0 * timeman.INSTABILITY_FACTOR
+    assert timer.on_iteration({"move": d4, "time": 1.6})
+
+    timer = timeman.SearchTimer(soft=1.0, hard=3.0)
+    stopped = [
+        timer.on_iteration({"move": e4, "time": 0.1 * depth}) for depth in range(1, 6)
+    ]
+    # The same move for every iteration dominates, stopping before the limit
+    assert stopped == [False] * 4 + [True]
+
+
+def test_controller_keeps_to_its_clock():
+    board = chess.Board()
+    control = controller.ControlGame(board, book_path=None, clock=1.0, increment=0.1)
+    start = time.perf_counter()
+    for _ in range(3):
+        control.bot_move()
+        board.push(next(iter(board.legal_moves)))
+    elapsed = time.perf_counter() - start
+    assert control.time_manager.clock > 0
+    assert elapsed < 1.0 + 3 * 0.1
+    control.close()
+
+
+def test_controller_has_no_move_to_play_when_mated():
+    board = chess.Board("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    board.push_san("Ra8#")
+    control = controller.ControlGame(board, book_path=None, movetime=0.1)
+    control.bot_move()
+    assert board.is_checkmate() and len(board.move_stack) == 1
+    control.close()
@@ -0,0 +1,125 @@
+"""
+Tests for the transposition table in transposition.py
+"""
+
+import chess
+import minimax
+import numpy as np
+from transposition import TranspositionTable, position_key, EXACT, LOWER, UPPER
+
+
+def test_store_and_probe():
+    table = TranspositionTable(size_mb=1)
+    move = chess.Move.from_uci("e2e4")
+    table.store(12345, 3, 50, EXACT, move)
+    assert table.probe(12345) == (3, 50, EXACT, move)
+    assert table.probe(54321) is None
+    assert table.hits == 1
+    assert table.misses == 1
+
+
+def test_depth_preferred_slot_keeps_deeper_entry():
+    table = TranspositionTable(size_mb=1)
+    key = 7
+    other_key = key + table.num_buckets  # lands in the same bucket
+    table.store(key, 5, 10, EXACT, None)
+    table.store(other_key, 2, 20, LOWER, None)
+    # The shallow entry goes to the always-replace slot
+    assert table.probe(key) == (5, 10, EXACT, None)
+    assert table.probe(other_key) == (2, 20, LOWER, None)
+    assert table.overwrites == 0
+
+    table.store(other_key + table.num_buckets, 1, 30, EXACT, None)
+    assert table.overwrites == 1
+    assert table.probe(other_key) is None
+    assert table.probe(key) == (5, 10, EXACT, None)
+
+
+def test_transpositions_share_a_key():
+    board_1 = chess.Board()
+    for san in ("Nf3", "Nf6", "Nc3"):
+        board_1.push_san(san)
+    board_2 = chess.Board()
+    for san in ("Nc3", "Nf6", "Nf3"):
+        board_2.push_san(san)
+    assert position_key(board_1) == position_key(board_2)
+
+
+def test_table_does_not_change_search_result():
+    board = chess.Board()
+    board.push_san("e4")
+
+    with_table = minimax.Minimax(board.copy())
+    result = with_table.generate_next_move(4)
+    without_table = minimax.Minimax(board.copy())
+    without_table.probe_table = lambda *args: (None, None)
+    expected = without_table.generate_next_move(4)
+    assert result[0] == expected[0]
+    assert with_table.nodes <= without_table.nodes
+
+
+def test_table_size_is_bounded():
+    table = TranspositionTable(size_mb=1)
+    assert table.entries.nbytes <= 1024 * 1024
+    assert table.num_buckets & (table.num_buckets - 1) == 0
+    for key in range(4 * table.num_buckets):
+        # Deeper first, so later keys also fill the always-replace slots
+        table.store(key, 4 - key // table.num_buckets, 0, EXACT, None)
+    assert len(table) == 2 * table.num_buckets
+    assert table.entries.nbytes <= 1024 * 1024
+
+
+def test_stale_entries_are_replaced():
+    table = TranspositionTable(size_mb=1)
+    key = 11
+    table.store(key, 6, 10, EXACT, None)
+    table.new_search()
+    table.store(key + table.num_buckets, 2, 20, LOWER, None)
+    # The shallower entry replaces the deep one from the last search
+    assert table.probe(key) is None
+    assert table.probe(key + table.num_buckets) == (2, 20, LOWER, None)
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "table.npy")
+    table = TranspositionTable(size_mb=1)
+    promotion = chess.Move.from_uci("a7a8n")
+    table.store(2**64 - 1, 9, -99500, UPPER, promotion)
+    table.store(42, 3, 7, EXACT, chess.Move.from_uci("g1f3"))
+    table.save(path)
+
+    loaded = TranspositionTable.load(path)
+    assert loaded.num_buckets == table.num_buckets
+    assert loaded.probe(2**64 - 1) == (9, -99500, UPPER, promotion)
+    assert loaded.probe(42) == (3, 7, EXACT, chess.Move.from_uci("g1f3"))
+    assert len(loaded) == 2
+    # Without write_back the file doesn't change
+    loaded.store(43, 1, 0, EXACT, None)
+    assert len(TranspositionTable.load(path)) == 2
+
+    loaded.save(path)
+    assert len(TranspositionTable.load(path)) == 3
+    assert np.array_equal(TranspositionTable.load(path).entries, loaded.entries)
+
+
+def test_loaded_table_starts_search_warm(tmp_path):
+    path = str(tmp_path / "table.npy")
+    board = chess.Board()
+    board.push_san("e4")
+    cold = minimax.Minimax(board.copy(), TranspositionTable(size_mb=4))
+    cold.search(max_depth=4)
+    cold.table.save(path)
+
+    warm = minimax.Minimax(board.copy(), TranspositionTable.load(path))
+    warm.search(max_depth=4)
+    assert warm.nodes < cold.nodes
+
+
+def test_torn_entries_are_misses():
+    table = TranspositionTable(size_mb=1)
+    key = 21
+    table.store(key, 4, 75, LOWER, chess.Move.from_uci("g1f3"))
+    # Another process's write to the same slot got as far as the score
+    table.entries[key & table.mask, 0]["score"] = -30
+    assert table.probe(key) is None
+    assert table.misses == 1
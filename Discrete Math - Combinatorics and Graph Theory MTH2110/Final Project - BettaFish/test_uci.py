@@ -0,0 +1,113 @@
+"""
+Tests for the UCI entry point in uci.py
+"""
+
+import io
+import subprocess
+import sys
+import time
+import chess
+import uci
+
+
+def run_commands(commands):
+    output = io.StringIO()
+    engine = uci.UciEngine(output)
+    for command in commands:
+        engine.handle(command)
+    engine.wait()
+    return output.getvalue().splitlines()
+
+
+def test_go_depth_sends_info_and_bestmove():
+    lines = run_commands(
+        ["uci", "isready", "position startpos moves e2e4", "go depth 3"]
+    )
+    assert "uciok" in lines and "readyok" in lines
+    infos = [line for line in lines if line.startswith("info depth")]
+    assert [line.split()[2] for line in infos] == ["1", "2", "3"]
+    assert all(" nps " in line and " pv " in line for line in infos)
+    best = lines[-1].split()
+    assert best[0] == "bestmove"
+    board = chess.Board()
+    board.push_uci("e2e4")
+    assert chess.Move.from_uci(best[1]) in board.legal_moves
+
+
+def test_mate_scores_are_reported_in_moves():
+    lines = run_commands(
+        ["position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", "go depth 3"]
+    )
+    assert "score mate 1" in lines[-2]
+    assert lines[-1] == "bestmove a1a8"
+
+
+def test_stop_ends_an_infinite_search():
+    lines = run_commands(["setoption name Hash value 4", "go infinite", "stop"])
+    assert lines[-1].startswith("bestmove ")
+    assert lines[-1] != "bestmove 0000"
+
+
+def test_infinite_search_waits_for_stop():
+    output = io.StringIO()
+    engine = uci.UciEngine(output)
+    # The mate is found at once, but the GUI hasn't said to stop
+    engine.handle("position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    engine.handle("go infinite")
+    time.sleep(0.5)
+    assert "bestmove" not in output.getvalue()
+    assert "score mate 1" in output.getvalue()
+    engine.handle("stop")
+    assert output.getvalue().splitlines()[-1] == "bestmove a1a8"
+    engine.handle("quit")
+
+
+def test_time_controls_and_node_limits():
+    # The clock is split by timeman, which keeps well inside a second left
+    started = time.perf_counter()
+    lines = run_commands(["go wtime 1000 btime 1000"])
+    assert time.perf_counter() - started < 1
+    assert lines[-1].startswith("bestmove ") and lines[-1] != "bestmove 0000"
+    limits = uci.parse_go("wtime 60000 btime 30000 winc 1000 nodes 500".split())
+    assert limits == {"wtime": 60, "btime": 30, "winc": 1, "nodes": 500}
+    lines = run_commands(["go nodes 1"])
+    assert lines[-1].startswith("bestmove ")
+
+
+def test_uci_runs_without_pygame():
+    # The engine should start headless, without importing the game window
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, uci; uci.main(); print('pygame' in sys.modules)",
+        ],
+        input="uci\nquit\n",
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert "uciok" in result.stdout
+    assert result.stdout.splitlines()[-1] == "False"
+
+
+def test_threads_obey_stop_and_node_limits():
+    output = io.StringIO()
+    engine = uci.UciEngine(output)
+    try:
+        engine.handle("setoption name Threads value 2")
+        engine.handle("go nodes 2000")
+        engine.wait()
+        lines = output.getvalue().splitlines()
+        assert lines[-1].startswith("bestmove ") and lines[-1] != "bestmove 0000"
+        infos = [line.split() for line in lines if line.startswith("info depth")]
+        assert infos and int(infos[-1][infos[-1].index("nodes") + 1]) < 5000
+
+        engine.handle("go infinite")
+        time.sleep(0.5)
+        engine.handle("stop")
+        lines = output.getvalue().splitlines()
+        assert lines[-1].startswith("bestmove ") and lines[-1] != "bestmove 0000"
+        assert len([line for line in lines if line.startswith("bestmove")]) == 2
+    finally:
+        engine.handle("quit")
@@ -0,0 +1,92 @@
+"""
+Tests for the dirty-rect drawing in view.py, run without a window
+"""
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import chess
+import pygame
+import eval
+import view
+
+
+def make_view(board):
+    pygame.init()
+    return view.DrawGame(board)
+
+
+def test_unchanged_frames_draw_nothing(monkeypatch):
+    chess_view = make_view(chess.Board())
+    calls = []
+    original = eval.calc_piece_activity
+    monkeypatch.setattr(
+        eval, "calc_piece_activity", lambda board: calls.append(1) or original(board)
+    )
+    assert chess_view.draw() == [chess_view.screen.get_rect()]
+    for _ in range(5):
+        assert chess_view.draw() == []
+    assert len(calls) == 1
+
+
+def test_move_redraws_only_what_changed():
+    board = chess.Board()
+    chess_view = make_view(board)
+    chess_view.draw()
+    board.push_san("Nf3")
+    dirty = chess_view.draw()
+    assert chess_view.eval_bar_area in dirty
+    board_rects = [rect for rect in dirty if rect != chess_view.eval_bar_area]
+    assert len(board_rects) == 2
+    assert board_rects[0].colliderect(chess_view.square_rect(chess.G1))
+    assert board_rects[1].colliderect(chess_view.square_rect(chess.F3))
+
+    # The patched-up screen is the same as drawing everything again
+    patched = pygame.image.tobytes(chess_view.screen, "RGB")
+    chess_view.drawn = None
+    chess_view.draw()
+    assert patched == pygame.image.tobytes(chess_view.screen, "RGB")
+
+
+def test_evaluation_is_cached_by_position():
+    board = chess.Board()
+    chess_view = make_view(board)
+    start = chess_view.evaluation()
+    for san in ("Nf3", "Nf6", "Ng1", "Ng8"):
+        board.push_san(san)
+        chess_view.evaluation()
+    # Back at the start position, whose evaluation was already cached
+    assert chess_view.evaluation() == start
+    assert len(chess_view.eval_cache) == 4
+
+
+def test_each_element_is_drawn_once_per_frame(monkeypatch):
+    board = chess.Board()
+    chess_view = make_view(board)
+    fonts = []
+    monkeypatch.setattr(pygame.font, "SysFont", lambda *args: fonts.append(args))
+    chess_view.control.thinking = True
+    chess_view.control.info = {"depth": 1, "nodes": 20}
+    chess_view.draw()
+    calls = []
+
+    def counted(name):
+        original = getattr(chess_view, name)
+        return lambda: calls.append(name) or original()
+
+    for name in ("draw_captured_pieces", "draw_evaluation_bar", "draw_thinking"):
+        monkeypatch.setattr(chess_view, name, counted(name))
+
+    board.push_san("e4")
+    chess_view.control.info = {"depth": 2, "nodes": 400}
+    dirty = chess_view.draw()
+    assert len(dirty) == 4
+    assert sorted(calls) == ["draw_evaluation_bar", "draw_thinking"]
+    assert fonts == []
+
+    patched = pygame.image.tobytes(chess_view.screen, "RGB")
+    chess_view.drawn = None
+    chess_view.draw()
+    assert patched == pygame.image.tobytes(chess_view.screen, "RGB")
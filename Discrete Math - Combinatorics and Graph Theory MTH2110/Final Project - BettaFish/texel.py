@@ -0,0 +1,353 @@
+"""
+Tunes the piece values and piece-square tables in eval.py with Texel's
+method: fit the evaluation to the results of games that positions came
+from, by gradient descent on the error of a sigmoid of the score.
+"""
+
+import argparse
+import json
+import math
+import re
+import time
+import numpy as np
+import eval
+
+# Most pieces a legal position can have, so every position fits in one row
+MAX_PIECES = 32
+
+# Column of each piece's table in the weights; weights[column * 64 + k]
+# holds the piece value plus black's PST entry for square k
+PIECE_COLUMNS = {"p": 0, "n": 1, "b": 2, "r": 3, "q": 4, "k": 5}
+SYMBOLS = "PNBRQK"
+
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+# An EPD c9 operation, which holds the game's result
+C9_PATTERN = re.compile(r'\bc9\s+"?([^";\s]+)')
+# Fields of a FEN; a result given as a number must come after all of them
+FEN_FIELDS = 6
+
+# Encoded positions are collected in chunks this long before becoming arrays
+CHUNK = 1 << 16
+
+
+def encode_placement(placement):
+    """
+    Turn the piece placement field of a FEN into sparse features. Each piece
+    is one feature: its piece x square column, with +1 for white and -1 for
+    black. White pieces use the square mirrored onto black's side, since
+    eval.py's white tables are black's flipped over.
+
+    Args:
+        placement: the first field of a FEN, such as "rnbqkbnr/pppppppp/...".
+    Returns:
+        A (columns, signs) tuple of lists.
+    """
+    columns = []
+    signs = []
+    for row, rank_text in enumerate(placement.split("/")):
+        rank = 7 - row
+        file = 0
+        for char in rank_text:
+            if char.isdigit():
+                file += int(char)
+                continue
+            square = rank * 8 + file
+            if char.isupper():
+                columns.append(PIECE_COLUMNS[char.lower()] * 64 + (square ^ 56))
+                signs.append(1)
+            else:
+                columns.append(PIECE_COLUMNS[char] * 64 + square)
+                signs.append(-1)
+            file += 1
+    return (columns, signs)
+
+
+def parse_result(text):
+    """
+    Returns:
+        A result from a PGN result such as "1-0" or a number from 0 to 1,
+        either of which may be in brackets or quotes, or None if text is
+        neither.
+    """
+    text = text.strip('[]";')
+    if text in RESULTS:
+        return RESULTS[text]
+    try:
+        result = float(text)
+    except ValueError:
+        return None
+    return result if 0.0 <= result <= 1.0 else None
+
+
+def parse_line(line):
+    """
+    Read one labelled position. The result can be an EPD c9 operation, a PGN
+    result such as "1-0" after the FEN or EPD, or a number from 0 to 1 in its
+    own field after a full six-field FEN, so that the move counters aren't
+    mistaken for a result.
+
+    Returns:
+        A (placement, result) tuple with the result from white's point of
+        view, or None if the line has no position and result.
+    """
+    fields = line.split()
+    if len(fields) < 5:
+        return None
+    c9 = C9_PATTERN.search(line)
+    if c9:
+        result = parse_result(c9.group(1))
+    elif fields[4].strip("[]") in RESULTS:
+        result = RESULTS[fields[4].strip("[]")]
+    elif len(fields) > FEN_FIELDS and all(
+        field.isdigit() for field in fields[4:FEN_FIELDS]
+    ):
+        result = parse_result(fields[FEN_FIELDS])
+    else:
+        result = None
+    if result is None:
+        return None
+    return (fields[0], result)
+
+
+def load_positions(path, limit=None):
+    """
+    Read and encode a file of labelled positions, one per line.
+
+    Args:
+        path: the path of the file.
+        limit: an optional int representing the most positions to read.
+    Returns:
+        A (columns, signs, results) tuple of numpy arrays: columns and signs
+        are (positions, MAX_PIECES), padded with sign 0, and results holds
+        each position's result.
+    """
+    column_chunks, sign_chunks, result_chunks = [], [], []
+    columns = np.zeros((CHUNK, MAX_PIECES), dtype=np.int16)
+    signs = np.zeros((CHUNK, MAX_PIECES), dtype=np.int8)
+    results = np.zeros(CHUNK, dtype=np.float32)
+    count = 0
+    total = 0
+    with open(path, encoding="utf-8") as positions_file:
+        for line in positions_file:
+            parsed = parse_line(line)
+            if parsed is None:
+                continue
+            row_columns, row_signs = encode_placement(parsed[0])
+            pieces = len(row_columns)
+            columns[count, :pieces] = row_columns
+            signs[count, :pieces] = row_signs
+            results[count] = parsed[1]
+            count += 1
+            total += 1
+            if count == CHUNK:
+                column_chunks.append(columns)
+                sign_chunks.append(signs)
+                result_chunks.append(results)
+                columns = np.zeros((CHUNK, MAX_PIECES), dtype=np.int16)
+                signs = np.zeros((CHUNK, MAX_PIECES), dtype=np.int8)
+                results = np.zeros(CHUNK, dtype=np.float32)
+                count = 0
+            if limit is not None and total >= limit:
+                break
+    column_chunks.append(columns[:count])
+    sign_chunks.append(signs[:count])
+    result_chunks.append(results[:count])
+    return (
+        np.concatenate(column_chunks),
+        np.concatenate(sign_chunks),
+        np.concatenate(result_chunks),
+    )
+
+
+def weights_from_eval():
+    """
+    Returns:
+        A float array of 6 * 64 weights holding eval.py's current piece
+        values plus black's PSTs, in the layout encode_placement() uses.
+    """
+    weights = np.zeros(6 * 64)
+    for column, symbol in enumerate(SYMBOLS):
+        table = np.asarray(eval.pst[symbol][0]).reshape(-1)
+        weights[column * 64 : column * 64 + 64] = eval.piece_vals[symbol] + table
+    return weights
+
+
+def scores(weights, columns, signs):
+    """
+    Returns:
+        The evaluation of every encoded position, from white's point of view.
+    """
+    return (weights[columns] * signs).sum(axis=1)
+
+
+def sigmoid(score, k):
+    """
+    Returns:
+        The expected result (0-1) for a score, with k scaling how fast
+        centipawns turn into winning chances.
+    """
+    return 1 / (1 + np.power(10.0, -k * score / 400))
+
+
+def loss(weights, columns, signs, results, k):
+    """
+    Returns:
+        The mean squared error between the results and the predictions.
+    """
+    return float(np.mean((results - sigmoid(scores(weights, columns, signs), k)) ** 2))
+
+
+def fit_k(weights, columns, signs, results, low=0.05, high=5.0, steps=40):
+    """
+    Find the scaling constant k that best fits the current weights, by
+    golden section search, so tuning changes the weights rather than k.
+
+    Returns:
+        A float k.
+    """
+    ratio = (math.sqrt(5) - 1) / 2
+    for _ in range(steps):
+        left = high - ratio * (high - low)
+        right = low + ratio * (high - low)
+        if loss(weights, columns, signs, results, left) < loss(
+            weights, columns, signs, results, right
+        ):
+            high = right
+        else:
+            low = left
+    return (low + high) / 2
+
+
+def tune(
+    columns,
+    signs,
+    results,
+    weights=None,
+    k=None,
+    epochs=10,
+    batch_size=1 << 16,
+    learning_rate=2.0,
+    seed=0,
+):
+    """
+    Fit the weights with mini-batch Adam gradient descent. Each batch is one
+    gather of the weights, one sum per position, and one np.bincount to add
+    the gradient back onto the weights, so no Python loop runs per position.
+
+    Args:
+        columns, signs, results: arrays from load_positions().
+        weights: the starting weights; defaults to weights_from_eval().
+        k: the sigmoid scale; defaults to fit_k() of the starting weights.
+        epochs: an int representing the passes over the positions.
+        batch_size: an int representing the positions per gradient step.
+        learning_rate: a float representing the Adam step size in
+            centipawns.
+        seed: an int seeding the shuffle of each epoch.
+    Returns:
+        A (weights, k, losses) tuple, where losses holds the loss before
+        tuning and after each epoch.
+    """
+    weights = weights_from_eval() if weights is None else weights.astype(float)
+    if k is None:
+        k = fit_k(weights, columns, signs, results)
+    rng = np.random.default_rng(seed)
+    first_moment = np.zeros_like(weights)
+    second_moment = np.zeros_like(weights)
+    beta1, beta2 = 0.9, 0.999
+    step = 0
+    slope = k * math.log(10) / 400
+    losses = [loss(weights, columns, signs, results, k)]
+
+    for _ in range(epochs):
+        order = rng.permutation(len(results))
+        for start in range(0, len(order), batch_size):
+            batch = order[start : start + batch_size]
+            batch_columns = columns[batch]
+            batch_signs = signs[batch]
+            predicted = sigmoid(scores(weights, batch_columns, batch_signs), k)
+            # d(loss)/d(score) of each position
+            error = (
+                2
+                * (predicted - results[batch])
+                * predicted
+                * (1 - predicted)
+                * slope
+                / len(batch)
+            )
+            gradient = np.bincount(
+                batch_columns.ravel(),
+                weights=(batch_signs * error[:, None]).ravel(),
+                minlength=len(weights),
+            )
+            step += 1
+            first_moment = beta1 * first_moment + (1 - beta1) * gradient
+            second_moment = beta2 * second_moment + (1 - beta2) * gradient**2
+            corrected_first = first_moment / (1 - beta1**step)
+            corrected_second = second_moment / (1 - beta2**step)
+            weights -= (
+                learning_rate * corrected_first / (np.sqrt(corrected_second) + 1e-8)
+            )
+        losses.append(loss(weights, columns, signs, results, k))
+    return (weights, k, losses)
+
+
+def tables_from_weights(weights):
+    """
+    Split tuned weights back into piece values and PSTs. Each piece keeps
+    its current value (the king's never matters, since both sides have
+    one), and its table takes the rest, rounded to whole centipawns.
+
+    Returns:
+        A dict in the format of eval.tables_dict().
+    """
+    tables = {"piece_vals": dict(eval.piece_vals), "pst": {}}
+    for column, symbol in enumerate(SYMBOLS):
+        table = np.rint(weights[column * 64 : column * 64 + 64]).astype(int)
+        table -= eval.piece_vals[symbol]
+        tables["pst"][symbol] = table.reshape(8, 8).tolist()
+    return tables
+
+
+def write_tables(weights, path=eval.TUNED_TABLES_PATH):
+    """
+    Write tuned weights as a JSON file that eval.load_tables() reads.
+    """
+    with open(path, "w", encoding="utf-8") as tables_file:
+        json.dump(tables_from_weights(weights), tables_file, indent=1)
+
+
+def main():
+    """
+    Tune the tables from the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("positions", help="file of FENs or EPDs with results")
+    parser.add_argument("--out", default=eval.TUNED_TABLES_PATH)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1 << 16)
+    parser.add_argument("--learning-rate", type=float, default=2.0)
+    options = parser.parse_args()
+
+    start = time.perf_counter()
+    columns, signs, results = load_positions(options.positions, options.limit)
+    print(f"encoded {len(results)} positions in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    weights, k, losses = tune(
+        columns,
+        signs,
+        results,
+        epochs=options.epochs,
+        batch_size=options.batch_size,
+        learning_rate=options.learning_rate,
+    )
+    print(
+        f"k {k:.3f}, loss {losses[0]:.5f} -> {losses[-1]:.5f} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    write_tables(weights, options.out)
+    print(f"wrote {options.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Decides how long the bot thinks about each move from its clock, the
+increment, and how far the game has gone, and stops the search early or
+late depending on how settled its best move is.
+"""
+
+import chess
+
+# How much each piece counts towards the game phase; the starting position
+# adds up to MAX_PHASE and bare kings and pawns to 0
+PHASE_WEIGHTS = {
+    chess.PAWN: 0,
+    chess.KNIGHT: 1,
+    chess.BISHOP: 1,
+    chess.ROOK: 2,
+    chess.QUEEN: 4,
+    chess.KING: 0,
+}
+MAX_PHASE = 24
+
+# With a fixed movetime, the endgame gets up to this much more on top, since
+# fewer pieces means iterative deepening reaches deeper in the same time
+ENDGAME_BONUS = 1.5
+
+# With a clock, the game is expected to last this many more moves in the
+# endgame, plus one more for every point of phase left
+MIN_MOVES_LEFT = 20
+
+# The hard limit is this many times the soft one, and never more than this
+# fraction of the clock
+HARD_RATIO = 3
+MAX_CLOCK_FRACTION = 0.3
+
+# Seconds kept back on the clock for the time it takes to play a move
+OVERHEAD = 0.05
+MIN_TIME = 0.01
+
+# Each time the best move changes, the soft limit grows by this factor
+INSTABILITY_FACTOR = 1.5
+# A best move that has survived this many iterations dominates, and the
+# search stops once this fraction of the soft limit is used
+STABLE_ITERATIONS = 4
+DOMINANT_FRACTION = 0.4
+
+
+def game_phase(board):
+    """
+    Returns:
+        An int representing how much material is left, from MAX_PHASE at the
+        start of the game down to 0 in a pawn endgame.
+    """
+    return sum(
+        len(board.pieces(piece_type, color)) * weight
+        for piece_type, weight in PHASE_WEIGHTS.items()
+        for color in chess.COLORS
+    )
+
+
+def phase_after(phase, board, move):
+    """
+    Update the phase for a move without recounting the pieces.
+
+    Args:
+        phase: the phase of the board before the move.
+        board: a chess.Board() the move hasn't been pushed to yet.
+        move: a legal chess.Move.
+    Returns:
+        The phase after the move.
+    """
+    if board.color_at(move.to_square) == (not board.turn):
+        phase -= PHASE_WEIGHTS[board.piece_type_at(move.to_square)]
+    if move.promotion:
+        phase += PHASE_WEIGHTS[move.promotion]
+    return phase
+
+
+class TimeManager:
+    """
+    Keeps the bot's clock and the game phase, which is updated move by move,
+    and turns them into a soft and a hard time limit for each search.
+
+    Without a clock, every move gets the fixed movetime, stretched as the
+    pieces come off.
+    """
+
+    def __init__(self, board, movetime=3.0, clock=None, increment=0.0):
+        """
+        Args:
+            board: the chess.Board() the game is played on.
+            movetime: a float representing the seconds to think per move
+                when there's no clock.
+            clock: an optional float representing the seconds on the bot's
+                clock.
+            increment: a float representing the seconds added to the clock
+                after each of the bot's moves.
+        """
+        self.movetime = movetime
+        self.clock = clock
+        self.increment = increment
+        self.phase = game_phase(board)
+        self.ply = len(board.move_stack)
+
+    def push(self, board, move):
+        """
+        Push a move onto the board, updating the phase.
+        """
+        if len(board.move_stack) == self.ply:
+            self.phase = phase_after(self.phase, board, move)
+            self.ply += 1
+        board.push(move)
+
+    def sync(self, board):
+        """
+        Recount the phase if moves were pushed without push().
+        """
+        if len(board.move_stack) != self.ply:
+            self.phase = game_phase(board)
+            self.ply = len(board.move_stack)
+
+    def allot(self, board, moves_to_go=None):
+        """
+        Decide how long to think about the next move.
+
+        Args:
+            board: the chess.Board() to move in.
+            moves_to_go: an optional int representing the moves until the
+                next time control.
+        Returns:
+            A (soft, hard) tuple of seconds: the search shouldn't start a new
+            iteration after the soft limit, and must stop at the hard one.
+        """
+        self.sync(board)
+        phase = min(self.phase, MAX_PHASE)
+        if self.clock is None:
+            soft = self.movetime * (1 + ENDGAME_BONUS * (1 - phase / MAX_PHASE))
+            hard = soft * HARD_RATIO
+        else:
+            usable = max(self.clock - OVERHEAD, MIN_TIME)
+            moves_left = moves_to_go or MIN_MOVES_LEFT + phase
+            soft = usable / moves_left + self.increment * 0.75
+            hard = max(MIN_TIME, min(soft * HARD_RATIO, usable * MAX_CLOCK_FRACTION))
+            soft = min(soft, hard)
+        if board.legal_moves.count() == 1:
+            soft = 0.0  # the only move is played after the first iteration
+        return (soft, hard)
+
+    def spend(self, seconds):
+        """
+        Take the time a move took off the clock, and add the increment.
+        """
+        if self.clock is not None:
+            self.clock = max(0.0, self.clock - seconds) + self.increment
+
+
+class SearchTimer:
+    """
+    Decides after every iteration of one search whether to start another.
+    Pass its on_iteration method to Minimax.on_iteration, and the hard limit
+    as the search's movetime.
+    """
+
+    def __init__(self, soft, hard):
+        self.soft = soft
+        self.hard = hard
+        self.best_move = None
+        # Iterations in a row the best move has stayed the same
+        self.stable = 0
+
+    def on_iteration(self, iteration):
+        """
+        Args:
+            iteration: a dict from Minimax.iterations.
+        Returns:
+            bool: True if the search should stop.
+        """
+        if iteration["move"] != self.best_move:
+            if self.best_move is not None:
+                # A new best move needs time to be checked
+                self.soft = min(self.hard, self.soft * INSTABILITY_FACTOR)
+            self.best_move = iteration["move"]
+            self.stable = 0
+        else:
+            self.stable += 1
+        elapsed = iteration["time"]
+        if (
+            self.stable >= STABLE_ITERATIONS
+            and elapsed >= self.soft * DOMINANT_FRACTION
+        ):
+            return True
+        return elapsed >= self.soft
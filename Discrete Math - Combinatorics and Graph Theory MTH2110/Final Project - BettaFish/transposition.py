@@ -0,0 +1,290 @@
+"""
+A transposition table that remembers positions the search has already scored
+so that transposed positions don't need to be searched again.
+
+The table is one fixed-size NumPy structured array, so its memory use is set
+by its size in MB however many positions are stored, and it can be saved to
+and loaded from a memory-mapped file to start an analysis warm.
+
+When processes share the table through a memory-mapped file, one of them can
+read an entry while another is halfway through writing it. Each entry's key
+is therefore stored XORed with the rest of the entry, so a read that mixes
+two writes doesn't match either key and is treated as a miss.
+"""
+
+import os
+import numpy as np
+import chess
+import chess.polyglot
+
+# Bound types stored alongside each score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# The layout of one stored entry
+ENTRY_DTYPE = np.dtype(
+    [
+        ("key", np.uint64),
+        ("move", np.uint16),
+        ("score", np.int32),
+        ("depth", np.int8),
+        ("bound", np.uint8),
+        ("age", np.uint8),
+    ]
+)
+ENTRY_BYTES = ENTRY_DTYPE.itemsize
+
+# The depth of a slot that has never been stored to
+EMPTY = -128
+
+# Searches are counted in the age field modulo this
+AGES = 256
+
+
+def entry_check(move, score, depth, bound):
+    """
+    Pack the fields of an entry that the key is XORed with into 64 bits.
+
+    Returns:
+        An int that changes if any of move, score, depth, or bound do.
+    """
+    return move | (score & 0xFFFFFFFF) << 16 | (depth & 0xFF) << 48 | bound << 56
+
+
+def position_key(board=chess.Board()):
+    """
+    Computes the Zobrist hash of a board position.
+
+    Args:
+        board: a chess.Board() object.
+    Returns:
+        A 64 bit int that identifies the position.
+    """
+    return chess.polyglot.zobrist_hash(board)
+
+
+def encode_move(move):
+    """
+    Pack a move into 16 bits: the from square, the to square shifted by 6,
+    and the promotion piece type shifted by 12.
+
+    Args:
+        move: a chess.Move, or None.
+    Returns:
+        An int, 0 for None.
+    """
+    if move is None:
+        return 0
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code):
+    """
+    Returns:
+        The chess.Move packed by encode_move(), or None for 0.
+    """
+    if not code:
+        return None
+    return chess.Move(code & 63, code >> 6 & 63, code >> 12 or None)
+
+
+class TranspositionTable:
+    """
+    Stores the depth, score, bound type, and best move of searched positions.
+
+    Every bucket has two slots: a depth-preferred slot that only gets replaced
+    by an equal or deeper search, or by any search once its entry is left
+    over from an earlier search, and an always-replace slot that holds the
+    most recent entry that didn't make it into the depth-preferred slot.
+    Buckets are indexed by the low bits of the key.
+    """
+
+    def __init__(self, size_mb=16, entries=None):
+        """
+        Args:
+            size_mb: the most memory the entries can use, in MB. The number
+                of buckets is rounded down to a power of two.
+            entries: an optional (buckets, 2) array of ENTRY_DTYPE to use
+                instead of a new one, such as a memory-mapped file.
+        """
+        if entries is None:
+            num_buckets = max(1, (size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+            num_buckets = 1 << (num_buckets.bit_length() - 1)
+            entries = np.zeros((num_buckets, 2), dtype=ENTRY_DTYPE)
+            entries["depth"] = EMPTY
+        self.entries = entries
+        self.num_buckets = len(entries)
+        self.size_mb = entries.nbytes / (1024 * 1024)
+        self.mask = self.num_buckets - 1
+        # Views of each field, which are faster to index than whole entries
+        self.depths = entries["depth"]
+        self.ages = entries["age"]
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Zero the hit, miss, store, and overwrite counters.
+        """
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def clear(self):
+        """
+        Remove every entry from the table.
+        """
+        self.entries.fill(0)
+        self.depths.fill(EMPTY)
+        self.age = 0
+        self.reset_stats()
+
+    def new_search(self):
+        """
+        Start a new search, so the entries of earlier searches can be
+        replaced by shallower ones.
+        """
+        self.age = (self.age + 1) % AGES
+
+    def probe(self, key):
+        """
+        Look up a position in the table.
+
+        Args:
+            key: the Zobrist hash of the position.
+        Returns:
+            A (depth, score, bound, move) tuple, or None if the position
+            isn't stored.
+        """
+        entry = self.probe_code(key)
+        if entry is None:
+            return None
+        depth, score, bound, move = entry
+        return (depth, score, bound, decode_move(move))
+
+    def probe_code(self, key):
+        """
+        Like probe(), but the move is left packed as by encode_move(), for
+        searches that keep moves as ints.
+        """
+        index = key & self.mask
+        for stored, move, score, depth, bound, _ in self.entries[index].tolist():
+            if (
+                depth != EMPTY
+                and stored ^ entry_check(move, score, depth, bound) == key
+            ):
+                self.hits += 1
+                return (depth, score, bound, move)
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """
+        Save the result of a search into the table.
+
+        Args:
+            key: the Zobrist hash of the position.
+            depth: an int representing the remaining depth that was searched.
+            score: the score the search returned.
+            bound: EXACT, LOWER, or UPPER.
+            move: the best chess.Move found, or None.
+        """
+        self.store_code(key, depth, score, bound, encode_move(move))
+
+    def store_code(self, key, depth, score, bound, move):
+        """
+        Like store(), but with the move already packed by encode_move().
+        """
+        index = key & self.mask
+        stored = key ^ entry_check(move, score, depth, bound)
+        entry = (stored, move, score, depth, bound, self.age)
+        self.stores += 1
+
+        deep, recent = self.entries[index].tolist()
+        deep_key = deep[0] ^ entry_check(*deep[1:5])
+        recent_key = recent[0] ^ entry_check(*recent[1:5])
+        deep_depth = deep[3]
+        recent_depth = recent[3]
+        if (
+            deep_depth == EMPTY
+            or deep_key == key
+            or depth >= deep_depth
+            or deep[5] != self.age
+        ):
+            if deep_depth != EMPTY and deep_key != key:
+                self.overwrites += 1
+            self.entries[index, 0] = entry
+            return
+
+        if recent_depth != EMPTY and recent_key != key:
+            self.overwrites += 1
+        self.entries[index, 1] = entry
+
+    def __len__(self):
+        return int(np.count_nonzero(self.depths != EMPTY))
+
+    def stats(self):
+        """
+        Returns:
+            A dict of the table's hit, miss, store, and overwrite counts.
+        """
+        probes = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / probes if probes else 0.0,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "entries": len(self),
+        }
+
+    def save(self, path):
+        """
+        Write every entry to a .npy file that load() can map back in.
+
+        Args:
+            path: the path of the file; it's replaced if it exists.
+        """
+        mapped = isinstance(self.entries, np.memmap) and self.entries.mode == "r+"
+        if mapped and self.entries.filename == os.path.abspath(path):
+            self.entries.flush()
+            return
+        # Written beside the file first, since it may be the one this table
+        # was loaded from
+        partial = path + ".partial"
+        saved = np.lib.format.open_memmap(
+            partial, mode="w+", dtype=ENTRY_DTYPE, shape=self.entries.shape
+        )
+        saved[:] = self.entries
+        saved.flush()
+        del saved
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path, write_back=False):
+        """
+        Map a table saved by save() into memory. Pages of the file are only
+        read as the search touches them, so a large table loads at once.
+
+        Args:
+            path: the path of the file.
+            write_back: a bool; if True, stores change the file itself, and
+                save() to the same path just flushes them. Otherwise the file
+                is left as it was.
+        Returns:
+            A TranspositionTable of the file's size, with its age set past
+            every saved entry's, so the new searches' entries take priority
+            over them.
+        """
+        entries = np.load(path, mmap_mode="r+" if write_back else "c")
+        if entries.dtype != ENTRY_DTYPE or entries.ndim != 2 or entries.shape[1] != 2:
+            raise ValueError(f"{path} isn't a saved transposition table")
+        if len(entries) & (len(entries) - 1):
+            raise ValueError(f"{path} doesn't have a power of two buckets")
+        table = cls(entries=entries)
+        stored = table.depths != EMPTY
+        if stored.any():
+            table.age = (int(table.ages[stored].max()) + 1) % AGES
+        return table
@@ -0,0 +1,336 @@
+"""
+Runs BettaFish as a UCI engine over stdin and stdout, so chess GUIs, match
+runners and benchmarks can use it without the pygame window.
+"""
+
+import os
+import sys
+import threading
+import time
+import chess
+import minimax
+import parallel
+import tablebase
+import timeman
+from transposition import TranspositionTable
+
+NAME = "BettaFish"
+AUTHORS = "Eddy Pan, Sam Wisnoski, Bill Le, Daniel Theunissen"
+
+DEFAULT_HASH_MB = 64
+MAX_HASH_MB = 1024
+MAX_THREADS = 64
+
+
+def format_score(score):
+    """
+    Returns:
+        The UCI form of a score: "cp N", or "mate N" counting in moves, with a
+        negative N when the side to move is getting mated.
+    """
+    if score >= minimax.MATE_BOUND:
+        return f"mate {(minimax.MATE_SCORE - score + 1) // 2}"
+    if score <= -minimax.MATE_BOUND:
+        return f"mate {-((minimax.MATE_SCORE + score) // 2)}"
+    return f"cp {score}"
+
+
+def parse_go(tokens):
+    """
+    Read the limits of a "go" command.
+
+    Args:
+        tokens: a list of the words after "go".
+    Returns:
+        A dict of the limits given, such as "depth", "movetime" and "wtime",
+        with times converted from milliseconds to seconds.
+    """
+    limits = {}
+    times = ("movetime", "wtime", "btime", "winc", "binc")
+    counts = ("depth", "nodes", "movestogo")
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token == "infinite":
+            limits["infinite"] = True
+        elif token in times + counts and index + 1 < len(tokens):
+            value = int(tokens[index + 1])
+            limits[token] = value / 1000 if token in times else value
+            index += 1
+        index += 1
+    return limits
+
+
+class UciEngine:
+    """
+    Keeps the engine's position, options, and transposition table between
+    commands, and runs each search on a separate thread so "stop" and
+    "isready" are answered while it thinks.
+    """
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.board = chess.Board()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.threads = 1
+        self.table = TranspositionTable(self.hash_mb)
+        # Where the table is saved on quit and loaded from when it's set
+        self.hash_file = None
+        self.parallel = None
+        self.syzygy_path = None
+        self.tablebase = None
+        self.search_thread = None
+        self.stopped = threading.Event()
+
+    def send(self, line):
+        """
+        Write a line to the GUI.
+        """
+        self.output.write(line + "\n")
+        self.output.flush()
+
+    def handle(self, line):
+        """
+        Carry out one command from the GUI.
+
+        Args:
+            line: a string holding the command.
+        Returns:
+            bool: False once the engine should quit.
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {NAME}")
+            self.send(f"id author {AUTHORS}")
+            self.send(
+                f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 "
+                f"max {MAX_HASH_MB}"
+            )
+            self.send(
+                f"option name Threads type spin default 1 min 1 max {MAX_THREADS}"
+            )
+            self.send("option name SyzygyPath type string default <empty>")
+            self.send("option name HashFile type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.wait()
+            self.set_option(arguments)
+        elif command == "ucinewgame":
+            self.wait()
+            self.table.clear()
+            if self.parallel is not None:
+                self.parallel.clear()
+        elif command == "position":
+            self.wait()
+            self.set_position(arguments)
+        elif command == "go":
+            self.wait()
+            self.go(parse_go(arguments))
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            self.close()
+            return False
+        return True
+
+    def set_option(self, arguments):
+        """
+        Handle "setoption name <name> value <value>".
+        """
+        if "name" not in arguments:
+            return
+        name_end = arguments.index("value") if "value" in arguments else None
+        name = " ".join(arguments[arguments.index("name") + 1 : name_end]).lower()
+        value = " ".join(arguments[name_end + 1 :]) if name_end is not None else ""
+        if name == "hash":
+            self.hash_mb = max(1, min(MAX_HASH_MB, int(value)))
+            self.table = TranspositionTable(self.hash_mb)
+            self.start_workers()
+        elif name == "threads":
+            self.threads = max(1, min(MAX_THREADS, int(value)))
+            self.start_workers()
+        elif name == "syzygypath":
+            if self.tablebase is not None:
+                self.tablebase.close()
+            self.syzygy_path = value or None
+            self.tablebase = tablebase.open_tablebase(self.syzygy_path)
+            self.start_workers()
+        elif name == "hashfile":
+            self.hash_file = value or None
+            if self.hash_file is not None and os.path.exists(self.hash_file):
+                self.table = TranspositionTable.load(self.hash_file)
+                self.hash_mb = round(self.table.size_mb)
+
+    def start_workers(self):
+        """
+        Replace the worker processes with ones for the current Threads, Hash
+        and SyzygyPath, or shut them down if there's only one thread.
+        """
+        if self.parallel is not None:
+            self.parallel.close()
+        self.parallel = None
+        if self.threads > 1:
+            self.parallel = parallel.ParallelSearch(
+                self.threads, table_mb=self.hash_mb, syzygy_path=self.syzygy_path
+            )
+
+    def set_position(self, arguments):
+        """
+        Handle "position startpos|fen <fen> [moves <move> ...]".
+        """
+        moves = []
+        if "moves" in arguments:
+            moves = arguments[arguments.index("moves") + 1 :]
+            arguments = arguments[: arguments.index("moves")]
+        if arguments and arguments[0] == "fen":
+            self.board = chess.Board(" ".join(arguments[1:]))
+        else:
+            self.board = chess.Board()
+        for move in moves:
+            self.board.push_uci(move)
+
+    def go(self, limits):
+        """
+        Start searching the current position on a new thread.
+
+        Args:
+            limits: a dict from parse_go().
+        """
+        movetime = limits.get("movetime")
+        timer = None
+        our_time = limits.get("wtime" if self.board.turn else "btime")
+        if movetime is None and our_time is not None:
+            # The same time policy as the game's, from the clock the GUI sent
+            increment = limits.get("winc" if self.board.turn else "binc", 0.0)
+            manager = timeman.TimeManager(
+                self.board, clock=our_time, increment=increment
+            )
+            soft, movetime = manager.allot(self.board, limits.get("movestogo"))
+            timer = timeman.SearchTimer(soft, movetime)
+        infinite = limits.get("infinite", False)
+        if infinite:
+            movetime = None
+            timer = None
+        max_depth = limits.get("depth", 64)
+        self.stopped.clear()
+        self.search_thread = threading.Thread(
+            target=self.search,
+            args=(self.board.copy(), max_depth, movetime, limits.get("nodes")),
+            kwargs={"timer": timer, "infinite": infinite},
+        )
+        self.search_thread.start()
+
+    def search(self, board, max_depth, movetime, max_nodes, timer=None, infinite=False):
+        """
+        Search a position and send "info" lines and the "bestmove".
+
+        Args:
+            board: the chess.Board() to search; it's a copy of the position.
+            max_depth: an int representing the deepest iteration to run.
+            movetime: an optional number of seconds the search must stop by.
+            max_nodes: an optional int representing the most nodes to search.
+            timer: an optional timeman.SearchTimer that decides after each
+                iteration whether to start another.
+            infinite: a bool; if True, the bestmove is held back until
+                "stop", even if the search ends first (say, on finding a
+                mate), as UCI requires for "go infinite".
+        """
+        start = time.perf_counter()
+
+        def finish_iteration(iteration, nodes):
+            self.send_info(iteration, nodes, start)
+            return timer is not None and timer.on_iteration(iteration)
+
+        if self.parallel is not None:
+            score, move = self.parallel.search(
+                board,
+                max_depth,
+                movetime,
+                stop_check=self.stopped.is_set,
+                max_nodes=max_nodes,
+                on_iteration=lambda iteration: finish_iteration(
+                    iteration, iteration["nodes"]
+                ),
+            )
+        else:
+            searcher = minimax.Minimax(board, self.table, tablebase=self.tablebase)
+            searcher.stop_check = self.stopped.is_set
+            searcher.on_iteration = lambda iteration: finish_iteration(
+                iteration, searcher.nodes
+            )
+            score, move = searcher.search(
+                max_depth=max_depth, movetime=movetime, max_nodes=max_nodes
+            )
+        if move is None and board.legal_moves:
+            # Stopped before the first root move was searched
+            move = next(iter(board.legal_moves))
+        if infinite:
+            self.stopped.wait()
+        self.send(f"bestmove {move.uci() if move else '0000'}")
+
+    def send_info(self, iteration, nodes, start):
+        """
+        Send the "info" line of a finished iteration.
+
+        Args:
+            iteration: a dict from Minimax.iterations.
+            nodes: an int representing the nodes searched so far.
+            start: the time.perf_counter() value the search started at.
+        """
+        elapsed = time.perf_counter() - start
+        self.send(
+            f"info depth {iteration['depth']} "
+            f"score {format_score(iteration['score'])} "
+            f"nodes {nodes} nps {int(nodes / max(elapsed, 1e-6))} "
+            f"time {int(elapsed * 1000)} "
+            f"pv {' '.join(move.uci() for move in iteration['pv'])}"
+        )
+
+    def stop(self):
+        """
+        Make the current search finish as soon as possible.
+        """
+        self.stopped.set()
+        self.wait()
+
+    def wait(self):
+        """
+        Wait for the current search, if any, to send its bestmove.
+        """
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+    def close(self):
+        """
+        Shut down worker processes and tablebase files, and save the table
+        if there's a HashFile.
+        """
+        if self.hash_file is not None:
+            self.table.save(self.hash_file)
+        if self.parallel is not None:
+            self.parallel.close()
+        if self.tablebase is not None:
+            self.tablebase.close()
+
+
+def main():
+    """
+    Read UCI commands from stdin until "quit" or the end of input.
+    """
+    engine = UciEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            return
+    engine.stop()
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
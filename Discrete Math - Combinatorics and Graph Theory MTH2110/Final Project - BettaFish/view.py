@@ -2,6 +2,7 @@ import pygame
 import chess
 import controller
 import eval
+from transposition import position_key
 
 
 class DrawGame:
@@ -25,6 +26,12 @@ class DrawGame:
 
     piece_image = {"BLACK": {}, "WHITE": {}}
 
+    # Parts of the screen outside the board that are redrawn when they change
+    eval_bar_area = pygame.Rect(965, 15, 60, 930)
+    thinking_area = pygame.Rect(1045, 20, 235, 72)
+    captured_black_area = pygame.Rect(1060, 100, 220, 270)
+    captured_white_area = pygame.Rect(1060, 600, 220, 270)
+
     def __init__(self, board):
         # initiate controller
         self.board = board
@@ -50,30 +57,187 @@ class DrawGame:
         self.selected_square = None
         self.potential_moves = []
 
+        # Everything that never changes, copied back over whatever does
+        self.background = pygame.Surface((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
+        self.background.blit(self.board_image, (0, 0))
+        # What the last frame showed (see frame_state), None before the first
+        self.drawn = None
+        # Made once, since looking up a system font is slow
+        self.thinking_font = pygame.font.SysFont(None, 28)
+
+        # Evaluations of positions seen so far, by Zobrist hash, and the move
+        # stack the current one was looked up for
+        self.eval_cache = {}
+        self.eval_stack = None
+        self.eval_score = 0
+
     def draw(self):
         """
-        Draw the chess board based on given chess model
+        Draw the parts of the chess board that changed since the last frame
+
+        Returns:
+            A list of the pygame.Rects that were redrawn, to pass to
+            pygame.display.update(); empty when nothing changed.
         """
-        # refresh screen
-        self.draw_board()
+        # play the bot's move once the background engine has found it
+        self.control.poll_bot_move()
+
+        state = self.frame_state()
+        dirty = self.cover_areas(self.dirty_rects(state))
+        for area in dirty:
+            self.screen.set_clip(area)
+            # refresh this part of the screen
+            self.draw_board(area)
+
+            # draw the pieces
+            self.draw_pieces(area)
+
+        # Everything else is drawn once, wherever it was refreshed
+        self.draw_over(
+            dirty,
+            [self.captured_black_area, self.captured_white_area],
+            self.draw_captured_pieces,
+        )
+        self.draw_over(dirty, [self.eval_bar_area], self.draw_evaluation_bar)
+        if self.control.thinking:
+            self.draw_over(dirty, [self.thinking_area], self.draw_thinking)
+        self.screen.set_clip(None)
+
+        # highlight selected square and potential moves; they're solid, so
+        # drawing them again where nothing changed leaves it the same
+        if dirty and self.selected_square is not None:
+            self.highlight_square(self.selected_square)
+            self.highlight_moves(self.potential_moves)
+        self.drawn = state
+        return dirty
 
-        # draw the pieces
-        self.draw_pieces()
+    def cover_areas(self, rects):
+        """
+        Returns:
+            The dirty rects, plus the whole of each area outside the board
+            that one of them touches without covering, since what's drawn
+            there is drawn once over all of it.
+        """
+        covered = list(rects)
+        for area in (
+            self.eval_bar_area,
+            self.thinking_area,
+            self.captured_black_area,
+            self.captured_white_area,
+        ):
+            touched = area.collidelist(rects) != -1
+            if touched and not any(rect.contains(area) for rect in rects):
+                covered.append(area)
+        return covered
+
+    def draw_over(self, dirty, areas, draw):
+        """
+        Call draw once, clipped to those of areas that were refreshed, if any
+        were.
+        """
+        refreshed = [area for area in areas if area.collidelist(dirty) != -1]
+        if not refreshed:
+            return
+        self.screen.set_clip(refreshed[0].unionall(refreshed[1:]))
+        draw()
 
-        self.draw_captured_pieces()
-        self.draw_evaluation_bar()
+    def frame_state(self):
+        """
+        Returns:
+            A dict of everything a frame shows: the "pieces" (a dict from
+            square to piece symbol), the "selected" square and its "moves",
+            the "captured" pieces of both sides, the "evaluation", and the
+            "thinking" info, or None when the bot isn't thinking.
+        """
+        pieces = {
+            square: piece.symbol() for square, piece in self.board.piece_map().items()
+        }
+        thinking = None
+        if self.control.thinking:
+            info = self.control.info
+            thinking = (info.get("depth", 0), info.get("nodes", 0))
+        return {
+            "pieces": pieces,
+            "selected": self.selected_square,
+            "moves": tuple(self.potential_moves),
+            "captured": (
+                tuple(self.control.captured_pieces_black),
+                tuple(self.control.captured_pieces_white),
+            ),
+            "evaluation": self.evaluation(),
+            "thinking": thinking,
+        }
 
-        # highlight selected square and potential moves
-        if self.selected_square is not None:
-            self.highlight_square(self.selected_square)
-            self.highlight_moves(self.potential_moves)
+    def dirty_rects(self, state):
+        """
+        Compare a frame's state with the last one drawn.
+
+        Returns:
+            A list of the pygame.Rects of the screen that need redrawing.
+        """
+        if self.drawn is None:
+            return [self.screen.get_rect()]
+        drawn = self.drawn
+        rects = []
+        for square in range(64):
+            old = drawn["pieces"].get(square)
+            new = state["pieces"].get(square)
+            if old != new:
+                rect = self.square_rect(square)
+                # Pieces are taller than squares, so cover the sprites too
+                for piece in (old, new):
+                    if piece is not None:
+                        rect = rect.union(self.piece_rect(square, piece))
+                rects.append(rect)
+        if (drawn["selected"], drawn["moves"]) != (state["selected"], state["moves"]):
+            for frame in (drawn, state):
+                if frame["selected"] is not None:
+                    rects.append(self.square_rect(frame["selected"]))
+                rects.extend(self.square_rect(move) for move in frame["moves"])
+        if drawn["captured"][0] != state["captured"][0]:
+            rects.append(self.captured_black_area)
+        if drawn["captured"][1] != state["captured"][1]:
+            rects.append(self.captured_white_area)
+        if drawn["evaluation"] != state["evaluation"]:
+            rects.append(self.eval_bar_area)
+        if drawn["thinking"] != state["thinking"]:
+            rects.append(self.thinking_area)
+        return rects
+
+    def square_rect(self, square):
+        """
+        Returns:
+            The pygame.Rect of a square, including its highlight.
+        """
+        x = square % 8
+        y = square // 8
+        return pygame.Rect(
+            x * self.square_size + self.padding + 7,
+            (7 - y) * self.square_size + self.padding + 7,
+            self.square_size + 3,
+            self.square_size + 3,
+        )
+
+    def piece_rect(self, square, piece):
+        """
+        Returns:
+            The pygame.Rect a piece's sprite covers on a square.
+        """
+        x = square % 8
+        y = square // 8
+        return self.piece_image[piece].get_rect(
+            topleft=(
+                x * self.square_size + self.padding + 33,
+                (7 - y) * self.square_size + self.padding - 7,
+            )
+        )
 
     def user_interface(self, event):
         """
         Get user input (mousepressed) and move the chess pieces
         """
-        # when mouse pressed
-        if event.type == pygame.MOUSEBUTTONUP:
+        # when mouse pressed, unless the bot is still choosing its move
+        if event.type == pygame.MOUSEBUTTONUP and not self.control.thinking:
             pos = pygame.mouse.get_pos()
 
             pos_x = pos[0]
@@ -96,9 +260,7 @@ class DrawGame:
                     )
                     if move_successful:
                         self.selected_square = None
-                        self.draw()
-                        pygame.display.flip()
-                        self.control.bot_move()
+                        self.control.start_bot_move()
                     else:
                         if piece is not None and str(piece) in (
                             "B",
@@ -115,15 +277,29 @@ class DrawGame:
                         else:
                             self.selected_square = None
 
-    def draw_board(self):
+    def draw_thinking(self):
         """
-        Draw chess board
+        Show that the bot is thinking, with its current search depth and nodes
         """
-        self.screen.blit(self.board_image, (0, 0))
+        info = self.control.info
+        lines = [
+            "Thinking...",
+            f"depth {info.get('depth', 0)}",
+            f"{info.get('nodes', 0)} nodes",
+        ]
+        for index, line in enumerate(lines):
+            text = self.thinking_font.render(line, True, (255, 255, 255))
+            self.screen.blit(text, (1045, 20 + index * 24))
 
-    def draw_pieces(self):
+    def draw_board(self, area):
         """
-        Draw pieces onto board
+        Draw part of the chess board from the cached background
+        """
+        self.screen.blit(self.background, area, area)
+
+    def draw_pieces(self, area):
+        """
+        Draw the pieces that overlap an area onto the board
         """
         for i in range(0, 64):
             piece = self.board.piece_at(i)
@@ -131,6 +307,8 @@ class DrawGame:
             x = i - (y * 8)
             if piece is not None:
                 piece = str(piece)
+                if not area.colliderect(self.piece_rect(i, piece)):
+                    continue
                 pos_x = x * self.square_size + self.padding + 33
                 pos_y = (7 - y) * self.square_size + self.padding - 7
                 self.screen.blit(
@@ -241,9 +419,7 @@ class DrawGame:
         """
         Draws an evaluation bar showing the game's evaluation score.
         """
-        eval_score = eval.calc_piece_activity(
-            self.board
-        )  # Assuming you have an evaluation method in ControlGame
+        eval_score = self.evaluation()
         bar_x = 970  # Positioning the bar on the right
         bar_y = 20
         bar_width = 50
@@ -277,3 +453,18 @@ class DrawGame:
             white,
             (bar_x, bar_y + black_height, bar_width, white_height),
         )
+
+    def evaluation(self):
+        """
+        Get the score for the evaluation bar, only evaluating the board when
+        its move stack changes, and then only for positions not seen before.
+        """
+        move_stack = self.board.move_stack
+        stack = (len(move_stack), move_stack[-1] if move_stack else None)
+        if stack != self.eval_stack:
+            key = position_key(self.board)
+            if key not in self.eval_cache:
+                self.eval_cache[key] = eval.calc_piece_activity(self.board)
+            self.eval_score = self.eval_cache[key]
+            self.eval_stack = stack
+        return self.eval_score
@@ -6,6 +6,7 @@ import matplotlib
 import networkx as nx
 import matplotlib.pyplot as plt
 import math
+import time
 
 # Set the plotting backend to Agg for non-interactive mode (useful for saving images in scripts)
 matplotlib.use("Agg")
@@ -69,57 +70,281 @@ ADJACENCY_MATRIX = [
 
 NUM_VERTICES = 8
 
+# The largest graph solved by the bitmask dynamic program. It takes memory in
+# proportion to 2^V and time up to 2^V * V whatever the edges (a dense graph
+# of 25 vertices took a minute and 650 MB), so larger graphs are backtracked
+# instead
+DP_MAX_VERTICES = 20
+
+# Seconds the backtracker gets before a graph small enough for the dynamic
+# program is handed to it. Dense graphs, which cost the dynamic program the
+# most, are where backtracking finds a cycle at once
+BACKTRACK_SECONDS = 0.5
+
+
+class SearchTimeout(Exception):
+    """Raised when the backtracking search runs past its deadline"""
+
 
 class Hamilton:
     """Class to find Hamiltonian cycle in a given graph"""
 
-    def __init__(self, vertices_num) -> None:
+    def __init__(self, vertices_num, dp_max_vertices=DP_MAX_VERTICES) -> None:
         self.graph = None
         self.V = vertices_num
+        # Graphs up to this size are solved by dynamic programming, larger
+        # ones by backtracking
+        self.dp_max_vertices = dp_max_vertices
+        # The time.perf_counter() value the backtracking search stops at
+        self.deadline = None
+        self.engine = None
+        self.elapsed = None
+
+    def adjacency_bits(self):
+        """
+        Convert the adjacency matrix to one bitset per vertex.
+
+        Returns:
+        - list: Ints where bit u of entry v is set if v and u are adjacent
+        """
+        return [
+            sum(1 << u for u in range(self.V) if self.graph[v][u])
+            for v in range(self.V)
+        ]
 
-    def is_safe(self, v, pos, path):
+    def held_karp(self):
         """
-        Check if vertex v can be added at index pos in the Hamiltonian path.
+        Held-Karp dynamic programming over (visited set, endpoint) pairs.
+        Every path starts at vertex 0, and reach[mask] is the bitset of the
+        vertices a path through exactly the vertices of mask can end at, so
+        one int holds every endpoint of a set. Takes O(2^V * V) time, whether
+        or not there is a cycle.
+
+        Returns:
+        - list or None: Hamiltonian cycle path without the repeated start,
+          None if there isn't one
+        """
+        adjacency = self.adjacency_bits()
+        if self.V == 1:
+            return [0] if adjacency[0] & 1 else None
+        # Bit i of a mask stands for vertex i + 1
+        others = self.V - 1
+        full = (1 << others) - 1
+        neighbours = [adjacency[v + 1] >> 1 for v in range(others)]
+        starts = adjacency[0] >> 1
+
+        # The neighbours of a set of endpoints, looked up in two halves
+        split = (others + 1) // 2
+        low_mask = (1 << split) - 1
+        low_union = [0] * (1 << split)
+        for ends in range(1, 1 << split):
+            bit = ends & -ends
+            low_union[ends] = low_union[ends ^ bit] | neighbours[bit.bit_length() - 1]
+        high_union = [0] * (1 << (others - split))
+        for ends in range(1, 1 << (others - split)):
+            bit = ends & -ends
+            high_union[ends] = (
+                high_union[ends ^ bit] | neighbours[split + bit.bit_length() - 1]
+            )
+
+        reach = [0] * (1 << others)
+        bits = starts
+        while bits:
+            bit = bits & -bits
+            reach[bit] = bit
+            bits ^= bit
+        # Every mask is finished before the larger masks it extends to
+        for mask in range(1, full):
+            ends = reach[mask]
+            if not ends:
+                continue
+            extensions = (
+                low_union[ends & low_mask] | high_union[ends >> split]
+            ) & ~mask
+            while extensions:
+                bit = extensions & -extensions
+                reach[mask | bit] |= bit
+                extensions ^= bit
+
+        closing = reach[full] & starts
+        if not closing:
+            return None
+        # Walk back from an endpoint next to vertex 0
+        path = []
+        mask = full
+        end = closing & -closing
+        while True:
+            v = end.bit_length() - 1
+            path.append(v + 1)
+            mask ^= end
+            if not mask:
+                break
+            before = reach[mask] & neighbours[v]
+            end = before & -before
+        path.append(0)
+        path.reverse()
+        return path
+
+    def next_vertices(self, adjacency, path, unvisited):
+        """
+        Choose the vertices to try next in the backtracking search, pruning
+        paths that can no longer become a Hamiltonian cycle.
+
+        A vertex that isn't on the path needs two neighbours it can still be
+        joined to. If it has exactly two, both edges are forced: no vertex
+        can be forced more edges than it has left (two, or one for the ends
+        of the path), and a vertex forced onto the end of the path must come
+        next. The unvisited vertices must also stay connected to the end of
+        the path.
 
         Parameters:
-        - v (int): Vertex to check
-        - pos (int): Position in path to place vertex
+        - adjacency (list): Bitset of each vertex's neighbours
         - path (list): Current Hamiltonian path
+        - unvisited (int): Bitset of the vertices not on the path
 
         Returns:
-        - bool: True if vertex can be added, False otherwise
+        - list: Vertices to try next, fewest onward options first; empty if
+          the path is a dead end
         """
-        if self.graph[path[pos - 1]][v] == 0:
-            return False
-        if v in path:
-            return False
-        return True
-
-    def hamilton_cycle(self, path, pos):
+        end = path[-1]
+        end_bit = 1 << end
+        start_bit = 1 << path[0]
+        # The start keeps both its edges until the path leaves it
+        started = len(path) > 1
+        # Vertices that can still gain path edges; the start closes the cycle
+        open_vertices = unvisited | end_bit | start_bit
+        forced = None
+        # Vertices with at least one, two, and three forced edges
+        once = twice = thrice = 0
+        options = {}
+        rest = unvisited
+        while rest:
+            bit = rest & -rest
+            rest ^= bit
+            w = bit.bit_length() - 1
+            free = adjacency[w] & open_vertices
+            count = free.bit_count()
+            if count < 2:
+                return []
+            options[w] = count
+            if count == 2:
+                thrice |= twice & free
+                twice |= once & free
+                once |= free
+                if free & end_bit:
+                    # Before the path leaves the start, either of its forced
+                    # neighbours can go first, since the cycle can be reversed
+                    forced = w
+        if thrice & open_vertices:
+            return []
+        if started and twice & (end_bit | start_bit):
+            return []
+        if started and not adjacency[path[0]] & unvisited:
+            return []
+
+        reached = end_bit
+        frontier = end_bit
+        while frontier:
+            grown = 0
+            while frontier:
+                bit = frontier & -frontier
+                frontier ^= bit
+                grown |= adjacency[bit.bit_length() - 1]
+            frontier = grown & unvisited & ~reached
+            reached |= frontier
+        if unvisited & ~reached:
+            return []
+
+        if forced is not None:
+            return [forced]
+        candidates = []
+        bits = adjacency[end] & unvisited
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            candidates.append(bit.bit_length() - 1)
+        candidates.sort(key=options.get)
+        return candidates
+
+    def extend_path(self, adjacency, path, unvisited):
         """
         Recursive utility to solve the Hamiltonian cycle problem.
 
         Parameters:
-        - path (list): Current Hamiltonian path
-        - pos (int): Position in path to place next vertex
+        - adjacency (list): Bitset of each vertex's neighbours
+        - path (list): Current Hamiltonian path, extended in place
+        - unvisited (int): Bitset of the vertices not on the path
 
         Returns:
         - bool: True if Hamiltonian cycle is found, False otherwise
         """
-        if pos == self.V:
-            if self.graph[path[pos - 1]][path[0]] == 1:
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+        if not unvisited:
+            return bool(adjacency[path[-1]] >> path[0] & 1)
+        for v in self.next_vertices(adjacency, path, unvisited):
+            path.append(v)
+            if self.extend_path(adjacency, path, unvisited ^ (1 << v)):
                 return True
-            else:
-                return False
-
-        for v in range(self.V):
-            if self.is_safe(v, pos, path):
-                path[pos] = v
-                if self.hamilton_cycle(path, pos + 1):
-                    return True
-                path[pos] = -1
+            path.pop()
         return False
 
+    def backtrack(self, seconds=None):
+        """
+        Depth-first search for a Hamiltonian cycle, with the visited vertices
+        kept as a bitset and the pruning of next_vertices(). The search
+        starts from a vertex of least degree, where it has the fewest
+        choices, and the cycle is turned to start at vertex 0 afterwards.
+
+        Parameters:
+        - seconds (float or None): Time limit, or None for none
+
+        Returns:
+        - list or None: Hamiltonian cycle path without the repeated start,
+          None if there isn't one
+
+        Raises:
+        - SearchTimeout: If the time limit runs out first
+        """
+        adjacency = self.adjacency_bits()
+        start = min(range(self.V), key=lambda v: adjacency[v].bit_count())
+        path = [start]
+        self.deadline = None if seconds is None else time.perf_counter() + seconds
+        try:
+            found = self.extend_path(
+                adjacency, path, ((1 << self.V) - 1) ^ (1 << start)
+            )
+        finally:
+            self.deadline = None
+        if not found:
+            return None
+        zero = path.index(0)
+        return path[zero:] + path[:zero]
+
+    def solve(self):
+        """
+        Find a Hamiltonian cycle with the engine that suits the graph,
+        recording which one ran in self.engine and its time in self.elapsed.
+        The backtracker runs first, and a graph small enough for the dynamic
+        program is handed to it if backtracking takes BACKTRACK_SECONDS.
+
+        Returns:
+        - list or None: Hamiltonian cycle path without the repeated start,
+          None if there isn't one
+        """
+        start = time.perf_counter()
+        self.engine = "backtracking"
+        if self.V > self.dp_max_vertices:
+            path = self.backtrack()
+        else:
+            try:
+                path = self.backtrack(BACKTRACK_SECONDS)
+            except SearchTimeout:
+                self.engine = "Held-Karp"
+                path = self.held_karp()
+        self.elapsed = time.perf_counter() - start
+        return path
+
     def solution(self):
         """
         Find a Hamiltonian cycle if it exists.
@@ -127,10 +352,10 @@ class Hamilton:
         Returns:
         - list or None: Hamiltonian cycle path if exists, None otherwise
         """
-        path = [-1] * self.V
-        path[0] = 0
+        path = self.solve()
+        print(f"The {self.engine} solver took {self.elapsed:.4f} seconds.")
 
-        if not self.hamilton_cycle(path, 1):
+        if path is None:
             print(
                 "There is no Hamiltonian Circuit. We cannot assess the planarity of the Graph."
             )
@@ -179,24 +404,6 @@ def ham_list_to_nodes(ham_list):
     return hamiltonian_points
 
 
-h = Hamilton(NUM_VERTICES)
-h.graph = ADJACENCY_MATRIX
-h_sol = h.solution()
-if h_sol is not None:
-    hamiltonian_list = h_sol[:-1]
-
-    graph_g = adjacency_to_edges(ADJACENCY_MATRIX, sorted(hamiltonian_list))
-    hamiltonian_cycle = ham_list_to_nodes(hamiltonian_list)
-
-    vertices = [node for node, _ in hamiltonian_cycle]
-    angle_increment = 2 * math.pi / len(vertices)
-    locations = [
-        (math.cos(i * angle_increment), math.sin(i * angle_increment))
-        for i in range(len(vertices))
-    ]
-    VERTEX_LOCATIONS = {vertices[i]: locations[i] for i in range(len(vertices))}
-
-
 def is_planar(edge_list, hamiltonian_nodes):
     """
     Check if the graph is planar and categorize edges.
@@ -363,40 +570,62 @@ def draw_colored_graph(
     plt.clf()  # Clear the plot after saving to avoid overlap
 
 
-if h_sol is not None:
-
-    planar, edge_labels = is_planar(graph_g, hamiltonian_cycle)
-
-    # Separate edges based on labels
-    interior_edges = [edge for edge, label in edge_labels.items() if label == "I"]
-    exterior_edges = [edge for edge, label in edge_labels.items() if label == "O"]
-
-    g = nx.Graph()
-    g.add_edges_from(graph_g)
-    h_cycle = nx.Graph()
-    h_cycle.add_edges_from(hamiltonian_cycle)
-    # Save images of the graphs
-    nx.draw(
-        g, with_labels=True, edge_color="black", node_color="lightgrey", node_size=500
-    )
-    plt.savefig("graph.png")
-    plt.clf()
-
-    nx.draw(
-        h_cycle,
-        with_labels=True,
-        edge_color="blue",
-        node_color="lightgrey",
-        node_size=500,
-    )
-    plt.savefig("h_cycle.png")
-    plt.clf()
-
-    # Draw the graph
-    draw_colored_graph(
-        graph_g, hamiltonian_cycle, interior_edges, exterior_edges, hamiltonian_list
-    )
-
-    # Test planarity of the graph
-    print(f"The planarity of this graph is {is_planar(graph_g, hamiltonian_cycle)[0]}.")
-    print(f"Test planarity is: {nx.check_planarity(g)[0]}.")
+if __name__ == "__main__":
+    h = Hamilton(NUM_VERTICES)
+    h.graph = ADJACENCY_MATRIX
+    h_sol = h.solution()
+    if h_sol is not None:
+        hamiltonian_list = h_sol[:-1]
+
+        graph_g = adjacency_to_edges(ADJACENCY_MATRIX, sorted(hamiltonian_list))
+        hamiltonian_cycle = ham_list_to_nodes(hamiltonian_list)
+
+        vertices = [node for node, _ in hamiltonian_cycle]
+        angle_increment = 2 * math.pi / len(vertices)
+        locations = [
+            (math.cos(i * angle_increment), math.sin(i * angle_increment))
+            for i in range(len(vertices))
+        ]
+        VERTEX_LOCATIONS = {vertices[i]: locations[i] for i in range(len(vertices))}
+
+        planar, edge_labels = is_planar(graph_g, hamiltonian_cycle)
+
+        # Separate edges based on labels
+        interior_edges = [edge for edge, label in edge_labels.items() if label == "I"]
+        exterior_edges = [edge for edge, label in edge_labels.items() if label == "O"]
+
+        g = nx.Graph()
+        g.add_edges_from(graph_g)
+        h_cycle = nx.Graph()
+        h_cycle.add_edges_from(hamiltonian_cycle)
+        # Save images of the graphs
+        nx.draw(
+            g,
+            with_labels=True,
+            edge_color="black",
+            node_color="lightgrey",
+            node_size=500,
+        )
+        plt.savefig("graph.png")
+        plt.clf()
+
+        nx.draw(
+            h_cycle,
+            with_labels=True,
+            edge_color="blue",
+            node_color="lightgrey",
+            node_size=500,
+        )
+        plt.savefig("h_cycle.png")
+        plt.clf()
+
+        # Draw the graph
+        draw_colored_graph(
+            graph_g, hamiltonian_cycle, interior_edges, exterior_edges, hamiltonian_list
+        )
+
+        # Test planarity of the graph
+        print(
+            f"The planarity of this graph is {is_planar(graph_g, hamiltonian_cycle)[0]}."
+        )
+        print(f"Test planarity is: {nx.check_planarity(g)[0]}.")